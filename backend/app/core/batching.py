@@ -0,0 +1,112 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+from app.core.metrics import metrics
+
+
+class MicroBatcher:
+    """
+    Coalesces items submitted concurrently into batches for a single call.
+
+    Items are collected until `max_wait` seconds have passed since the first
+    one arrived or `max_items` are pending, then flushed to `process_batch`,
+    which must return one result per item in order. Batches are split so none
+    exceeds `max_items` or a total `cost` of `max_cost`.
+
+    Reports `<name>.batch_size` and `<name>.queue_delay_ms` to app.core.metrics.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_wait: float = 0.01,
+        max_items: int = 64,
+        max_cost: Optional[int] = None,
+        cost: Callable[[Any], int] = lambda item: 1,
+        name: str = "batcher",
+    ):
+        self.process_batch = process_batch
+        self.max_wait = max_wait
+        self.max_items = max_items
+        self.max_cost = max_cost
+        self.cost = cost
+        self.name = name
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # The event loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        return (await self.submit_many([item]))[0]
+
+    async def submit_many(self, items: List[Any]) -> List[Any]:
+        if not items:
+            return []
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (e.g. between test clients)
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+            self._tasks = set()
+
+        now = time.perf_counter()
+        futures = []
+        for item in items:
+            future = loop.create_future()
+            self._pending.append((item, future, now))
+            futures.append(future)
+
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, self._pending = self._pending, []
+        for batch in self._split(pending):
+            task = self._loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _split(self, pending: List[Tuple[Any, asyncio.Future, float]]):
+        batch, batch_cost = [], 0
+        for entry in pending:
+            item_cost = self.cost(entry[0])
+            over_budget = self.max_cost is not None and batch_cost + item_cost > self.max_cost
+            if batch and (len(batch) >= self.max_items or over_budget):
+                yield batch
+                batch, batch_cost = [], 0
+            batch.append(entry)
+            batch_cost += item_cost
+        if batch:
+            yield batch
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        started = time.perf_counter()
+        metrics.observe(f"{self.name}.batch_size", len(batch))
+        for _, _, enqueued_at in batch:
+            metrics.observe(f"{self.name}.queue_delay_ms", (started - enqueued_at) * 1000)
+
+        try:
+            results = await self.process_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"{self.name}: expected {len(batch)} results, got {len(results)}")
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
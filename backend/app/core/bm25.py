@@ -0,0 +1,115 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory inverted index scored with Okapi BM25.
+
+    Documents are added and removed one at a time, so the index can be kept
+    current as memories are saved instead of being rebuilt. Each term maps
+    to a postings dict of {row: term frequency}; a document's row is freed
+    on removal and its postings are dropped.
+
+    Thread-safe.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._terms: List[Tuple[str, ...]] = []
+        self._lengths: List[int] = []
+        self._free: List[int] = []
+        self._total_length = 0
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    def add(self, doc_id: str, text: str):
+        """
+        Indexes text under doc_id, replacing what was indexed for it before.
+        """
+        counts = Counter(tokenize(text))
+        with self._lock:
+            self._remove(doc_id)
+            if self._free:
+                row = self._free.pop()
+                self.ids[row], self._terms[row], self._lengths[row] = doc_id, tuple(counts), sum(counts.values())
+            else:
+                row = len(self.ids)
+                self.ids.append(doc_id)
+                self._terms.append(tuple(counts))
+                self._lengths.append(sum(counts.values()))
+            self._rows[doc_id] = row
+            self._total_length += self._lengths[row]
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[row] = tf
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        for term in self._terms[row]:
+            postings = self.postings[term]
+            del postings[row]
+            if not postings:
+                del self.postings[term]
+        self._total_length -= self._lengths[row]
+        self.ids[row], self._terms[row], self._lengths[row] = None, (), 0
+        self._free.append(row)
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        The top_k documents matching any query term, as (doc_id, score), best first.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._rows)
+            if not n or not terms:
+                return []
+            average_length = self._total_length / n
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for row, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[row] / average_length)
+                    scores[row] = scores.get(row, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [(self.ids[row], score) for row, score in best]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuses ranked ID lists: each ID scores the sum of 1 / (k + rank) over the
+    lists it appears in (rank starting at 1). Only ranks matter, so lists
+    with incomparable scores (BM25, cosine) can be combined.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,120 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+import openai
+from pinecone import Pinecone
+
+from app.core import config
+
+
+class ClientRegistry:
+    """
+    Process-wide holder for outbound API clients.
+
+    Clients are built lazily on first use and then shared by every request, so
+    connection pools (and their TLS sessions) are reused instead of being set up
+    again per call. The app lifespan closes everything on shutdown.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._openai: Optional[openai.OpenAI] = None
+        self._async_openai: Optional[openai.AsyncOpenAI] = None
+        self._pinecone: Optional[Pinecone] = None
+        self._indexes: Dict[str, Any] = {}
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    def openai_client(self) -> openai.OpenAI:
+        """
+        Shared synchronous OpenAI client (for code running in worker threads).
+        """
+        if self._openai is None:
+            with self._lock:
+                if self._openai is None:
+                    self._openai = openai.OpenAI(
+                        api_key=os.getenv("OPENAI_API_KEY"),
+                        http_client=openai.DefaultHttpxClient(
+                            limits=self._limits(), timeout=config.HTTP_TIMEOUT
+                        ),
+                    )
+        return self._openai
+
+    def async_openai_client(self) -> openai.AsyncOpenAI:
+        """
+        Shared asynchronous OpenAI client (for code running on the event loop).
+        """
+        if self._async_openai is None:
+            with self._lock:
+                if self._async_openai is None:
+                    self._async_openai = openai.AsyncOpenAI(
+                        api_key=os.getenv("OPENAI_API_KEY"),
+                        http_client=openai.DefaultAsyncHttpxClient(
+                            limits=self._limits(), timeout=config.HTTP_TIMEOUT
+                        ),
+                    )
+        return self._async_openai
+
+    def pinecone_client(self) -> Pinecone:
+        if self._pinecone is None:
+            api_key = os.getenv("PINECONE_KEY")
+            if not api_key:
+                raise ValueError("PINECONE_KEY environment variable not set")
+
+            with self._lock:
+                if self._pinecone is None:
+                    # The new Pinecone client doesn't need 'environment' unless using
+                    # legacy setups, but we log it once for verification.
+                    env = os.getenv("PINECONE_ENV")
+                    if env:
+                        print(f"Using Pinecone environment: {env}")
+                    self._pinecone = Pinecone(api_key=api_key, pool_threads=config.PINECONE_POOL_THREADS)
+        return self._pinecone
+
+    def index(self, index_name: Optional[str] = None):
+        """
+        Cached Pinecone index handle. Defaults to the PINECONE_INDEX env var.
+        """
+        name = index_name or os.getenv("PINECONE_INDEX")
+        if not name:
+            raise ValueError("PINECONE_INDEX environment variable not set and no index_name provided")
+
+        index = self._indexes.get(name)
+        if index is None:
+            pc = self.pinecone_client()
+            with self._lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = pc.Index(name, pool_threads=config.PINECONE_POOL_THREADS)
+                    self._indexes[name] = index
+        return index
+
+    async def aclose(self):
+        """
+        Close every pooled client. Called from the app lifespan on shutdown.
+        """
+        with self._lock:
+            async_openai, self._async_openai = self._async_openai, None
+            sync_openai, self._openai = self._openai, None
+            indexes, self._indexes = self._indexes, {}
+            self._pinecone = None
+
+        if async_openai is not None:
+            await async_openai.close()
+        if sync_openai is not None:
+            sync_openai.close()
+        for index in indexes.values():
+            close = getattr(index, "close", None)
+            if close:
+                close()
+
+
+clients = ClientRegistry()
@@ -0,0 +1,168 @@
+import json
+import os
+
+# Tunables for the backend. Everything can be overridden through environment
+# variables; the defaults are sized for a single small uvicorn worker.
+
+# Outbound HTTP connection pools (OpenAI / Pinecone)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+PINECONE_POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", "8"))
+
+# Embedding cache (app.services.embedding_cache). Set EMBEDDING_CACHE_PATH to a
+# SQLite file to enable the on-disk tier shared by all workers on the host.
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "5000"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", str(7 * 24 * 3600)))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH") or None
+EMBEDDING_CACHE_DISK_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_DISK_MAX_ROWS", "200000"))
+
+# Embedding micro-batching: concurrent embed_texts_async calls arriving within
+# the window are sent as one request (OpenAI allows 2048 inputs / 300k tokens).
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))
+EMBEDDING_BATCH_MAX_TEXTS = int(os.getenv("EMBEDDING_BATCH_MAX_TEXTS", "256"))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "250000"))
+
+# Vector store (app.core.vectorstore): "pinecone" or "local". The local backend
+# keeps one memory-mapped float32 matrix per namespace under LOCAL_VECTOR_STORE_DIR
+# and switches from exhaustive search to an IVF index above the threshold.
+# Namespaces are rewritten without their replaced and deleted rows once those
+# exceed LOCAL_VECTOR_COMPACT_RATIO of all rows.
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower()
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "vectorstore")
+LOCAL_VECTOR_IVF_THRESHOLD = int(os.getenv("LOCAL_VECTOR_IVF_THRESHOLD", "50000"))
+LOCAL_VECTOR_IVF_NPROBE = int(os.getenv("LOCAL_VECTOR_IVF_NPROBE", "8"))
+LOCAL_VECTOR_COMPACT_RATIO = float(os.getenv("LOCAL_VECTOR_COMPACT_RATIO", "0.5"))
+VECTOR_UPSERT_BATCH_SIZE = int(os.getenv("VECTOR_UPSERT_BATCH_SIZE", "100"))
+
+# Memory ingestion (app.services.memory_ingestion)
+MEMORY_CHUNK_TOKENS = int(os.getenv("MEMORY_CHUNK_TOKENS", "512"))
+MEMORY_CHUNK_OVERLAP_TOKENS = int(os.getenv("MEMORY_CHUNK_OVERLAP_TOKENS", "64"))
+MEMORY_INGEST_BATCH_SIZE = int(os.getenv("MEMORY_INGEST_BATCH_SIZE", "256"))
+MEMORY_BULK_MAX = int(os.getenv("MEMORY_BULK_MAX", "10000"))
+
+# Memory graph (app.services.memory_graph): each ingested memory is linked to
+# its MEMORY_GRAPH_NEIGHBORS most similar memories (cosine >= MIN_SCORE) and
+# to the memories sharing most tags among its user's latest TAG_SCAN. Retrieval
+# adds up to MEMORY_GRAPH_EXPAND one-hop neighbours of its matches (0 disables).
+MEMORY_GRAPH_ENABLED = os.getenv("MEMORY_GRAPH_ENABLED", "true").lower() == "true"
+MEMORY_GRAPH_NEIGHBORS = int(os.getenv("MEMORY_GRAPH_NEIGHBORS", "8"))
+MEMORY_GRAPH_MIN_SCORE = float(os.getenv("MEMORY_GRAPH_MIN_SCORE", "0.75"))
+MEMORY_GRAPH_TAG_SCAN = int(os.getenv("MEMORY_GRAPH_TAG_SCAN", "500"))
+MEMORY_GRAPH_MAX_DEGREE = int(os.getenv("MEMORY_GRAPH_MAX_DEGREE", "16"))
+MEMORY_GRAPH_EXPAND = int(os.getenv("MEMORY_GRAPH_EXPAND", "3"))
+MEMORY_GRAPH_CACHE_USERS = int(os.getenv("MEMORY_GRAPH_CACHE_USERS", "256"))
+MEMORY_GRAPH_CACHE_TTL = float(os.getenv("MEMORY_GRAPH_CACHE_TTL", "300"))
+
+# Hybrid memory search (app.services.memory_search): BM25 over memory text and
+# tags fused with vector results; queries of up to SEARCH_KEYWORD_MAX_TERMS
+# words that look like names or IDs are answered from the keyword index alone.
+SEARCH_HYBRID_ENABLED = os.getenv("SEARCH_HYBRID_ENABLED", "true").lower() == "true"
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+SEARCH_KEYWORD_MAX_TERMS = int(os.getenv("SEARCH_KEYWORD_MAX_TERMS", "3"))
+SEARCH_INDEX_CACHE_USERS = int(os.getenv("SEARCH_INDEX_CACHE_USERS", "256"))
+SEARCH_INDEX_CACHE_TTL = float(os.getenv("SEARCH_INDEX_CACHE_TTL", "300"))
+
+# Vector outbox workers (app.services.outbox_worker)
+OUTBOX_WORKER_ENABLED = os.getenv("OUTBOX_WORKER_ENABLED", "true").lower() == "true"
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "64"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "2"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "600"))
+
+# Authenticated-user cache (app.core.security)
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+
+# Database connection pools (app.database.database). Pool sizes apply per
+# engine and per worker process; the statement timeout is enforced by Postgres.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
+# File uploads (app.services.file_storage). Blobs are stored once per content
+# hash under UPLOAD_DIR; multipart upload sessions expire after UPLOAD_SESSION_TTL.
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_SESSION_TTL = float(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+
+# Uploaded-file ingestion (app.services.file_ingestion). Parsing and chunking
+# run in a pool of FILE_INGEST_PROCESSES processes; at most
+# FILE_INGEST_CONCURRENCY files are ingested at once per API process. An
+# ingestion renews a FILE_INGEST_LEASE_SECONDS lease while it runs; a file left
+# "processing" past its lease (its process died) can be ingested again.
+FILE_INGEST_ENABLED = os.getenv("FILE_INGEST_ENABLED", "true").lower() == "true"
+FILE_INGEST_PROCESSES = int(os.getenv("FILE_INGEST_PROCESSES", "2"))
+FILE_INGEST_CONCURRENCY = int(os.getenv("FILE_INGEST_CONCURRENCY", "2"))
+FILE_INGEST_LEASE_SECONDS = float(os.getenv("FILE_INGEST_LEASE_SECONDS", "60"))
+
+# LLM mood fallback (app.services.neuro_sync), used when no keyword matches.
+# Results are cached per normalised text; concurrent misses are classified in
+# one prompt, and callers fall back to "neutral" after MOOD_LLM_TIMEOUT seconds.
+MOOD_LLM_ENABLED = os.getenv("MOOD_LLM_ENABLED", "true").lower() == "true"
+MOOD_LLM_MODEL = os.getenv("MOOD_LLM_MODEL", "gpt-4o-mini")
+MOOD_LLM_TIMEOUT = float(os.getenv("MOOD_LLM_TIMEOUT", "0.5"))
+MOOD_LLM_CONCURRENCY = int(os.getenv("MOOD_LLM_CONCURRENCY", "4"))
+MOOD_LLM_RPS = float(os.getenv("MOOD_LLM_RPS", "5"))
+MOOD_LLM_BATCH_WINDOW_MS = float(os.getenv("MOOD_LLM_BATCH_WINDOW_MS", "20"))
+MOOD_LLM_BATCH_SIZE = int(os.getenv("MOOD_LLM_BATCH_SIZE", "16"))
+MOOD_CACHE_SIZE = int(os.getenv("MOOD_CACHE_SIZE", "10000"))
+MOOD_CACHE_TTL = float(os.getenv("MOOD_CACHE_TTL", "86400"))
+
+# Chat response cache (app.services.response_cache), off by default. Answers
+# are reused for an identical prompt, or for a question whose embedding is at
+# least RESPONSE_CACHE_SIMILARITY similar under the same user and context.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+RESPONSE_CACHE_SEMANTIC_ENTRIES = int(os.getenv("RESPONSE_CACHE_SEMANTIC_ENTRIES", "64"))
+
+# Chat pipeline (app.routers.chat): answers start without memory context when
+# retrieval takes longer than this many seconds.
+CHAT_RETRIEVAL_TIMEOUT = float(os.getenv("CHAT_RETRIEVAL_TIMEOUT", "1.0"))
+
+# RAG context assembly (app.core.context_builder). Retrieved chunks are
+# deduplicated, reranked by similarity with a boost for recent memories, and
+# cut to CONTEXT_TOKEN_BUDGET tokens (per model via CONTEXT_TOKEN_BUDGETS, a
+# JSON object such as {"gpt-4o": 4000}).
+CONTEXT_TOP_K = int(os.getenv("CONTEXT_TOP_K", "8"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_TOKEN_BUDGETS = json.loads(os.getenv("CONTEXT_TOKEN_BUDGETS", "{}"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+CONTEXT_RECENCY_WEIGHT = float(os.getenv("CONTEXT_RECENCY_WEIGHT", "0.1"))
+CONTEXT_RECENCY_HALF_LIFE_DAYS = float(os.getenv("CONTEXT_RECENCY_HALF_LIFE_DAYS", "30"))
+
+# Conversation history (app.services.conversation_store). Each chat turn sends
+# the rolling summary plus at most CONVERSATION_HISTORY_TOKENS of recent
+# messages; once unsummarised history passes CONVERSATION_SUMMARY_TRIGGER_TOKENS,
+# older messages are folded into the summary in the background.
+CONVERSATION_HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", "2000"))
+CONVERSATION_HISTORY_MAX_MESSAGES = int(os.getenv("CONVERSATION_HISTORY_MAX_MESSAGES", "50"))
+CONVERSATION_SUMMARY_TRIGGER_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TRIGGER_TOKENS", "3000"))
+CONVERSATION_SUMMARY_MODEL = os.getenv("CONVERSATION_SUMMARY_MODEL", "gpt-4o-mini")
+
+# Agent runtime (app.services.agent_runtime)
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "8"))
+AGENT_MAX_RUNS_PER_USER = int(os.getenv("AGENT_MAX_RUNS_PER_USER", "2"))
+AGENT_RUN_TIMEOUT = float(os.getenv("AGENT_RUN_TIMEOUT", "120"))
+
+# Queued agent runs (app.services.agent_worker). AGENT_WORKERS runs execute
+# at once per process; a run whose worker died is retried after its lease.
+AGENT_WORKER_ENABLED = os.getenv("AGENT_WORKER_ENABLED", "true").lower() == "true"
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "2"))
+AGENT_POLL_INTERVAL = float(os.getenv("AGENT_POLL_INTERVAL", "2"))
+AGENT_RUN_MAX_ATTEMPTS = int(os.getenv("AGENT_RUN_MAX_ATTEMPTS", "3"))
+# Renewed every third of its length while the run is in progress
+AGENT_RUN_LEASE_SECONDS = float(os.getenv("AGENT_RUN_LEASE_SECONDS", "60"))
+AGENT_MAX_QUEUED_PER_USER = int(os.getenv("AGENT_MAX_QUEUED_PER_USER", "10"))
+
+# Bulk task endpoints (/api/tasks/bulk): rows per request
+TASK_BULK_MAX = int(os.getenv("TASK_BULK_MAX", "500"))
@@ -0,0 +1,105 @@
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Set
+
+from app.core import config
+from app.core.tokens import count_tokens, truncate_tokens
+from app.core.vectorstore import VectorMatch
+
+_WORD = re.compile(r"\w+")
+
+# Chunks cut shorter than this aren't worth including
+_MIN_TRUNCATED_TOKENS = 32
+_SEPARATOR = "\n\n"
+
+
+@dataclass
+class BuiltContext:
+    text: str = ""
+    tokens: int = 0
+    used: List[str] = field(default_factory=list)  # vector IDs, in prompt order
+    duplicates: int = 0
+    dropped: int = 0
+    truncated: bool = False
+
+
+def token_budget(model: Optional[str] = None) -> int:
+    return int(config.CONTEXT_TOKEN_BUDGETS.get(model, config.CONTEXT_TOKEN_BUDGET))
+
+
+def _shingles(text: str, size: int = 3) -> Set[tuple]:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _similarity(a: Set[tuple], b: Set[tuple]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _rank_score(match: VectorMatch, now: float) -> float:
+    # Similarity, boosted by up to CONTEXT_RECENCY_WEIGHT for fresh memories
+    timestamp = (match.metadata or {}).get("timestamp")
+    if not timestamp or not config.CONTEXT_RECENCY_WEIGHT:
+        return match.score
+    age_days = max(0.0, now - float(timestamp)) / 86400
+    freshness = 0.5 ** (age_days / config.CONTEXT_RECENCY_HALF_LIFE_DAYS)
+    return match.score * (1 + config.CONTEXT_RECENCY_WEIGHT * freshness)
+
+
+def build_context(
+    matches: Iterable[VectorMatch],
+    budget: Optional[int] = None,
+    now: Optional[float] = None,
+) -> BuiltContext:
+    """
+    Turns retrieved matches into a prompt context of at most `budget` tokens
+    (CONTEXT_TOKEN_BUDGET by default).
+
+    Matches are reranked by similarity and recency; near-duplicates (word
+    3-gram Jaccard similarity of at least CONTEXT_DEDUP_THRESHOLD to a chunk
+    already taken) are skipped. Chunks are added best first; the first one
+    that doesn't fit is truncated to the remaining budget and the rest dropped.
+    """
+    budget = config.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    now = time.time() if now is None else now
+    ranked = sorted(
+        (m for m in matches if m.metadata and m.metadata.get("text")),
+        key=lambda m: _rank_score(m, now),
+        reverse=True
+    )
+
+    built = BuiltContext()
+    parts: List[str] = []
+    taken: List[Set[tuple]] = []
+    separator_tokens = count_tokens(_SEPARATOR)
+    for i, match in enumerate(ranked):
+        text = match.metadata["text"].strip()
+        shingles = _shingles(text)
+        if any(_similarity(shingles, other) >= config.CONTEXT_DEDUP_THRESHOLD for other in taken):
+            built.duplicates += 1
+            continue
+
+        remaining = budget - built.tokens - (separator_tokens if parts else 0)
+        tokens = count_tokens(text)
+        if tokens > remaining:
+            if remaining >= _MIN_TRUNCATED_TOKENS:
+                text = truncate_tokens(text, remaining)
+                tokens = count_tokens(text)
+                built.truncated = True
+            else:
+                built.dropped = len(ranked) - i
+                break
+
+        built.tokens += tokens + (separator_tokens if parts else 0)
+        parts.append(text)
+        taken.append(shingles)
+        built.used.append(match.id)
+        if built.truncated:
+            built.dropped = len(ranked) - i - 1
+            break
+
+    built.text = _SEPARATOR.join(parts)
+    return built
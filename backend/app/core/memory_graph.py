@@ -0,0 +1,183 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.vectorstore import VectorMatch
+
+# (memory_id, weight)
+Edge = Tuple[str, float]
+
+
+class MemoryGraph:
+    """
+    Weighted graph of related memories, stored as fixed-width adjacency
+    arrays: row i of `neighbors` holds the int32 node indices of node i's
+    strongest `max_degree` links (-1 marks a free slot) and the same row of
+    `weights` their float32 weights. That is 8 bytes per edge with no
+    per-edge Python objects, a neighbour lookup is a single row read, and
+    adding a node or an edge never rebuilds the arrays (they grow by
+    doubling).
+
+    Thread-safe. Memory IDs are mapped to node indices on first sight.
+    """
+
+    def __init__(self, max_degree: int = 16, capacity: int = 64):
+        self.max_degree = max_degree
+        self.ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.neighbors = np.full((capacity, max_degree), -1, dtype=np.int32)
+        self.weights = np.zeros((capacity, max_degree), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def edge_count(self) -> int:
+        return int(np.count_nonzero(self.neighbors[:len(self.ids)] >= 0))
+
+    @property
+    def nbytes(self) -> int:
+        return self.neighbors.nbytes + self.weights.nbytes
+
+    def _node(self, memory_id: str) -> int:
+        node = self._index.get(memory_id)
+        if node is None:
+            node = self._index[memory_id] = len(self.ids)
+            self.ids.append(memory_id)
+            if node >= self.neighbors.shape[0]:
+                capacity = self.neighbors.shape[0] * 2
+                neighbors = np.full((capacity, self.max_degree), -1, dtype=np.int32)
+                weights = np.zeros((capacity, self.max_degree), dtype=np.float32)
+                neighbors[:node] = self.neighbors[:node]
+                weights[:node] = self.weights[:node]
+                self.neighbors, self.weights = neighbors, weights
+        return node
+
+    def _link(self, source: int, target: int, weight: float):
+        row, row_weights = self.neighbors[source], self.weights[source]
+        existing = np.flatnonzero(row == target)
+        if existing.size:
+            row_weights[existing[0]] = max(row_weights[existing[0]], weight)
+            return
+        free = np.flatnonzero(row < 0)
+        if free.size:
+            slot = free[0]
+        else:
+            # Full: the new edge replaces the weakest one if it is stronger
+            slot = int(np.argmin(row_weights))
+            if row_weights[slot] >= weight:
+                return
+        row[slot], row_weights[slot] = target, weight
+
+    def add_edges(self, memory_id: str, edges: Iterable[Edge], symmetric: bool = True):
+        """
+        Links memory_id to each (neighbour, weight). With symmetric, the
+        neighbours are linked back, so older memories learn about newer ones.
+        """
+        with self._lock:
+            source = self._node(memory_id)
+            for neighbor_id, weight in edges:
+                if neighbor_id == memory_id:
+                    continue
+                target = self._node(neighbor_id)
+                self._link(source, target, weight)
+                if symmetric:
+                    self._link(target, source, weight)
+
+    def remove(self, memory_id: str):
+        """
+        Drops all of memory_id's links; its node index is kept for reuse.
+        """
+        with self._lock:
+            node = self._index.get(memory_id)
+            if node is None:
+                return
+            self.neighbors[node] = -1
+            self.weights[node] = 0
+            used = self.neighbors[:len(self.ids)]
+            incoming = used == node
+            used[incoming] = -1
+            self.weights[:len(self.ids)][incoming] = 0
+
+    def neighbors_of(self, memory_id: str, limit: Optional[int] = None) -> List[Edge]:
+        """
+        memory_id's neighbours, strongest first.
+        """
+        with self._lock:
+            node = self._index.get(memory_id)
+            if node is None:
+                return []
+            row, row_weights = self.neighbors[node].copy(), self.weights[node].copy()
+        used = row >= 0
+        row, row_weights = row[used], row_weights[used]
+        order = np.argsort(-row_weights, kind="stable")[:limit]
+        return [(self.ids[row[i]], float(row_weights[i])) for i in order]
+
+    def expand(self, seeds: Dict[str, float], limit: int) -> List[Edge]:
+        """
+        One-hop expansion: the best `limit` neighbours of the seed memories
+        that aren't seeds themselves. A neighbour scores its seed's score
+        times the edge weight, keeping the best path.
+        """
+        scores: Dict[str, float] = {}
+        for seed_id, seed_score in seeds.items():
+            for neighbor_id, weight in self.neighbors_of(seed_id):
+                if neighbor_id in seeds:
+                    continue
+                score = seed_score * weight
+                if score > scores.get(neighbor_id, 0.0):
+                    scores[neighbor_id] = score
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def memory_id_of(match: VectorMatch) -> str:
+    # Vector IDs are "<memory_id>#<chunk>"; see app.services.memory_ingestion
+    return (match.metadata or {}).get("memory_id") or match.id.split("#", 1)[0]
+
+
+def similar_edges(memory_id: str, matches: Iterable[VectorMatch], k: int, min_score: float) -> List[Edge]:
+    """
+    The k memories most similar to memory_id, from a vector query with one
+    of its embeddings. Chunk matches are collapsed to their best score per memory.
+    """
+    best: Dict[str, float] = {}
+    for match in matches:
+        neighbor_id = memory_id_of(match)
+        if neighbor_id != memory_id and match.score >= min_score and match.score > best.get(neighbor_id, 0.0):
+            best[neighbor_id] = float(match.score)
+    return sorted(best.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def tag_edges(
+    memory_id: str,
+    tags: Optional[Sequence[str]],
+    candidates: Iterable[Tuple[str, Optional[Sequence[str]]]],
+    k: int,
+) -> List[Edge]:
+    """
+    The k candidates (memory_id, tags) sharing the most tags with memory_id,
+    weighted by the Jaccard similarity of the tag sets.
+    """
+    own = {tag.lower() for tag in tags or []}
+    if not own:
+        return []
+    scored = []
+    for candidate_id, candidate_tags in candidates:
+        other = {tag.lower() for tag in candidate_tags or []}
+        shared = len(own & other)
+        if candidate_id != memory_id and shared:
+            scored.append((candidate_id, shared / len(own | other)))
+    return sorted(scored, key=lambda item: item[1], reverse=True)[:k]
+
+
+def merge_edges(*edge_lists: Iterable[Edge]) -> Dict[str, float]:
+    """
+    Union of edge lists, keeping each neighbour's strongest weight.
+    """
+    merged: Dict[str, float] = {}
+    for edges in edge_lists:
+        for neighbor_id, weight in edges:
+            merged[neighbor_id] = max(weight, merged.get(neighbor_id, 0.0))
+    return merged
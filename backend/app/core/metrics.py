@@ -0,0 +1,46 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry: monotonic counters plus
+    count/sum/min/max summaries. Exposed as JSON at GET /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = {"count": 1, "sum": value, "min": value, "max": value}
+                return
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["min"] = min(summary["min"], value)
+            summary["max"] = max(summary["max"], value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            summaries = {
+                name: {**s, "avg": s["sum"] / s["count"]}
+                for name, s in self._summaries.items()
+            }
+            return {"counters": dict(self._counters), "summaries": summaries}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+metrics = Metrics()
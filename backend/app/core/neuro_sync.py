@@ -0,0 +1,94 @@
+# Keyword mood detection. Every term of every emotion is compiled into one
+# alternation regex with word boundaries, so a text is scored against all
+# emotions in a single pass. A modifier right before a term scales it
+# ("very stressed" counts more, "not happy" doesn't count at all).
+import re
+from typing import Dict, Iterable, List, Optional
+
+# emotion -> {term: weight}
+LEXICON: Dict[str, Dict[str, float]] = {
+    "happy": {
+        "happy": 1, "happier": 1, "joy": 1, "joyful": 1, "excited": 1, "exciting": 1,
+        "great": 0.75, "good": 0.5, "awesome": 1, "love": 1, "loving": 1, "glad": 1,
+        "amazing": 1, "wonderful": 1, "thrilled": 1.5, "delighted": 1.5,
+    },
+    "sad": {
+        "sad": 1, "depressed": 1.5, "unhappy": 1, "bad": 0.5, "terrible": 1, "cry": 1,
+        "crying": 1, "grief": 1.5, "lonely": 1, "miserable": 1.5, "heartbroken": 1.5, "down": 0.5,
+    },
+    "angry": {
+        "angry": 1, "mad": 1, "furious": 1.5, "hate": 1, "rage": 1.5, "annoyed": 0.75,
+        "irritated": 0.75, "frustrated": 1, "pissed": 1,
+    },
+    "anxious": {
+        "anxious": 1, "anxiety": 1, "nervous": 1, "worried": 1, "worry": 1, "worrying": 1,
+        "scared": 1, "fear": 1, "afraid": 1, "panic": 1.5, "panicking": 1.5,
+    },
+    "stressed": {
+        "stress": 1, "stressed": 1, "stressful": 1, "overwhelmed": 1.5, "deadline": 0.75,
+        "deadlines": 0.75, "busy": 0.5, "swamped": 1, "burnout": 1.5, "exhausted": 1,
+    },
+    "neutral": {
+        "okay": 0.5, "ok": 0.5, "fine": 0.5, "normal": 0.5,
+    },
+}
+
+# Multiplier applied to a term directly preceded by the modifier
+MODIFIERS: Dict[str, float] = {
+    "very": 1.5, "so": 1.5, "really": 1.5, "extremely": 2, "super": 1.5, "incredibly": 2,
+    "a bit": 0.5, "slightly": 0.5, "kinda": 0.75, "somewhat": 0.75,
+    "not": 0, "never": 0, "no": 0, "don't": 0, "dont": 0, "isn't": 0, "wasn't": 0, "not that": 0,
+}
+
+_TERMS: Dict[str, tuple] = {
+    term: (emotion, weight)
+    for emotion, terms in LEXICON.items()
+    for term, weight in terms.items()
+}
+
+
+def _alternation(words: Iterable[str]) -> str:
+    # Longest first, so "not that" wins over "not"
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_PATTERN = re.compile(
+    rf"(?:\b(?P<modifier>{_alternation(MODIFIERS)})\s+)?\b(?P<term>{_alternation(_TERMS)})\b"
+    r"(?P<emphasis>!*)",
+    re.IGNORECASE,
+)
+
+
+def score_mood(text: str) -> Dict[str, float]:
+    """
+    Weighted keyword hits per emotion. Emotions without hits are omitted.
+    """
+    scores: Dict[str, float] = {}
+    for match in _PATTERN.finditer(text):
+        emotion, weight = _TERMS[match.group("term").lower()]
+        modifier = match.group("modifier")
+        if modifier:
+            weight *= MODIFIERS[modifier.lower()]
+        if match.group("emphasis") or (match.group("term").isupper() and len(match.group("term")) > 1):
+            weight *= 1.5
+        if weight:
+            scores[emotion] = scores.get(emotion, 0.0) + weight
+    return scores
+
+
+def match_mood(text: str) -> Optional[Dict[str, object]]:
+    """
+    Returns {emotion, intensity (1-10)} for the highest-scoring emotion, or
+    None when no keyword matched. A single plain hit has intensity 5.
+    """
+    scores = score_mood(text)
+    if not scores:
+        return None
+    # Ties go to the emotion listed first in LEXICON
+    emotion = max(scores, key=lambda e: (scores[e], -list(LEXICON).index(e)))
+    intensity = max(1, min(10, round(3 + 2 * scores[emotion])))
+    return {"emotion": emotion, "intensity": intensity}
+
+
+def match_moods(texts: Iterable[str]) -> List[Optional[Dict[str, object]]]:
+    return [match_mood(text) for text in texts]
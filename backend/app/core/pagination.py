@@ -0,0 +1,44 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+
+def encode_cursor(timestamp: datetime, row_id: str) -> str:
+    """
+    Opaque keyset cursor for (timestamp, id) ordered listings.
+    """
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(row_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def stream_json_array(items: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Encodes items as a JSON array one element at a time.
+    """
+    yield "["
+    for i, item in enumerate(items):
+        yield ("," if i else "") + json.dumps(item, default=str)
+    yield "]"
+
+
+def stream_json_page(key: str, items: Iterable[Dict[str, Any]], next_cursor: Optional[str]) -> Iterator[str]:
+    """
+    Encodes {key: [...items], "next_cursor": ...} incrementally.
+    """
+    yield json.dumps(key).join(["{", ":"])
+    yield from stream_json_array(items)
+    yield f',"next_cursor":{json.dumps(next_cursor)}}}'
@@ -0,0 +1,42 @@
+from typing import Any, Dict, Optional
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.core.metrics import metrics
+
+ANONYMOUS_USER = {"id": "anonymous", "email": "guest@example.com", "name": "Guest"}
+
+# Resolved users by email, so authenticated requests usually skip the users
+# table entirely. Entries are invalidated on writes in this process; the TTL
+# bounds staleness for writes made by other workers.
+_user_cache = TTLCache(maxsize=config.AUTH_CACHE_SIZE, ttl=config.AUTH_CACHE_TTL)
+
+
+def email_from_token(token: str) -> Optional[str]:
+    # Simple token parsing for MVP: "demo-token-{email}"
+    if token.startswith("demo-token-"):
+        return token[len("demo-token-"):]
+    return None
+
+
+def user_to_dict(user) -> Dict[str, Any]:
+    return {
+        "id": user.id,
+        "email": user.email,
+        "name": user.name,
+        "personality_config": user.personality_config
+    }
+
+
+def get_cached_user(email: str) -> Optional[Dict[str, Any]]:
+    user = _user_cache.get(email)
+    metrics.incr("auth_cache.hits" if user is not None else "auth_cache.misses")
+    return dict(user) if user is not None else None
+
+
+def cache_user(user: Dict[str, Any]):
+    _user_cache.set(user["email"], dict(user))
+
+
+def invalidate_user(email: str):
+    _user_cache.pop(email)
@@ -0,0 +1,71 @@
+import re
+from typing import Iterator, List, Tuple
+
+from app.core.tokens import count_tokens
+
+# Coarsest first: paragraphs, lines, sentences, words
+_SEPARATORS = ["\n\n", "\n", r"(?<=[.!?])\s+", r"\s+"]
+
+
+def _split_keep(text: str, separator: str) -> List[str]:
+    # Split after each separator so pieces concatenate back to the original text
+    parts, last = [], 0
+    for match in re.finditer(separator, text):
+        if match.end() > last:
+            parts.append(text[last:match.end()])
+            last = match.end()
+    if last < len(text):
+        parts.append(text[last:])
+    return parts
+
+
+def _units(text: str, max_tokens: int, level: int = 0) -> Iterator[Tuple[str, int]]:
+    """
+    Yields (piece, token_count) with every piece at most max_tokens long,
+    breaking on the coarsest separator that gets it there.
+    """
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        yield text, tokens
+        return
+
+    if level >= len(_SEPARATORS):
+        # A single "word" longer than a chunk: fall back to fixed-size slices
+        step = max(1, len(text) * max_tokens // tokens)
+        for start in range(0, len(text), step):
+            piece = text[start:start + step]
+            yield piece, count_tokens(piece)
+        return
+
+    for part in _split_keep(text, _SEPARATORS[level]):
+        yield from _units(part, max_tokens, level + 1)
+
+
+def split_text(text: str, chunk_tokens: int = 512, overlap_tokens: int = 64) -> List[str]:
+    """
+    Splits text into chunks of at most ~chunk_tokens tokens on natural
+    boundaries, repeating up to overlap_tokens of trailing context at the
+    start of the next chunk.
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+
+    text = text.strip()
+    if not text:
+        return []
+
+    chunks: List[str] = []
+    window: List[Tuple[str, int]] = []
+    window_tokens = 0
+    for piece, tokens in _units(text, chunk_tokens):
+        if window and window_tokens + tokens > chunk_tokens:
+            chunks.append("".join(p for p, _ in window).strip())
+            # Keep the tail of the previous chunk as overlap, as long as it fits
+            while window and (window_tokens > overlap_tokens or window_tokens + tokens > chunk_tokens):
+                window_tokens -= window.pop(0)[1]
+        window.append((piece, tokens))
+        window_tokens += tokens
+
+    if window:
+        chunks.append("".join(p for p, _ in window).strip())
+    return [chunk for chunk in chunks if chunk]
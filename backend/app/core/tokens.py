@@ -0,0 +1,37 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional; fall back to a character-based estimate
+    tiktoken = None
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str = DEFAULT_ENCODING):
+    return tiktoken.get_encoding(name) if tiktoken else None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count for OpenAI models. Exact when tiktoken is installed,
+    otherwise estimated at ~4 characters per token.
+    """
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cuts text down to at most max_tokens tokens (as counted by count_tokens).
+    """
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text if count_tokens(text) <= max_tokens else text[:(max_tokens - 1) * 4]
@@ -0,0 +1,436 @@
+import asyncio
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import numpy as np
+
+from app.core import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: the local store must then have a single writer process
+    fcntl = None
+
+# Namespaces smaller than this are never compacted
+_COMPACT_MIN_ROWS = 1024
+
+
+@dataclass
+class VectorMatch:
+    id: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class VectorStore(ABC):
+    """
+    Interface for the vector index behind memory retrieval.
+
+    Vectors live in namespaces; an empty namespace is the default one.
+    """
+
+    @abstractmethod
+    def upsert(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        metadata: List[Dict[str, Any]],
+        namespace: str = "",
+    ) -> int:
+        pass
+
+    @abstractmethod
+    def query(self, vector: List[float], top_k: int = 5, namespace: str = "") -> List[VectorMatch]:
+        pass
+
+    @abstractmethod
+    def delete(self, ids: List[str], namespace: str = "") -> None:
+        pass
+
+    async def aupsert(self, ids, vectors, metadata, namespace: str = "") -> int:
+        return await asyncio.to_thread(self.upsert, ids, vectors, metadata, namespace)
+
+    async def aquery(self, vector: List[float], top_k: int = 5, namespace: str = "") -> List[VectorMatch]:
+        return await asyncio.to_thread(self.query, vector, top_k, namespace)
+
+    async def adelete(self, ids: List[str], namespace: str = "") -> None:
+        await asyncio.to_thread(self.delete, ids, namespace)
+
+
+class PineconeVectorStore(VectorStore):
+    """
+    Adapter over a Pinecone index. The client is synchronous, so the async
+    methods run it in the default thread pool.
+    """
+
+    def __init__(self, index_name: Optional[str] = None):
+        self.index_name = index_name
+
+    @property
+    def index(self):
+        from app.core.clients import clients
+
+        return clients.index(self.index_name)
+
+    def upsert(self, ids, vectors, metadata, namespace: str = "") -> int:
+        items = [
+            {"id": vector_id, "values": vector, "metadata": meta}
+            for vector_id, vector, meta in zip(ids, vectors, metadata)
+        ]
+        response = self.index.upsert(vectors=items, namespace=namespace)
+        return response.upserted_count
+
+    def query(self, vector, top_k: int = 5, namespace: str = "") -> List[VectorMatch]:
+        results = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            namespace=namespace
+        )
+        return [
+            VectorMatch(id=match.id, score=match.score, metadata=match.metadata or {})
+            for match in results.matches
+        ]
+
+    def delete(self, ids, namespace: str = "") -> None:
+        self.index.delete(ids=ids, namespace=namespace)
+
+
+class _IVFIndex:
+    """
+    Inverted-file index: rows are bucketed by their nearest k-means centroid
+    and a query only scores the rows in its `nprobe` closest buckets.
+    """
+
+    def __init__(self, matrix: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        n = matrix.shape[0]
+        sample = matrix[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignment == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        self.centroids = centroids
+        self.size = n
+        assignment = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 65536):
+            block = matrix[start:start + 65536]
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable").astype(np.int64)
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(nlist)]
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.lists))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[c] for c in probes])
+
+
+class _Namespace:
+    """
+    One namespace of the local store, persisted in its own directory:
+
+    - vectors[.N].f32: append-only float32 matrix of L2-normalised rows, memory-mapped for queries
+    - records[.N].jsonl: append-only log of {id, row, metadata} and {id, deleted} records
+    - manifest.json: vector dimension and the generation N of the files above
+
+    Updating a vector appends a new row and retires the old one, so the IVF
+    index never files it under a stale bucket. Once retired rows exceed
+    LOCAL_VECTOR_COMPACT_RATIO of the file, the live rows are rewritten to the
+    next generation. Processes sharing the directory serialise on an flock()
+    of its lock file and catch up on each other's writes before every
+    operation.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self._lock_file = None
+        self._reset()
+
+    def _reset(self):
+        self.dim: Optional[int] = None
+        self.generation = 0
+        self.ids: List[Optional[str]] = []
+        self.metadata: List[Optional[Dict[str, Any]]] = []
+        self.rows: Dict[str, int] = {}
+        self.matrix: Optional[np.ndarray] = None
+        self.ivf: Optional[_IVFIndex] = None
+        self._records_offset = 0
+
+    @property
+    def count(self) -> int:
+        # Rows in the vector file, including retired ones
+        return 0 if self.matrix is None else self.matrix.shape[0]
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _data_files(self, generation: int):
+        suffix = f".{generation}" if generation else ""
+        return self._file(f"vectors{suffix}.f32"), self._file(f"records{suffix}.jsonl")
+
+    @contextmanager
+    def locked(self, exclusive: bool = False):
+        """
+        Holds the namespace for this thread and, where flock() is available,
+        for this process, then brings the in-memory state up to date.
+        """
+        with self.lock:
+            if fcntl is not None and self._lock_file is None and (exclusive or os.path.isdir(self.path)):
+                os.makedirs(self.path, exist_ok=True)
+                self._lock_file = open(self._file("lock"), "a")
+            if fcntl is not None and self._lock_file is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._sync()
+                yield self
+            finally:
+                if fcntl is not None and self._lock_file is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _sync(self):
+        manifest_file = self._file("manifest.json")
+        if not os.path.exists(manifest_file):
+            return
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+        if manifest["dim"] != self.dim or manifest.get("generation", 0) != self.generation:
+            # First load, or another process compacted the namespace
+            self._reset()
+            self.dim = manifest["dim"]
+            self.generation = manifest.get("generation", 0)
+
+        vectors_file, records_file = self._data_files(self.generation)
+        if os.path.exists(records_file):
+            with open(records_file, "rb") as f:
+                f.seek(self._records_offset)
+                data = f.read()
+            # A line without its newline is a write that was cut short
+            complete = data[:data.rfind(b"\n") + 1]
+            for line in complete.splitlines():
+                self._apply(json.loads(line))
+            self._records_offset += len(complete)
+        self._remap(vectors_file)
+
+        # Reconcile the log with the vector file after an interrupted write:
+        # records without a vector are dropped, vectors without a record are dead rows.
+        rows = self.count
+        if len(self.ids) > rows:
+            del self.ids[rows:], self.metadata[rows:]
+            self.rows = {vector_id: row for vector_id, row in self.rows.items() if row < rows}
+        self._grow(rows)
+
+    def _grow(self, size: int):
+        while len(self.ids) < size:
+            self.ids.append(None)
+            self.metadata.append(None)
+
+    def _apply(self, record: Dict[str, Any]):
+        row = self.rows.pop(record["id"], None)
+        if row is not None:
+            self.ids[row] = None
+            self.metadata[row] = None
+        if record.get("deleted"):
+            return
+
+        row = record["row"]
+        self._grow(row + 1)
+        self.ids[row] = record["id"]
+        self.metadata[row] = record["metadata"]
+        self.rows[record["id"]] = row
+
+    def _append_records(self, records: List[Dict[str, Any]]):
+        data = "".join(json.dumps(record) + "\n" for record in records).encode()
+        with open(self._data_files(self.generation)[1], "ab") as f:
+            # Drop the tail of a write that was cut short
+            f.truncate(self._records_offset)
+            f.write(data)
+        self._records_offset += len(data)
+        for record in records:
+            self._apply(record)
+
+    def _remap(self, vectors_file: str):
+        rows = os.path.getsize(vectors_file) // (4 * self.dim) if os.path.exists(vectors_file) else 0
+        if rows != self.count:
+            self.matrix = np.memmap(vectors_file, dtype=np.float32, mode="r", shape=(rows, self.dim)) if rows else None
+
+    def _write_manifest(self, dim: int, generation: int):
+        # Replaced atomically: the manifest is what switches readers to a new generation
+        tmp = self._file("manifest.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dim": dim, "generation": generation}, f)
+        os.replace(tmp, self._file("manifest.json"))
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, metadata: List[Dict[str, Any]]) -> int:
+        if self.dim is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._write_manifest(vectors.shape[1], 0)
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} does not match namespace dimension {self.dim}")
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+        # Last write wins for ids repeated within one batch
+        latest = {vector_id: (vector, meta) for vector_id, vector, meta in zip(ids, vectors, metadata)}
+        records = [
+            {"id": vector_id, "row": self.count + i, "metadata": meta}
+            for i, (vector_id, (_, meta)) in enumerate(latest.items())
+        ]
+
+        # Vectors first, then the log: a crash in between leaves only dead rows
+        vectors_file = self._data_files(self.generation)[0]
+        with open(vectors_file, "ab") as f:
+            f.write(np.asarray([vector for vector, _ in latest.values()], dtype=np.float32).tobytes())
+        self._remap(vectors_file)
+        self._append_records(records)
+        self._maybe_compact()
+        return len(records)
+
+    def delete(self, ids: List[str]):
+        records = [{"id": vector_id, "deleted": True} for vector_id in ids if vector_id in self.rows]
+        if records:
+            self._append_records(records)
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        dead = self.count - len(self.rows)
+        if self.count >= _COMPACT_MIN_ROWS and dead > self.count * config.LOCAL_VECTOR_COMPACT_RATIO:
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrites the live rows to the next generation's files and removes the
+        current ones.
+        """
+        live = sorted(self.rows.items(), key=lambda item: item[1])
+        old_files = self._data_files(self.generation)
+        generation = self.generation + 1
+        vectors_file, records_file = self._data_files(generation)
+
+        with open(vectors_file, "wb") as f:
+            for start in range(0, len(live), 65536):
+                rows = [row for _, row in live[start:start + 65536]]
+                f.write(np.ascontiguousarray(self.matrix[rows]).tobytes())
+        with open(records_file, "w") as f:
+            f.writelines(
+                json.dumps({"id": vector_id, "row": i, "metadata": self.metadata[row]}) + "\n"
+                for i, (vector_id, row) in enumerate(live)
+            )
+        self._write_manifest(self.dim, generation)
+
+        self._reset()
+        self._sync()
+        for name in old_files:
+            try:
+                os.remove(name)
+            except OSError:
+                # Missing, or still mapped on a platform that won't unlink it
+                pass
+
+    def query(self, vector: np.ndarray, top_k: int) -> List[VectorMatch]:
+        if self.matrix is None or not self.rows:
+            return []
+
+        query = vector / (np.linalg.norm(vector) or 1.0)
+        n = self.count
+
+        if n >= config.LOCAL_VECTOR_IVF_THRESHOLD:
+            if self.ivf is None or n > self.ivf.size * 1.2:
+                nlist = max(1, int(np.sqrt(n)))
+                self.ivf = _IVFIndex(self.matrix, nlist=nlist)
+            # Rows appended since the IVF was built are always scanned
+            candidates = np.concatenate([
+                self.ivf.candidates(query, config.LOCAL_VECTOR_IVF_NPROBE),
+                np.arange(self.ivf.size, n),
+            ])
+            scores = self.matrix[candidates] @ query
+        else:
+            candidates = None
+            scores = self.matrix @ query
+
+        matches = []
+        k = min(len(scores), top_k + (n - len(self.rows)))  # over-fetch past deleted rows
+        best = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        for i in best[np.argsort(-scores[best])]:
+            row = int(candidates[i]) if candidates is not None else int(i)
+            if self.ids[row] is None:
+                continue
+            matches.append(VectorMatch(id=self.ids[row], score=float(scores[i]), metadata=self.metadata[row] or {}))
+            if len(matches) == top_k:
+                break
+        return matches
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store: one memory-mapped float32 matrix per namespace
+    under `root`. Small namespaces are scored exhaustively with one matrix
+    product; namespaces above LOCAL_VECTOR_IVF_THRESHOLD rows use an IVF index.
+    Several processes may share `root` on platforms with flock().
+    """
+
+    def __init__(self, root: str = config.LOCAL_VECTOR_STORE_DIR):
+        self.root = root
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            with self._lock:
+                ns = self._namespaces.get(namespace)
+                if ns is None:
+                    dirname = "ns-" + quote(namespace, safe="") if namespace else "default"
+                    ns = _Namespace(os.path.join(self.root, dirname))
+                    self._namespaces[namespace] = ns
+        return ns
+
+    def upsert(self, ids, vectors, metadata, namespace: str = "") -> int:
+        if not ids:
+            return 0
+        ns = self._namespace(namespace)
+        with ns.locked(exclusive=True):
+            return ns.upsert(list(ids), np.asarray(vectors, dtype=np.float32), list(metadata))
+
+    def query(self, vector, top_k: int = 5, namespace: str = "") -> List[VectorMatch]:
+        ns = self._namespace(namespace)
+        with ns.locked():
+            return ns.query(np.asarray(vector, dtype=np.float32), top_k)
+
+    def delete(self, ids, namespace: str = "") -> None:
+        ns = self._namespace(namespace)
+        with ns.locked(exclusive=True):
+            ns.delete(list(ids))
+
+
+_vector_store: Optional[VectorStore] = None
+
+
+def get_vector_store() -> VectorStore:
+    """
+    Process-wide vector store selected by VECTOR_STORE_BACKEND ("pinecone" or "local").
+    """
+    global _vector_store
+    if _vector_store is None:
+        if config.VECTOR_STORE_BACKEND == "local":
+            _vector_store = LocalVectorStore()
+        elif config.VECTOR_STORE_BACKEND == "pinecone":
+            _vector_store = PineconeVectorStore()
+        else:
+            raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {config.VECTOR_STORE_BACKEND}")
+    return _vector_store
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, JSON
+from sqlalchemy import Column, String, Text, DateTime, JSON, Integer, Float, Index
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from datetime import datetime
@@ -8,13 +8,51 @@ class Memory(Base):
     __tablename__ = "memories"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, index=True)
+    user_id = Column(String)
     text = Column(Text)
     tags = Column(JSON) # Storing tags as JSON array
     emotion = Column(String)
     timestamp = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Serves per-user lookups and keyset pagination ordered by (timestamp, id)
+    __table_args__ = (
+        Index("ix_memories_user_timestamp_id", "user_id", "timestamp", "id"),
+    )
+
+class VectorOutbox(Base):
+    """
+    Pending vector-store work for a memory, written in the same transaction as
+    the memory itself and drained by app.services.outbox_worker.
+    """
+    __tablename__ = "vector_outbox"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    memory_id = Column(String, index=True)
+    status = Column(String, default="pending") # pending, processing, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_vector_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+class MemoryLink(Base):
+    """
+    Edge of the memory graph (app.core.memory_graph): neighbor_id is one of
+    memory_id's nearest neighbours or shares tags with it. Both directions
+    are stored, so a memory's related memories are one index range.
+    """
+    __tablename__ = "memory_links"
+
+    memory_id = Column(String, primary_key=True)
+    neighbor_id = Column(String, primary_key=True)
+    user_id = Column(String, index=True)
+    score = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Subscription(Base):
     __tablename__ = "subscriptions"
 
@@ -40,9 +78,111 @@ class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, index=True)
+    user_id = Column(String)
     title = Column(String)
     status = Column(String, default="pending") # pending, in_progress, completed
     priority = Column(String, default="medium")
     due_date = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Serves per-user lookups and keyset pagination ordered by (created_at, id)
+    __table_args__ = (
+        Index("ix_tasks_user_created_at_id", "user_id", "created_at", "id"),
+    )
+
+class File(Base):
+    """
+    An uploaded file. The bytes live in content-addressed storage under
+    UPLOAD_DIR (app.services.file_storage), so several rows can share a blob.
+    """
+    __tablename__ = "files"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String)
+    filename = Column(String)
+    size = Column(Integer)
+    sha256 = Column(String, index=True)
+    mime_type = Column(String)
+    status = Column(String, default="uploaded") # uploaded, processing, ingested, failed
+    chunks_total = Column(Integer, nullable=True) # Known once parsing finishes
+    chunks_ingested = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    lease_until = Column(DateTime, nullable=True) # Processing past its lease was abandoned (e.g. a crash)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Serves per-user listings ordered by (created_at, id)
+    __table_args__ = (
+        Index("ix_files_user_created_at_id", "user_id", "created_at", "id"),
+    )
+
+class Conversation(Base):
+    """
+    A chat session. Messages older than summarized_until are folded into
+    `summary` (app.services.conversation_store), so prompts stay bounded.
+    """
+    __tablename__ = "conversations"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, index=True)
+    title = Column(String, nullable=True)
+    summary = Column(Text, nullable=True)
+    summarized_until = Column(Integer, default=0) # Last message seq folded into the summary
+    message_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ConversationMessage(Base):
+    """
+    Append-only conversation log; seq numbers messages 1, 2, ... per conversation.
+    """
+    __tablename__ = "conversation_messages"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    conversation_id = Column(String)
+    seq = Column(Integer)
+    role = Column(String) # user, assistant
+    content = Column(Text)
+    tokens = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_conversation_messages_conversation_seq", "conversation_id", "seq", unique=True),
+    )
+
+class AgentRun(Base):
+    """
+    A queued agent run, executed by app.services.agent_worker.
+    """
+    __tablename__ = "agent_runs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String)
+    agent_id = Column(String)
+    input = Column(Text)
+    context = Column(JSON)
+    status = Column(String, default="queued") # queued, running, succeeded, failed, cancelled
+    attempts = Column(Integer, default=0)
+    lease_until = Column(DateTime, nullable=True) # A running run past its lease is retried
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    result = Column(JSON, nullable=True)
+    suggested_tasks = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_agent_runs_status_created_at", "status", "created_at"),
+        Index("ix_agent_runs_user_created_at_id", "user_id", "created_at", "id"),
+    )
+
+
+def create_tables(bind):
+    """
+    Creates missing tables, and indexes added to tables that already exist.
+    """
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
@@ -1,5 +1,6 @@
-from fastapi import Header, HTTPException, Depends
-from app.database.database import SessionLocal
+from fastapi import Header, HTTPException, Depends, Request
+from typing import Optional
+from app.database.database import SessionLocal, AsyncSessionLocal
 
 def get_db():
     db = SessionLocal()
@@ -8,27 +9,42 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+from app.core.security import ANONYMOUS_USER, cache_user, email_from_token, get_cached_user, user_to_dict
 from app.database import models
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+async def get_current_user(request: Request, authorization: str = Header(None), db: AsyncSession = Depends(get_async_db)):
+    # Resolved once per request; later lookups reuse request.state
+    user = getattr(request.state, "current_user", None)
+    if user is None:
+        user = await _resolve_user(authorization, db)
+        request.state.current_user = user
+    return user
 
-async def get_current_user(authorization: str = Header(None), db: Session = Depends(get_db)):
+async def _resolve_user(authorization: Optional[str], db: AsyncSession) -> dict:
     if not authorization:
         # Return anonymous user for now to avoid breaking existing flows if any
-        return {"id": "anonymous", "email": "guest@example.com", "name": "Guest"}
+        return dict(ANONYMOUS_USER)
     
     token = authorization.replace("Bearer ", "")
+    email = email_from_token(token)
     
-    # Simple token parsing for MVP: "demo-token-{email}"
-    if token.startswith("demo-token-"):
-        email = token.replace("demo-token-", "")
-        user = db.query(models.User).filter(models.User.email == email).first()
+    if email:
+        user = get_cached_user(email)
         if user:
-            return {
-                "id": user.id,
-                "email": user.email,
-                "name": user.name,
-                "personality_config": user.personality_config
-            }
+            return user
+        
+        result = await db.execute(select(models.User).filter(models.User.email == email))
+        db_user = result.scalars().first()
+        if db_user:
+            user = user_to_dict(db_user)
+            cache_user(user)
+            return user
             
     # Fallback or error
-    return {"id": "anonymous", "email": "guest@example.com", "name": "Guest"}
+    return dict(ANONYMOUS_USER)
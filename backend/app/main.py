@@ -1,9 +1,31 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.core import config
+from app.core.clients import clients
+from app.core.metrics import metrics
 from app.routers import chat, memory, agents, auth, files, payments, twin, tasks
+from app.services import file_ingestion
+from app.services.agent_worker import agent_worker
+from app.services.outbox_worker import outbox_worker
 
 
-app = FastAPI(title="EchoOS Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.OUTBOX_WORKER_ENABLED:
+        outbox_worker.start()
+    if config.AGENT_WORKER_ENABLED:
+        agent_worker.start()
+    yield
+    await outbox_worker.stop()
+    await agent_worker.stop()
+    await file_ingestion.shutdown()
+    # Release pooled OpenAI/Pinecone connections
+    await clients.aclose()
+
+
+app = FastAPI(title="EchoOS Backend", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -14,6 +36,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Multipart overhead (boundaries, part headers) allowed on top of UPLOAD_MAX_BYTES
+_UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # /api/files/upload takes an UploadFile, which is spooled in full before
+    # the handler can check its size; refuse oversized bodies before reading them
+    if request.url.path == "/api/files/upload":
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > config.UPLOAD_MAX_BYTES + _UPLOAD_FORM_OVERHEAD:
+            return JSONResponse(status_code=413, content={"detail": f"Upload exceeds the {config.UPLOAD_MAX_BYTES} byte limit"})
+    return await call_next(request)
+
+
 # Mount routers
 # Mount routers
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
@@ -29,3 +66,8 @@ app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
 @app.get("/")
 async def root():
     return {"message": "Welcome to EchoOS API"}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
@@ -1,8 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any, Optional, List
-from app.services.agent_runtime import run_agent_async
-from app.dependencies import get_current_user
+from app.core import config
+from app.database import models
+from app.services import agent_worker
+from app.services.agent_runtime import AGENTS, AgentBusy, agent_runtime, parse_result
+from app.dependencies import get_async_db, get_current_user
+import asyncio
+import json
 
 router = APIRouter()
 
@@ -10,6 +18,7 @@ class AgentRunRequest(BaseModel):
     agent_id: str
     input: str
     context: Optional[Dict[str, Any]] = None
+    stream: bool = False # Stream steps over SSE instead of returning JSON at the end
 
 class Agent(BaseModel):
     id: str
@@ -17,6 +26,7 @@ class Agent(BaseModel):
     description: str
     status: str
 
+
 @router.get("/", response_model=List[Agent])
 async def get_agents(current_user: dict = Depends(get_current_user)):
     """
@@ -44,17 +54,135 @@ async def run_agent_endpoint(
 ):
     """
     Execute a specific agent.
+
+    With "stream": true the response is an SSE stream of `step` events
+    followed by a `result` (or `error`) event; disconnecting cancels the run.
     """
+    # Retrieval is scoped to the caller; never trust a client-supplied user_id
+    context = {**(request.context or {}), "user_id": current_user["id"]}
     try:
-        result_json_str = await run_agent_async(request.agent_id, request.input, request.context)
-        import json
-        try:
-            result_data = json.loads(result_json_str)
-        except json.JSONDecodeError:
-            result_data = {"summary": result_json_str, "suggested_tasks": []}
-            
-        return {"result": result_data, "status": "success"}
+        run = agent_runtime.start(request.agent_id, request.input, context, current_user["id"])
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except AgentBusy as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    if request.stream:
+        async def event_generator():
+            try:
+                async for event, data in run.stream():
+                    if event == "result":
+                        data = {"run_id": run.id, "result": parse_result(data["output"])}
+                    yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                yield "event: done\ndata: [DONE]\n\n"
+            finally:
+                run.cancel()
+
+        return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+    try:
+        result_json_str = await run.task
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Agent run timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {"result": parse_result(result_json_str), "status": "success"}
+
+def _run_status(run: models.AgentRun) -> Dict[str, Any]:
+    return {
+        "run_id": run.id,
+        "agent_id": run.agent_id,
+        "status": run.status,
+        "attempts": run.attempts,
+        "created_at": run.created_at,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "usage": {"prompt_tokens": run.prompt_tokens, "completion_tokens": run.completion_tokens},
+        "error": run.error
+    }
+
+async def _get_run(db: AsyncSession, run_id: str, user_id: str) -> models.AgentRun:
+    run = await db.get(models.AgentRun, run_id)
+    if run is None or run.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+@router.post("/runs", status_code=202)
+async def submit_agent_run(
+    request: AgentRunRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Queue an agent run and return its id right away. Runs are executed by
+    the agent workers; poll GET /runs/{run_id} and fetch the outcome from
+    GET /runs/{run_id}/result.
+    """
+    if request.agent_id not in AGENTS:
+        raise HTTPException(status_code=404, detail=f"Unknown agent: {request.agent_id}")
+
+    pending = (await db.execute(
+        select(func.count())
+        .select_from(models.AgentRun)
+        .filter(
+            models.AgentRun.user_id == current_user["id"],
+            models.AgentRun.status.in_(("queued", "running"))
+        )
+    )).scalar()
+    if pending >= config.AGENT_MAX_QUEUED_PER_USER:
+        raise HTTPException(status_code=429, detail=f"At most {config.AGENT_MAX_QUEUED_PER_USER} agent runs may be pending")
+
+    run = models.AgentRun(
+        user_id=current_user["id"],
+        agent_id=request.agent_id,
+        input=request.input,
+        # user_id is set by the worker from the run's owner
+        context={k: v for k, v in (request.context or {}).items() if k != "user_id"},
+        status="queued",
+        attempts=0
+    )
+    db.add(run)
+    await db.commit()
+    agent_worker.agent_worker.notify()
+    return {"run_id": run.id, "status": run.status}
+
+@router.get("/runs/{run_id}")
+async def get_agent_run(
+    run_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    return _run_status(await _get_run(db, run_id, current_user["id"]))
+
+@router.get("/runs/{run_id}/result")
+async def get_agent_run_result(
+    run_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    The run's result and suggested tasks; 202 with its status while it is
+    still queued or running.
+    """
+    run = await _get_run(db, run_id, current_user["id"])
+    if run.status not in agent_worker.FINISHED:
+        return JSONResponse(status_code=202, content={"run_id": run.id, "status": run.status})
+    return {
+        "run_id": run.id,
+        "status": run.status,
+        "result": run.result,
+        "suggested_tasks": run.suggested_tasks or [],
+        "error": run.error
+    }
+
+@router.post("/runs/{run_id}/cancel")
+async def cancel_agent_run(run_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Cancel a queued run, or a run started with POST /run.
+    """
+    status = await agent_worker.cancel(run_id, current_user["id"])
+    if status is not None:
+        return {"run_id": run_id, "status": status}
+    if not agent_runtime.cancel(run_id, current_user["id"]):
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {"run_id": run_id, "status": "cancelling"}
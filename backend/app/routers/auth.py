@@ -5,8 +5,10 @@ import uuid
 router = APIRouter()
 
 from app.database import models
-from app.dependencies import get_db
-from sqlalchemy.orm import Session
+from app.core.security import invalidate_user
+from app.dependencies import get_async_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 
 class LoginRequest(BaseModel):
@@ -15,9 +17,10 @@ class LoginRequest(BaseModel):
     google_id: str
 
 @router.post("/login")
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     # Check if user exists
-    user = db.query(models.User).filter(models.User.email == request.email).first()
+    result = await db.execute(select(models.User).filter(models.User.email == request.email))
+    user = result.scalars().first()
     
     if not user:
         # Create new user
@@ -27,8 +30,8 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
             name=request.name
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        invalidate_user(user.email)
     
     # Generate a simple token (in real app, use JWT)
     token = f"demo-token-{user.email}"
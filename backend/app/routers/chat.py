@@ -1,12 +1,49 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
-from app.schemas import ChatRequest
+from starlette.background import BackgroundTask
+from app.schemas import ChatRequest, ConversationCreate
 from app.dependencies import get_current_user
+from app.core import config
+from app.core.context_builder import BuiltContext, build_context, token_budget
+from app.core.metrics import metrics
+from app.core.neuro_sync import match_mood
+from app.core.tokens import count_tokens
+from app.services import conversation_store, memory_graph, memory_search
+from app.services.conversation_store import ConversationNotFound
+from app.services.neuro_sync import DEFAULT_MOOD, detect_mood_async
 from app.services.llm_service import llm_service
+import asyncio
 import json
+import time
 
 router = APIRouter()
 
+CHAT_MODEL = "gpt-4o-mini"
+
+
+async def _retrieve_context(text: str, user_id: str) -> BuiltContext:
+    # 1. Hybrid keyword + vector search (short exact queries skip the embedding)
+    matches = await memory_search.search(text, user_id, top_k=config.CONTEXT_TOP_K)
+
+    # 2. Add the matches' graph neighbours; deduplicate and cut to the model's budget
+    matches += await memory_graph.expand_matches(matches, user_id)
+    return build_context(matches, token_budget(CHAT_MODEL))
+
+
+def _cancel(*tasks: asyncio.Task):
+    for task in tasks:
+        task.cancel()
+
+
+def _metadata_event(mood: dict) -> str:
+    metadata = {
+        "mood": mood["emotion"],
+        "intensity": mood["intensity"],
+        "suggested_action": "Take a break" if mood["emotion"] in ("stressed", "anxious") else None
+    }
+    return f"event: metadata\ndata: {json.dumps(metadata)}\n\n"
+
+
 @router.post("/")
 async def chat_endpoint(
     request: ChatRequest,
@@ -14,70 +51,110 @@ async def chat_endpoint(
 ):
     """
     Chat endpoint that accepts a user message and returns a streaming response.
+
+    Retrieval and the LLM mood fallback start right away and run concurrently;
+    the keyword mood is sent before either finishes, and retrieval slower than
+    CHAT_RETRIEVAL_TIMEOUT is dropped so the answer starts without context.
+
+    With a conversation_id, the conversation's summary and recent messages
+    are sent along and the turn is appended to it once the answer completes.
     """
-    # 1. Embed user input
-    from app.services.embedding_service import embed_texts, get_pinecone_client
-    import os
-    
-    try:
-        query_embedding = embed_texts([request.input])[0]
-        
-        # 2. Retrieve relevant context
-        pc = get_pinecone_client()
-        index = pc.Index(os.getenv("PINECONE_INDEX"))
-        
-        results = index.query(
-            vector=query_embedding,
-            top_k=3,
-            include_metadata=True
-        )
-        
-        context_texts = [match.metadata.get("text", "") for match in results.matches if match.metadata]
-        context_str = "\n\n".join(context_texts)
-        
-    except Exception as e:
-        print(f"RAG Error: {e}")
-        context_str = ""
-
-    # 3. Inject context into system prompt
-    system_prompt = "You are Echo, an intelligent AI assistant in the EchoOS workspace. Be helpful, concise, and professional."
-    if context_str:
-        system_prompt += f"\n\nRelevant Context from Memory:\n{context_str}\n\nUse this context to answer the user's question if relevant."
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": request.input}
-    ]
-    
-    # 4. Generate response and analyze mood
-    # For streaming, we'll yield chunks. We can send mood as a special event or metadata.
+    started = time.perf_counter()
+    retrieval = asyncio.create_task(_retrieve_context(request.input, current_user["id"]))
+    mood_task = asyncio.create_task(detect_mood_async(request.input))
+
+    history = None
+    if request.conversation_id:
+        try:
+            history = await conversation_store.load_history(request.conversation_id, current_user["id"])
+        except ConversationNotFound:
+            _cancel(retrieval, mood_task)
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        except BaseException:
+            _cancel(retrieval, mood_task)
+            raise
+
     # We'll use Server-Sent Events (SSE) format: data: ...
-    
     async def event_generator():
-        # Heuristic mood analysis
-        user_input_lower = request.input.lower()
-        detected_mood = "neutral"
-        if any(w in user_input_lower for w in ["stress", "anxious", "worry", "deadline", "busy"]):
-            detected_mood = "stressed"
-        elif any(w in user_input_lower for w in ["happy", "great", "good", "excited", "love"]):
-            detected_mood = "happy"
-        elif any(w in user_input_lower for w in ["sad", "bad", "depressed", "unhappy"]):
-            detected_mood = "sad"
-            
-        suggested_action = "Take a break" if detected_mood == "stressed" else None
-        
-        # Send metadata first
-        metadata = {
-            "mood": detected_mood,
-            "suggested_action": suggested_action
-        }
-        yield f"event: metadata\ndata: {json.dumps(metadata)}\n\n"
-        
-        # Stream content
-        async for chunk in llm_service.stream_chat(messages):
-            if chunk:
-                yield f"data: {json.dumps({'content': chunk})}\n\n"
-                
-        yield "event: done\ndata: [DONE]\n\n"
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+        try:
+            # Send metadata first: the keyword mood is available immediately
+            mood = match_mood(request.input) or dict(DEFAULT_MOOD)
+            yield _metadata_event(mood)
+
+            try:
+                context = await asyncio.wait_for(retrieval, timeout=config.CHAT_RETRIEVAL_TIMEOUT)
+            except asyncio.TimeoutError:
+                metrics.incr("chat.retrieval_timeouts")
+                context = BuiltContext()
+            except Exception as e:
+                print(f"RAG Error: {e}")
+                context = BuiltContext()
+            context_str = context.text
+            metrics.observe("chat.retrieval_ms", (time.perf_counter() - started) * 1000)
+
+            # The LLM fallback has had the retrieval time to finish; never wait on it beyond that
+            if mood_task.done() and not mood_task.cancelled() and mood_task.result() != mood:
+                yield _metadata_event(mood_task.result())
+
+            # 3. Inject context into system prompt
+            system_prompt = "You are Echo, an intelligent AI assistant in the EchoOS workspace. Be helpful, concise, and professional."
+            if context_str:
+                system_prompt += f"\n\nRelevant Context from Memory:\n{context_str}\n\nUse this context to answer the user's question if relevant."
+
+            messages = [
+                {"role": "system", "content": system_prompt},
+                *(conversation_store.history_messages(history) if history else []),
+                {"role": "user", "content": request.input}
+            ]
+            metrics.observe("chat.context_tokens", context.tokens)
+            metrics.observe("chat.prompt_tokens", sum(count_tokens(m["content"]) for m in messages))
+
+            # 4. Stream content
+            answer = []
+            async for chunk in llm_service.stream_chat(messages, model=CHAT_MODEL, cache_scope=current_user["id"]):
+                if chunk:
+                    if not answer:
+                        metrics.observe("chat.ttft_ms", (time.perf_counter() - started) * 1000)
+                    answer.append(chunk)
+                    yield f"data: {json.dumps({'content': chunk})}\n\n"
+
+            if history and answer:
+                try:
+                    await conversation_store.append_turn(history["id"], request.input, "".join(answer))
+                except Exception as e:
+                    print(f"Conversation store error: {e}")
+
+            yield "event: done\ndata: [DONE]\n\n"
+        finally:
+            # Client gone or stream finished: don't leave background work behind
+            _cancel(retrieval, mood_task)
+
+    # Also runs when the client leaves before the generator is first iterated,
+    # in which case its finally block never does
+    return StreamingResponse(
+        event_generator(), media_type="text/event-stream",
+        background=BackgroundTask(_cancel, retrieval, mood_task)
+    )
+
+
+@router.post("/conversations")
+async def create_conversation(
+    request: ConversationCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Start a conversation; pass its id as conversation_id to the chat endpoint.
+    """
+    conversation = await conversation_store.create_conversation(current_user["id"], request.title)
+    return {"id": conversation.id, "title": conversation.title}
+
+
+@router.get("/conversations/{conversation_id}")
+async def get_conversation(conversation_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    The conversation's rolling summary and the recent messages sent with each turn.
+    """
+    try:
+        return await conversation_store.load_history(conversation_id, current_user["id"])
+    except ConversationNotFound:
+        raise HTTPException(status_code=404, detail="Conversation not found")
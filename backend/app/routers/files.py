@@ -1,57 +1,254 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from app.dependencies import get_current_user
-import shutil
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Path, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.database import models
+from app.dependencies import get_async_db, get_current_user
+from app.core import config
+from app.core.pagination import decode_cursor, encode_cursor, stream_json_array
+from app.services import file_ingestion, file_storage
+from app.services.file_storage import UploadSessionNotFound, UploadTooLarge
+import mimetypes
 import os
-import uuid
-from datetime import datetime
 
 router = APIRouter()
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+
+class UploadComplete(BaseModel):
+    parts: Optional[int] = None # Number of parts sent; checked against what was received
+
+
+def _file_response(f) -> dict:
+    return {
+        "id": f.id,
+        "filename": f.filename,
+        "size": f.size,
+        "sha256": f.sha256,
+        "mime_type": f.mime_type,
+        "status": f.status,
+        "chunks_total": f.chunks_total,
+        "chunks_ingested": f.chunks_ingested or 0,
+        "error": f.error,
+        "uploaded_at": f.created_at.isoformat()
+    }
+
+
+async def _record_upload(
+    db: AsyncSession,
+    current_user: dict,
+    filename: str,
+    blob: file_storage.StoredBlob,
+    content_type: Optional[str] = None
+) -> dict:
+    mime_type = content_type if content_type and content_type != "application/octet-stream" else None
+    record = models.File(
+        user_id=current_user["id"],
+        filename=filename,
+        size=blob.size,
+        sha256=blob.sha256,
+        mime_type=mime_type or mimetypes.guess_type(filename or "")[0] or "application/octet-stream"
+    )
+    db.add(record)
+    await db.commit()
+    if config.FILE_INGEST_ENABLED and await _schedule_if_supported(db, record):
+        await db.refresh(record)
+    return {
+        **_file_response(record),
+        "saved_as": os.path.relpath(blob.path, config.UPLOAD_DIR),
+        "deduplicated": blob.deduplicated
+    }
+
+
+async def _schedule_if_supported(db: AsyncSession, record: models.File) -> bool:
+    try:
+        file_ingestion.parser_for(record.mime_type, record.filename)
+    except ValueError:
+        return False
+    if not await file_ingestion.claim(db, record.id):
+        return False
+    file_ingestion.schedule_ingestion(record.id)
+    return True
+
+
+def _session_response(session: dict) -> dict:
+    return {
+        "upload_id": session["upload_id"],
+        "filename": session["filename"],
+        "parts": session["parts"],
+        "received_bytes": sum(p["size"] for p in session["parts"])
+    }
+
 
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Upload a file to the server.
+    Upload a file to the server. Identical files are stored only once.
+
+    The multipart body is spooled by Starlette before this runs, so bodies
+    declaring a Content-Length over UPLOAD_MAX_BYTES are rejected up front
+    (see app.main); use the resumable /uploads API for large files.
     """
     try:
-        # Generate a safe filename
-        file_ext = os.path.splitext(file.filename)[1]
-        file_id = str(uuid.uuid4())
-        safe_filename = f"{file_id}{file_ext}"
-        file_path = os.path.join(UPLOAD_DIR, safe_filename)
-        
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        return {
-            "id": file_id,
-            "filename": file.filename,
-            "saved_as": safe_filename,
-            "size": os.path.getsize(file_path),
-            "uploaded_at": datetime.utcnow().isoformat()
-        }
+        blob = await file_storage.store_stream(file_storage.iter_upload(file))
+        return await _record_upload(db, current_user, file.filename, blob, file.content_type)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
 
+
+@router.post("/uploads")
+async def create_upload(
+    request: UploadSessionCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Start a resumable multipart upload. Send the parts with PUT
+    /uploads/{upload_id}/parts/{n}, then POST /uploads/{upload_id}/complete.
+    """
+    session = await file_storage.create_session(current_user["id"], request.filename)
+    return _session_response(session)
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Lists the parts received so far, so a client can resume an interrupted upload.
+    """
+    try:
+        return _session_response(await file_storage.get_session(upload_id, current_user["id"]))
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+
+@router.put("/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(
+    request: Request,
+    upload_id: str,
+    part_number: int = Path(..., ge=1, le=10000),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Upload one part as the raw request body. Re-sending a part replaces it.
+    """
+    try:
+        return await file_storage.write_part(upload_id, current_user["id"], part_number, request.stream())
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    request: Optional[UploadComplete] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Join the parts into the file. Fails with 400 unless parts 1..N were all
+    received (N = "parts" from the body, when sent).
+    """
+    try:
+        session = await file_storage.complete_session(
+            upload_id, current_user["id"], request.parts if request else None
+        )
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _record_upload(db, current_user, session["filename"], session["blob"])
+
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str, current_user: dict = Depends(get_current_user)):
+    try:
+        await file_storage.abort_session(upload_id, current_user["id"])
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return {"status": "aborted"}
+
+
 @router.get("/")
-async def list_files(current_user: dict = Depends(get_current_user)):
-    """
-    List uploaded files (mock metadata for now since we don't have a DB table for files yet).
-    """
-    # In a real app, query the DB. Here we just list the directory.
-    files = []
-    if os.path.exists(UPLOAD_DIR):
-        for filename in os.listdir(UPLOAD_DIR):
-            file_path = os.path.join(UPLOAD_DIR, filename)
-            files.append({
-                "filename": filename,
-                "size": os.path.getsize(file_path),
-                "path": file_path
-            })
-    return files
+async def list_files(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Lists the current user's files, newest first. The cursor for the next
+    page is returned in X-Next-Cursor.
+    """
+    query = (
+        select(
+            models.File.id, models.File.filename, models.File.size, models.File.sha256,
+            models.File.mime_type, models.File.status, models.File.chunks_total,
+            models.File.chunks_ingested, models.File.error, models.File.created_at
+        )
+        .filter(models.File.user_id == current_user["id"])
+        .order_by(models.File.created_at.desc(), models.File.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(tuple_(models.File.created_at, models.File.id) < tuple_(*after))
+
+    rows = (await db.execute(query)).all()
+    headers = {}
+    if len(rows) > limit:
+        headers["X-Next-Cursor"] = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id)
+
+    files = (_file_response(row) for row in rows[:limit])
+    return StreamingResponse(stream_json_array(files), media_type="application/json", headers=headers)
+
+
+@router.get("/{file_id}")
+async def get_file(
+    file_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    record = await db.get(models.File, file_id)
+    if record is None or record.user_id != current_user["id"]:
+        raise HTTPException(status_code=404, detail="File not found")
+    return _file_response(record)
+
+
+@router.post("/{file_id}/ingest")
+async def ingest_file(
+    file_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    (Re)ingests a file into the user's searchable memory. Poll GET
+    /api/files/{file_id} for progress.
+    """
+    record = await db.get(models.File, file_id)
+    if record is None or record.user_id != current_user["id"]:
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        file_ingestion.parser_for(record.mime_type, record.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    if not await file_ingestion.claim(db, record.id):
+        raise HTTPException(status_code=409, detail="File is already being ingested")
+
+    file_ingestion.schedule_ingestion(record.id)
+    return {"id": record.id, "status": "scheduled"}
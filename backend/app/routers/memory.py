@@ -1,124 +1,179 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.database import models
 from app.database.database import engine
-from app.schemas import MemoryCreate, MemoryResponse
-from app.dependencies import get_db, get_current_user
-from app.services.embedding_service import embed_texts, upsert_vectors
+from app.core import config
+from app.core.pagination import decode_cursor, encode_cursor, stream_json_page
+from app.schemas import MemoryCreate, MemoryResponse, MemoryBulkCreate, MemoryBulkResponse
+from app.dependencies import get_async_db, get_current_user
+from app.services import memory_graph, memory_search
+from app.services.memory_ingestion import batched
+from app.services.outbox_worker import enqueue_memories, outbox_worker
 import uuid
 from datetime import datetime
 
 # Create tables if they don't exist (for dev simplicity)
-models.Base.metadata.create_all(bind=engine)
+models.create_tables(engine)
 
 router = APIRouter()
 
+def _new_memory(memory: MemoryCreate, current_user: dict) -> models.Memory:
+    # IDs are assigned up front so the row never has to be refreshed after commit
+    return models.Memory(
+        id=str(uuid.uuid4()),
+        # Memories are stored (and retrieved) per user; never trust a client-supplied user_id
+        user_id=current_user["id"],
+        text=memory.text,
+        tags=memory.tags,
+        emotion=memory.emotion,
+        timestamp=datetime.fromisoformat(memory.timestamp) if memory.timestamp else datetime.utcnow()
+    )
+
 @router.post("/save", response_model=MemoryResponse)
 async def save_memory(
     memory: MemoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Save a memory:
     1. Save to Postgres (metadata)
     2. Chunk and embed text
-    3. Upsert to Pinecone
+    3. Upsert to the vector store
     """
-    # 1. Save to Postgres
-    db_memory = models.Memory(
-        user_id=memory.user_id or current_user["id"],
-        text=memory.text,
-        tags=memory.tags,
-        emotion=memory.emotion,
-        timestamp=datetime.fromisoformat(memory.timestamp) if memory.timestamp else datetime.utcnow()
-    )
+    # 1. Save to Postgres, together with an outbox entry for the vector work
+    db_memory = _new_memory(memory, current_user)
     db.add(db_memory)
-    db.commit()
-    db.refresh(db_memory)
+    enqueue_memories(db, [db_memory.id])
+    await db.commit()
+    memory_search.index_memories([db_memory])
 
-    # 2. Chunk and embed (Simple chunking for now)
-    # In a real app, use a proper text splitter
-    chunks = [memory.text] # Treating the whole text as one chunk for MVP
-    
-    try:
-        embeddings = embed_texts(chunks)
-        
-        # 3. Upsert to Pinecone
-        # We use the Postgres ID as the vector ID for 1:1 mapping in this simple case
-        # If chunking, we'd need a composite ID or separate vector IDs
-        upsert_vectors(
-            vectors=embeddings,
-            metadata=[{
-                "text": memory.text,
-                "tags": memory.tags,
-                "emotion": memory.emotion,
-                "user_id": memory.user_id or current_user["id"],
-                "memory_id": str(db_memory.id)
-            }],
-            ids=[str(db_memory.id)]
-        )
-    except Exception as e:
-        # Rollback DB if vector store fails? Or just log error?
-        # For now, we'll just log and return success for the DB part
-        print(f"Vector store error: {e}")
-        # In production, consider a transaction or background job
+    # 2-3. Chunking, embedding and upserting happen in the outbox workers
+    outbox_worker.notify()
+
+    return {"id": db_memory.id, "status": "saved"}
+
+@router.post("/bulk", response_model=MemoryBulkResponse)
+async def save_memories_bulk(
+    request: MemoryBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Save many memories in one call. They are written in batches of
+    MEMORY_INGEST_BATCH_SIZE and ingested by the outbox workers.
+    """
+    if len(request.memories) > config.MEMORY_BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {config.MEMORY_BULK_MAX} memories per request")
+
+    ids = []
+    for batch in batched(request.memories, config.MEMORY_INGEST_BATCH_SIZE):
+        db_memories = [_new_memory(memory, current_user) for memory in batch]
+        db.add_all(db_memories)
+        enqueue_memories(db, [m.id for m in db_memories])
+        await db.commit()
+        memory_search.index_memories(db_memories)
+        ids.extend(m.id for m in db_memories)
 
-    return {"id": str(db_memory.id), "status": "saved"}
+    outbox_worker.notify()
+    return {"ids": ids, "status": "saved"}
 
 @router.get("/search")
 async def search_memories(
     q: str,
     limit: int = 5,
+    mode: str = Query("auto", pattern="^(auto|hybrid|vector|keyword)$"),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Search memories by semantic similarity.
+    Search memories by keyword and semantic similarity (see
+    app.services.memory_search). By default, identifier-like queries and
+    quoted phrases are answered from the keyword index alone; mode=hybrid
+    always combines both, mode=vector or mode=keyword uses one only.
     """
     try:
-        query_embedding = embed_texts([q])[0]
-        
-        # We need to import the pinecone client here or use a service function
-        # Let's add a search function to embedding_service.py or do it here
-        # For consistency, let's assume we do it here using the client from service
-        from app.services.embedding_service import get_pinecone_client
-        import os
-        
-        pc = get_pinecone_client()
-        index = pc.Index(os.getenv("PINECONE_INDEX"))
-        
-        results = index.query(
-            vector=query_embedding,
-            top_k=limit,
-            include_metadata=True
-        )
-        
-        return results.matches
-        
+        return await memory_search.search(q, current_user["id"], top_k=limit, mode=mode)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/all")
 async def get_all_memories(
-    limit: int = 50,
-    db: Session = Depends(get_db),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Get all memories for the current user from DB.
+    Get the current user's memories from DB, newest first.
+    Pass the returned next_cursor back as `cursor` to fetch the next page.
     """
-    memories = db.query(models.Memory).filter(models.Memory.user_id == current_user["id"]).order_by(models.Memory.timestamp.desc()).limit(limit).all()
+    query = (
+        select(
+            models.Memory.id, models.Memory.text, models.Memory.tags,
+            models.Memory.emotion, models.Memory.timestamp, models.Memory.created_at
+        )
+        .filter(models.Memory.user_id == current_user["id"])
+        .order_by(models.Memory.timestamp.desc(), models.Memory.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(tuple_(models.Memory.timestamp, models.Memory.id) < tuple_(*after))
+
+    rows = (await db.execute(query)).all()
+    next_cursor = encode_cursor(rows[limit - 1].timestamp, rows[limit - 1].id) if len(rows) > limit else None
     
-    return {
-        "memories": [
-            {
-                "id": str(m.id),
-                "text": m.text,
-                "tags": m.tags,
-                "emotion": m.emotion,
-                "timestamp": m.timestamp.isoformat(),
-                "created_at": m.created_at.isoformat()
-            } for m in memories
-        ]
-    }
+    memories = (
+        {
+            "id": m.id,
+            "text": m.text,
+            "tags": m.tags,
+            "emotion": m.emotion,
+            "timestamp": m.timestamp.isoformat(),
+            "created_at": m.created_at.isoformat()
+        } for m in rows[:limit]
+    )
+    return StreamingResponse(stream_json_page("memories", memories, next_cursor), media_type="application/json")
+
+@router.get("/{memory_id}/related")
+async def get_related_memories(
+    memory_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Memories linked to this one in the memory graph (most similar, or sharing
+    tags), strongest link first. Links are computed when a memory is ingested.
+    """
+    memory = await db.get(models.Memory, memory_id)
+    if memory is None or memory.user_id != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Memory not found")
+
+    neighbors = await memory_graph.related(memory_id, current_user["id"], limit)
+    if not neighbors:
+        return []
+    rows = (await db.execute(
+        select(
+            models.Memory.id, models.Memory.text, models.Memory.tags,
+            models.Memory.emotion, models.Memory.timestamp
+        )
+        .filter(models.Memory.id.in_([n for n, _ in neighbors]), models.Memory.user_id == current_user["id"])
+    )).all()
+    by_id = {row.id: row for row in rows}
+    return [
+        {
+            "id": neighbor_id,
+            "text": by_id[neighbor_id].text,
+            "tags": by_id[neighbor_id].tags,
+            "emotion": by_id[neighbor_id].emotion,
+            "timestamp": by_id[neighbor_id].timestamp.isoformat(),
+            "score": score
+        } for neighbor_id, score in neighbors if neighbor_id in by_id
+    ]
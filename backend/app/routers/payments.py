@@ -9,7 +9,7 @@ import os
 from datetime import datetime
 
 # Create tables if they don't exist
-models.Base.metadata.create_all(bind=engine)
+models.create_tables(engine)
 
 router = APIRouter()
 
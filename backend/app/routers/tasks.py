@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
+from app.core import config
+from app.core.pagination import decode_cursor, encode_cursor, stream_json_array
 from app.database import models
-from app.dependencies import get_db, get_current_user
+from app.dependencies import get_async_db, get_current_user
 from datetime import datetime
 import uuid
 
@@ -18,18 +23,86 @@ class TaskUpdate(BaseModel):
     status: Optional[str] = None
     priority: Optional[str] = None
 
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate]
+
+class TaskBatchUpdate(TaskUpdate):
+    id: str
+
+class TaskBulkUpdate(BaseModel):
+    updates: List[TaskBatchUpdate]
+
+class SuggestedTasksCreate(BaseModel):
+    indices: Optional[List[int]] = None # Positions in the run's suggested_tasks; all by default
+    priority: Optional[str] = "medium"
+
+def _task_row(user_id: str, title: str, priority: Optional[str], due_date: Optional[datetime] = None, task_id: Optional[str] = None) -> Dict[str, Any]:
+    # Column defaults don't apply to Core inserts, so every value is set here
+    return {
+        "id": task_id or str(uuid.uuid4()),
+        "user_id": user_id,
+        "title": title,
+        "status": "pending",
+        "priority": priority or "medium",
+        "due_date": due_date,
+        "created_at": datetime.utcnow()
+    }
+
+async def _insert_tasks(db: AsyncSession, rows: List[Dict[str, Any]]):
+    # One multi-row INSERT ... VALUES statement and a single commit
+    if rows:
+        await db.execute(insert(models.Task).values(rows))
+    await db.commit()
+
+def _check_bulk_size(count: int):
+    if count > config.TASK_BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {config.TASK_BULK_MAX} tasks per request")
+
 @router.get("/")
 async def get_tasks(
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
-    tasks = db.query(models.Task).filter(models.Task.user_id == current_user["id"]).order_by(models.Task.created_at.desc()).all()
-    return tasks
+    """
+    Lists the current user's tasks, newest first. The body stays a plain
+    array; the cursor for the next page is returned in X-Next-Cursor.
+    """
+    query = (
+        select(
+            models.Task.id, models.Task.user_id, models.Task.title, models.Task.status,
+            models.Task.priority, models.Task.due_date, models.Task.created_at
+        )
+        .filter(models.Task.user_id == current_user["id"])
+        .order_by(models.Task.created_at.desc(), models.Task.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(tuple_(models.Task.created_at, models.Task.id) < tuple_(*after))
+
+    rows = (await db.execute(query)).all()
+    headers = {}
+    if len(rows) > limit:
+        headers["X-Next-Cursor"] = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id)
+
+    tasks = (
+        {
+            **row._mapping,
+            "due_date": row.due_date.isoformat() if row.due_date else None,
+            "created_at": row.created_at.isoformat()
+        } for row in rows[:limit]
+    )
+    return StreamingResponse(stream_json_array(tasks), media_type="application/json", headers=headers)
 
 @router.post("/")
 async def create_task(
     task: TaskCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     db_task = models.Task(
@@ -40,18 +113,18 @@ async def create_task(
         status="pending"
     )
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.commit()
     return db_task
 
 @router.put("/{task_id}")
 async def update_task(
     task_id: str,
     task_update: TaskUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
-    db_task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.user_id == current_user["id"]).first()
+    result = await db.execute(select(models.Task).filter(models.Task.id == task_id, models.Task.user_id == current_user["id"]))
+    db_task = result.scalars().first()
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -60,6 +133,105 @@ async def update_task(
     if task_update.priority:
         db_task.priority = task_update.priority
         
-    db.commit()
-    db.refresh(db_task)
+    await db.commit()
     return db_task
+
+@router.post("/bulk")
+async def create_tasks_bulk(
+    request: TaskBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Create many tasks with a single INSERT in one transaction.
+    """
+    _check_bulk_size(len(request.tasks))
+    rows = [_task_row(current_user["id"], task.title, task.priority, task.due_date) for task in request.tasks]
+    await _insert_tasks(db, rows)
+    return {"tasks": rows, "status": "created"}
+
+@router.patch("/bulk")
+async def update_tasks_bulk(
+    request: TaskBulkUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Apply many task updates with a single UPDATE in one transaction. Each
+    column is set through a CASE on the task id, so tasks can get different
+    values. IDs that don't exist (or aren't the user's) are returned in
+    "missing".
+    """
+    _check_bulk_size(len(request.updates))
+    # A later entry for the same id overrides an earlier one
+    statuses = {u.id: u.status for u in request.updates if u.status}
+    priorities = {u.id: u.priority for u in request.updates if u.priority}
+    ids = set(statuses) | set(priorities)
+    if not ids:
+        return {"updated": [], "missing": []}
+
+    values = {}
+    if statuses:
+        values["status"] = case(statuses, value=models.Task.id, else_=models.Task.status)
+    if priorities:
+        values["priority"] = case(priorities, value=models.Task.id, else_=models.Task.priority)
+
+    result = await db.execute(
+        update(models.Task)
+        .where(models.Task.id.in_(ids), models.Task.user_id == current_user["id"])
+        .values(**values)
+        .returning(models.Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated = set(result.scalars().all())
+    await db.commit()
+    return {"updated": sorted(updated), "missing": sorted(ids - updated)}
+
+@router.post("/from-agent-run/{run_id}")
+async def create_tasks_from_agent_run(
+    run_id: str,
+    request: Optional[SuggestedTasksCreate] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Turn a finished agent run's suggested_tasks into tasks, in one INSERT.
+
+    Task ids are derived from the run id and the suggestion's position, so
+    calling this again only creates suggestions not materialised yet.
+    """
+    request = request or SuggestedTasksCreate()
+    run = await db.get(models.AgentRun, run_id)
+    if run is None or run.user_id != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Run is {run.status}")
+
+    suggested = run.suggested_tasks or []
+    indices = range(len(suggested)) if request.indices is None else sorted(set(request.indices))
+    if any(i < 0 or i >= len(suggested) for i in indices):
+        raise HTTPException(status_code=400, detail=f"Run has {len(suggested)} suggested tasks")
+
+    rows = []
+    for i in indices:
+        suggestion = suggested[i]
+        if isinstance(suggestion, dict):
+            title, priority = suggestion.get("title") or "", suggestion.get("priority") or request.priority
+        else:
+            title, priority = str(suggestion), request.priority
+        task_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"agent-run:{run_id}:{i}"))
+        rows.append(_task_row(current_user["id"], title, priority, task_id=task_id))
+
+    existing = set()
+    if rows:
+        existing = set((await db.execute(
+            select(models.Task.id).filter(models.Task.id.in_([row["id"] for row in rows]))
+        )).scalars().all())
+    rows = [row for row in rows if row["id"] not in existing]
+    try:
+        await _insert_tasks(db, rows)
+    except IntegrityError:
+        # A concurrent call materialised the same suggestions
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Suggested tasks are already being created")
+    return {"tasks": rows, "existing": sorted(existing), "status": "created"}
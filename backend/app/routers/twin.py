@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from app.dependencies import get_db, get_current_user
+from app.core.security import invalidate_user
+from app.dependencies import get_async_db, get_current_user
 from app.database import models
 
 router = APIRouter()
@@ -12,31 +14,36 @@ class TwinProfileUpdate(BaseModel):
 
 @router.get("/profile")
 async def get_twin_profile(
-    current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: dict = Depends(get_current_user)
 ):
-    user = db.query(models.User).filter(models.User.email == current_user["email"]).first()
-    if not user:
+    # get_current_user already resolved the row (usually from cache)
+    if current_user["id"] == "anonymous":
         raise HTTPException(status_code=404, detail="User not found")
     
+    personality_config = current_user.get("personality_config") or {}
     return {
-        "energy": user.personality_config.get("energy", 50),
-        "formality": user.personality_config.get("formality", 50)
+        "energy": personality_config.get("energy", 50),
+        "formality": personality_config.get("formality", 50)
     }
 
 @router.put("/profile")
 async def update_twin_profile(
     profile: TwinProfileUpdate,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(models.User).filter(models.User.email == current_user["email"]).first()
-    if not user:
+    if current_user["id"] == "anonymous":
         raise HTTPException(status_code=404, detail="User not found")
     
-    user.personality_config = {
+    personality_config = {
         "energy": profile.energy,
         "formality": profile.formality
     }
-    db.commit()
-    return {"status": "success", "profile": user.personality_config}
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == current_user["id"])
+        .values(personality_config=personality_config)
+    )
+    await db.commit()
+    invalidate_user(current_user["email"])
+    return {"status": "success", "profile": personality_config}
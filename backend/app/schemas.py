@@ -5,9 +5,13 @@ class ChatRequest(BaseModel):
     user_id: Optional[str] = None
     input: str
     context_ids: Optional[List[str]] = None
+    conversation_id: Optional[str] = None # Server-side history (POST /api/chat/conversations)
+
+class ConversationCreate(BaseModel):
+    title: Optional[str] = None
 
 class MemoryCreate(BaseModel):
-    user_id: Optional[str] = None
+    user_id: Optional[str] = None # Ignored: memories always belong to the caller
     text: str
     tags: Optional[List[str]] = []
     emotion: Optional[str] = "neutral"
@@ -17,6 +21,13 @@ class MemoryResponse(BaseModel):
     id: str
     status: str
 
+class MemoryBulkCreate(BaseModel):
+    memories: List[MemoryCreate]
+
+class MemoryBulkResponse(BaseModel):
+    ids: List[str]
+    status: str
+
 class CheckoutRequest(BaseModel):
     user_id: str
     plan_id: str
@@ -1,46 +1,71 @@
+import asyncio
+import json
+import time
+import uuid
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
-import os
-import openai
-from app.services.embedding_service import embed_texts, get_pinecone_client
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from app.core import config
+from app.core.clients import clients
+from app.core.context_builder import build_context, token_budget
+from app.core.metrics import metrics
+from app.core.tokens import count_tokens
+from app.services import memory_graph, memory_search
+
+# Receives intermediate steps of a run: emit(step_name, data)
+StepCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+async def _ignore_step(step: str, data: Dict[str, Any]):
+    pass
+
 
 class Agent(ABC):
     @abstractmethod
-    async def run(self, input_text: str, context: Optional[Dict[str, Any]] = None) -> str:
+    async def run(
+        self,
+        input_text: str,
+        context: Optional[Dict[str, Any]] = None,
+        emit: StepCallback = _ignore_step
+    ) -> str:
         pass
 
 class ResearchAgent(Agent):
+    model = "gpt-4o-mini"
+
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.pinecone = get_pinecone_client()
-        self.index_name = os.getenv("PINECONE_INDEX")
-
-    async def run(self, input_text: str, context: Optional[Dict[str, Any]] = None) -> str:
-        # 1. Embed input
-        embedding = embed_texts([input_text])[0]
-
-        # 2. Retrieve relevant context from Pinecone
-        index = self.pinecone.Index(self.index_name)
-        results = index.query(
-            vector=embedding,
-            top_k=5,
-            include_metadata=True
-        )
+        # Shared, pooled clients; constructing an agent is cheap.
+        self.client = clients.async_openai_client()
 
-        retrieved_texts = [match.metadata.get("text", "") for match in results.matches if match.metadata]
-        context_str = "\n\n".join(retrieved_texts)
+    async def run(
+        self,
+        input_text: str,
+        context: Optional[Dict[str, Any]] = None,
+        emit: StepCallback = _ignore_step
+    ) -> str:
+        # 1-2. Retrieve relevant context with a hybrid keyword + vector search
+        # Only the requesting user's memories (see run_agent_endpoint)
+        await emit("search", {})
+        user_id = (context or {}).get("user_id", "")
+        matches = await memory_search.search(input_text, user_id, top_k=config.CONTEXT_TOP_K)
+        matches += await memory_graph.expand_matches(matches, user_id)
+        built = build_context(matches, token_budget(self.model))
+        context_str = built.text
+        await emit("retrieval", {"matches": len(built.used), "context_tokens": built.tokens})
 
         # 3. Generate answer using LLM
-        system_prompt = """You are a helpful research assistant. 
+        system_prompt = """You are a helpful research assistant.
         Analyze the provided context and the user's question.
         Return your response in JSON format with the following keys:
         - summary: A detailed summary of the findings.
         - suggested_tasks: A list of actionable tasks based on the findings (list of strings).
         """
         user_prompt = f"Context:\n{context_str}\n\nQuestion: {input_text}"
+        metrics.observe("agent.prompt_tokens", count_tokens(system_prompt) + count_tokens(user_prompt))
+        await emit("generation", {"model": self.model})
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await self.client.chat.completions.create(
+            model=self.model,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
@@ -48,26 +73,190 @@ class ResearchAgent(Agent):
             response_format={"type": "json_object"}
         )
 
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            await emit("usage", {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens
+            })
         return response.choices[0].message.content
 
+
+AGENTS = {
+    "research": ResearchAgent,
+}
+
+
+def parse_result(output: str) -> Dict[str, Any]:
+    """
+    Agent output as {summary, suggested_tasks, ...}; non-JSON output becomes the summary.
+    """
+    try:
+        return json.loads(output)
+    except json.JSONDecodeError:
+        return {"summary": output, "suggested_tasks": []}
+
+
+class AgentBusy(Exception):
+    """
+    The user already has AGENT_MAX_RUNS_PER_USER runs in progress.
+    """
+
+
+class AgentRun:
+    """
+    A run in progress. Steps are queued as (event, data) pairs, ending with
+    ("result", {"output": ...}) or ("error", {"detail": ...}).
+    """
+
+    def __init__(self, agent_id: str, user_id: str, run_id: Optional[str] = None):
+        self.id = run_id or str(uuid.uuid4())
+        self.agent_id = agent_id
+        self.user_id = user_id
+        self.events: "asyncio.Queue[tuple]" = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+    async def emit(self, step: str, data: Dict[str, Any]):
+        await self.events.put(("step", {"step": step, **data}))
+
+    async def stream(self) -> AsyncIterator[tuple]:
+        while True:
+            event = await self.events.get()
+            yield event
+            if event[0] in ("result", "error"):
+                return
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+
+class AgentRuntime:
+    """
+    Runs agents on a bounded pool: at most AGENT_MAX_CONCURRENCY runs execute
+    at once (the rest wait their turn), each user may have at most
+    AGENT_MAX_RUNS_PER_USER runs queued or executing, and runs are cancelled
+    after AGENT_RUN_TIMEOUT seconds. Agent instances are stateless and
+    shared between runs.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = config.AGENT_MAX_CONCURRENCY,
+        max_runs_per_user: int = config.AGENT_MAX_RUNS_PER_USER,
+        timeout: float = config.AGENT_RUN_TIMEOUT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_runs_per_user = max_runs_per_user
+        self.timeout = timeout
+        self._agents: Dict[str, Agent] = {}
+        self._runs: Dict[str, AgentRun] = {}
+        self._per_user: Dict[str, int] = defaultdict(int)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def agent(self, agent_id: str) -> Agent:
+        """
+        Raises:
+            ValueError: If there is no such agent.
+        """
+        agent = self._agents.get(agent_id)
+        if agent is None:
+            if agent_id not in AGENTS:
+                raise ValueError(f"Unknown agent: {agent_id}")
+            agent = self._agents[agent_id] = AGENTS[agent_id]()
+        return agent
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def start(
+        self,
+        agent_id: str,
+        input_text: str,
+        context: Dict[str, Any],
+        user_id: str,
+        run_id: Optional[str] = None,
+        enforce_user_cap: bool = True
+    ) -> AgentRun:
+        """
+        Starts a run in the background and returns it right away. Queued runs
+        (app.services.agent_worker) pass their own run_id and skip the
+        per-user cap, which they enforce at submission.
+
+        Raises:
+            ValueError: If there is no such agent.
+            AgentBusy: If the user is at their concurrent run limit.
+        """
+        agent = self.agent(agent_id)
+        if enforce_user_cap and self._per_user[user_id] >= self.max_runs_per_user:
+            raise AgentBusy(f"At most {self.max_runs_per_user} agent runs at a time")
+
+        run = AgentRun(agent_id, user_id, run_id)
+        self._per_user[user_id] += 1
+        self._runs[run.id] = run
+        run.task = asyncio.create_task(self._execute(run, agent, input_text, context))
+        # Streaming callers read the outcome from the events instead
+        run.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return run
+
+    async def _execute(self, run: AgentRun, agent: Agent, input_text: str, context: Dict[str, Any]):
+        queued = time.perf_counter()
+        try:
+            async with self._get_semaphore():
+                metrics.observe("agent.queue_ms", (time.perf_counter() - queued) * 1000)
+                await run.emit("started", {"run_id": run.id})
+                started = time.perf_counter()
+                output = await asyncio.wait_for(agent.run(input_text, context, run.emit), timeout=self.timeout)
+                metrics.observe("agent.run_ms", (time.perf_counter() - started) * 1000)
+            await run.events.put(("result", {"output": output}))
+            return output
+        except asyncio.TimeoutError:
+            metrics.incr("agent.timeouts")
+            await run.events.put(("error", {"detail": f"Agent run timed out after {self.timeout}s"}))
+            raise
+        except asyncio.CancelledError:
+            metrics.incr("agent.cancelled")
+            run.events.put_nowait(("error", {"detail": "Agent run cancelled"}))
+            raise
+        except Exception as e:
+            metrics.incr("agent.errors")
+            await run.events.put(("error", {"detail": str(e)}))
+            raise
+        finally:
+            self._per_user[run.user_id] -= 1
+            if not self._per_user[run.user_id]:
+                del self._per_user[run.user_id]
+            self._runs.pop(run.id, None)
+
+    async def run(self, agent_id: str, input_text: str, context: Dict[str, Any], user_id: str) -> str:
+        """
+        Runs an agent to completion and returns its output.
+        """
+        return await self.start(agent_id, input_text, context, user_id).task
+
+    def cancel(self, run_id: str, user_id: str) -> bool:
+        run = self._runs.get(run_id)
+        if run is None or run.user_id != user_id:
+            return False
+        run.cancel()
+        return True
+
+
+agent_runtime = AgentRuntime()
+
+
 def run_agent(agent_name: str, payload: Dict[str, Any]) -> str:
     """
-    Factory/Dispatcher to run an agent.
+    Synchronous entry point for scripts: runs an agent to completion.
+    payload: {input: str, context: dict (optional)}
     """
-    if agent_name == "research":
-        agent = ResearchAgent()
-        # In a real async app, we should await this. 
-        # Since this is a synchronous wrapper, we might need to handle async properly 
-        # or make run_agent async. For now, let's assume the caller handles async 
-        # or we use a sync wrapper if needed. 
-        # But wait, Agent.run is async. So run_agent should probably be async.
-        raise NotImplementedError("Call the agent directly or make this async")
-    else:
-        raise ValueError(f"Unknown agent: {agent_name}")
+    return asyncio.run(agent_runtime.agent(agent_name).run(payload["input"], payload.get("context")))
 
 async def run_agent_async(agent_name: str, input_text: str, context: Optional[Dict[str, Any]] = None) -> str:
-    if agent_name == "research":
-        agent = ResearchAgent()
-        return await agent.run(input_text, context)
-    else:
-        raise ValueError(f"Unknown agent: {agent_name}")
+    context = context or {}
+    return await agent_runtime.run(agent_name, input_text, context, context.get("user_id", ""))
@@ -0,0 +1,228 @@
+# Executes queued agent runs (models.AgentRun). POST /api/agents/runs only
+# writes a 'queued' row; these workers claim runs, execute them on the agent
+# runtime and persist the outcome, timings and token usage, so results
+# survive client disconnects and throughput is capped at AGENT_WORKERS runs
+# per process.
+#
+# Runs inside the API process (started from the app lifespan), or standalone:
+#   python -m app.services.agent_worker run|drain
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import or_, select, update
+
+from app.core import config
+from app.core.metrics import metrics
+from app.database import models
+from app.database.database import AsyncSessionLocal, engine
+from app.services.agent_runtime import agent_runtime, parse_result
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+async def _claim(limit: int) -> List[Dict[str, Any]]:
+    """
+    Leases up to `limit` queued runs, plus running ones whose worker let the
+    lease lapse (e.g. it crashed).
+    """
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        query = (
+            select(models.AgentRun)
+            .filter(or_(
+                models.AgentRun.status == "queued",
+                (models.AgentRun.status == "running") & (models.AgentRun.lease_until < now)
+            ))
+            .order_by(models.AgentRun.created_at)
+            .limit(limit)
+        )
+        if db.get_bind().dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+
+        runs = (await db.execute(query)).scalars().all()
+        claimed = []
+        for run in runs:
+            if (run.attempts or 0) >= config.AGENT_RUN_MAX_ATTEMPTS:
+                run.status = "failed"
+                run.error = run.error or "Gave up after repeated worker failures"
+                run.finished_at = now
+                continue
+            run.status = "running"
+            run.attempts = (run.attempts or 0) + 1
+            run.started_at = now
+            # Renewed by _renew_lease for as long as the run waits or executes
+            run.lease_until = now + timedelta(seconds=config.AGENT_RUN_LEASE_SECONDS)
+            claimed.append({
+                "id": run.id, "user_id": run.user_id, "agent_id": run.agent_id,
+                "input": run.input, "context": run.context or {}
+            })
+        await db.commit()
+        return claimed
+
+
+async def _renew_lease(run_id: str):
+    # Keeps a claimed run from looking abandoned while it waits on the
+    # runtime's concurrency limit or executes, however long that takes
+    while True:
+        await asyncio.sleep(config.AGENT_RUN_LEASE_SECONDS / 3)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(models.AgentRun)
+                    .where(models.AgentRun.id == run_id, models.AgentRun.status == "running")
+                    .values(lease_until=datetime.utcnow() + timedelta(seconds=config.AGENT_RUN_LEASE_SECONDS))
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"Agent run lease renewal error for {run_id}: {e}")
+
+
+async def _finish(run_id: str, **values):
+    # Only a still-running run is updated, so a cancellation isn't overwritten
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(models.AgentRun)
+            .where(models.AgentRun.id == run_id, models.AgentRun.status == "running")
+            .values(finished_at=datetime.utcnow(), lease_until=None, **values)
+        )
+        await db.commit()
+
+
+async def execute(run: Dict[str, Any]):
+    """
+    Executes one claimed run and stores its outcome.
+    """
+    context = {**run["context"], "user_id": run["user_id"]}
+    try:
+        handle = agent_runtime.start(
+            run["agent_id"], run["input"], context, run["user_id"],
+            run_id=run["id"], enforce_user_cap=False
+        )
+    except ValueError as e:
+        await _finish(run["id"], status="failed", error=str(e))
+        return
+
+    heartbeat = asyncio.create_task(_renew_lease(run["id"]))
+    usage: Dict[str, int] = {}
+    try:
+        async for event, data in handle.stream():
+            if event == "step" and data.get("step") == "usage":
+                usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + data.get("prompt_tokens", 0)
+                usage["completion_tokens"] = usage.get("completion_tokens", 0) + data.get("completion_tokens", 0)
+            elif event == "result":
+                result = parse_result(data["output"])
+                await _finish(
+                    run["id"], status="succeeded", result=result,
+                    suggested_tasks=result.get("suggested_tasks") or [], **usage
+                )
+                metrics.incr("agent_runs.succeeded")
+            elif event == "error":
+                await _finish(run["id"], status="failed", error=data["detail"][:2000], **usage)
+                metrics.incr("agent_runs.failed")
+    finally:
+        heartbeat.cancel()
+
+
+async def process_batch(limit: int = 1) -> int:
+    runs = await _claim(limit)
+    await asyncio.gather(*(execute(run) for run in runs))
+    return len(runs)
+
+
+async def cancel(run_id: str, user_id: str) -> Optional[str]:
+    """
+    Cancels a queued or running run.
+
+    Returns:
+        The run's status afterwards, or None if the user has no such run.
+    """
+    async with AsyncSessionLocal() as db:
+        run = await db.get(models.AgentRun, run_id)
+        if run is None or run.user_id != user_id:
+            return None
+        if run.status in FINISHED:
+            return run.status
+        run.status = "cancelled"
+        run.finished_at = datetime.utcnow()
+        await db.commit()
+    # Stops it right away if it runs in this process; elsewhere the outcome is discarded
+    agent_runtime.cancel(run_id, user_id)
+    return "cancelled"
+
+
+class AgentWorker:
+    """
+    Pool of asyncio tasks each executing one queued run at a time. notify()
+    wakes them right after a submission instead of waiting for the poll.
+    """
+
+    def __init__(self, concurrency: int = config.AGENT_WORKERS):
+        self.concurrency = concurrency
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Agent worker error: {e}")
+                claimed = 0
+
+            if claimed:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=config.AGENT_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+agent_worker = AgentWorker()
+
+
+async def _run_until_empty():
+    while await process_batch(config.AGENT_WORKERS):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent run worker")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="Process queued runs continuously")
+    sub.add_parser("drain", help="Process queued runs until none are left, then exit")
+    args = parser.parse_args()
+
+    models.create_tables(engine)
+    if args.command == "drain":
+        asyncio.run(_run_until_empty())
+    else:
+        async def run_forever():
+            agent_worker.start()
+            await asyncio.Event().wait()
+
+        asyncio.run(run_forever())
+
+
+if __name__ == "__main__":
+    main()
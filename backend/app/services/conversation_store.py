@@ -0,0 +1,213 @@
+# Server-side chat history. Messages are appended to an append-only log per
+# conversation; a turn's prompt gets the conversation's rolling summary plus a
+# bounded window of the most recent messages. When the unsummarised part of
+# the log grows past CONVERSATION_SUMMARY_TRIGGER_TOKENS, the messages older
+# than that window are folded into the summary by a background task, oldest
+# first, so the prompt size stays flat however long the conversation runs.
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import func, select, update
+
+from app.core import config
+from app.core.metrics import metrics
+from app.core.tokens import count_tokens
+from app.database import models
+from app.database.database import AsyncSessionLocal
+from app.services.llm_service import llm_service
+
+_SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and Echo, "
+    "their AI assistant. Update the summary with the new messages. Keep facts, "
+    "decisions, preferences and open questions; drop small talk. Reply with the "
+    "updated summary only."
+)
+
+
+class ConversationNotFound(Exception):
+    pass
+
+
+def recent_window(messages: Sequence[Any], budget: int) -> List[Any]:
+    """
+    The longest suffix of `messages` (objects with a `tokens` attribute)
+    whose total token count fits in budget.
+    """
+    window: List[Any] = []
+    used = 0
+    for message in reversed(messages):
+        used += message.tokens or 0
+        if used > budget:
+            break
+        window.append(message)
+    window.reverse()
+    return window
+
+
+async def create_conversation(user_id: str, title: Optional[str] = None) -> models.Conversation:
+    async with AsyncSessionLocal() as db:
+        conversation = models.Conversation(user_id=user_id, title=title)
+        db.add(conversation)
+        await db.commit()
+        return conversation
+
+
+async def _unsummarised(db, conversation: models.Conversation) -> List[models.ConversationMessage]:
+    result = await db.execute(
+        select(models.ConversationMessage)
+        .filter(
+            models.ConversationMessage.conversation_id == conversation.id,
+            models.ConversationMessage.seq > (conversation.summarized_until or 0)
+        )
+        .order_by(models.ConversationMessage.seq.desc())
+        .limit(config.CONVERSATION_HISTORY_MAX_MESSAGES)
+    )
+    return list(reversed(result.scalars().all()))
+
+
+async def load_history(conversation_id: str, user_id: str) -> Dict[str, Any]:
+    """
+    The conversation's summary and its most recent messages, bounded by
+    CONVERSATION_HISTORY_TOKENS and CONVERSATION_HISTORY_MAX_MESSAGES.
+
+    Raises:
+        ConversationNotFound: If it doesn't exist or belongs to another user.
+    """
+    async with AsyncSessionLocal() as db:
+        conversation = await db.get(models.Conversation, conversation_id)
+        if conversation is None or conversation.user_id != user_id:
+            raise ConversationNotFound(conversation_id)
+        window = recent_window(await _unsummarised(db, conversation), config.CONVERSATION_HISTORY_TOKENS)
+
+    return {
+        "id": conversation.id,
+        "title": conversation.title,
+        "summary": conversation.summary,
+        "messages": [{"role": m.role, "content": m.content} for m in window]
+    }
+
+
+def history_messages(history: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    Chat messages to place between the system prompt and the new user message.
+    """
+    messages = []
+    if history.get("summary"):
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{history['summary']}"})
+    return messages + history["messages"]
+
+
+async def append_turn(conversation_id: str, user_text: str, assistant_text: str):
+    """
+    Appends a user message and the assistant's answer, then schedules a
+    summary update if the unsummarised history has grown too long.
+    """
+    async with AsyncSessionLocal() as db:
+        # The UPDATE locks the conversation row, so concurrent turns get distinct seqs
+        await db.execute(
+            update(models.Conversation)
+            .where(models.Conversation.id == conversation_id)
+            .values(message_count=models.Conversation.message_count + 2, updated_at=datetime.utcnow())
+        )
+        conversation = await db.get(models.Conversation, conversation_id, populate_existing=True)
+        last_seq = conversation.message_count
+        db.add_all([
+            models.ConversationMessage(
+                conversation_id=conversation_id, seq=last_seq - 1, role="user",
+                content=user_text, tokens=count_tokens(user_text)
+            ),
+            models.ConversationMessage(
+                conversation_id=conversation_id, seq=last_seq, role="assistant",
+                content=assistant_text, tokens=count_tokens(assistant_text)
+            ),
+        ])
+        await db.commit()
+
+        pending_tokens = (await db.execute(
+            select(func.coalesce(func.sum(models.ConversationMessage.tokens), 0))
+            .filter(
+                models.ConversationMessage.conversation_id == conversation_id,
+                models.ConversationMessage.seq > (conversation.summarized_until or 0)
+            )
+        )).scalar()
+
+    if pending_tokens > config.CONVERSATION_SUMMARY_TRIGGER_TOKENS:
+        schedule_summary(conversation_id)
+
+
+async def summarize(conversation_id: str) -> bool:
+    """
+    Folds the oldest unsummarised messages before the recent window, at most
+    CONVERSATION_HISTORY_MAX_MESSAGES of them, into the summary. A longer
+    backlog takes several runs; each continues where the last one stopped.
+
+    Returns:
+        Whether the summary changed.
+    """
+    async with AsyncSessionLocal() as db:
+        conversation = await db.get(models.Conversation, conversation_id)
+        if conversation is None:
+            return False
+        keep = recent_window(await _unsummarised(db, conversation), config.CONVERSATION_HISTORY_TOKENS)
+        query = (
+            select(models.ConversationMessage)
+            .filter(
+                models.ConversationMessage.conversation_id == conversation_id,
+                models.ConversationMessage.seq > (conversation.summarized_until or 0)
+            )
+            .order_by(models.ConversationMessage.seq)
+            .limit(config.CONVERSATION_HISTORY_MAX_MESSAGES)
+        )
+        if keep:
+            query = query.filter(models.ConversationMessage.seq < keep[0].seq)
+        fold = (await db.execute(query)).scalars().all()
+    if not fold:
+        return False
+
+    transcript = "\n".join(f"{m.role}: {m.content}" for m in fold)
+    summary = await llm_service.get_chat_completion(
+        [
+            {"role": "system", "content": _SUMMARY_PROMPT},
+            {"role": "user", "content": f"Current summary:\n{conversation.summary or '(none)'}\n\nNew messages:\n{transcript}"}
+        ],
+        model=config.CONVERSATION_SUMMARY_MODEL
+    )
+
+    async with AsyncSessionLocal() as db:
+        # Only applies if no other run moved the summary on in the meantime
+        result = await db.execute(
+            update(models.Conversation)
+            .where(
+                models.Conversation.id == conversation_id,
+                models.Conversation.summarized_until == (conversation.summarized_until or 0)
+            )
+            .values(summary=summary, summarized_until=fold[-1].seq)
+        )
+        await db.commit()
+    metrics.incr("conversation.summaries")
+    return result.rowcount > 0
+
+
+_in_flight: Set[str] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+async def _summarize_in_background(conversation_id: str):
+    try:
+        while await summarize(conversation_id):
+            pass
+    except Exception as e:
+        print(f"Conversation summary error for {conversation_id}: {e}")
+    finally:
+        _in_flight.discard(conversation_id)
+
+
+def schedule_summary(conversation_id: str):
+    # At most one summary run per conversation at a time
+    if conversation_id in _in_flight:
+        return
+    _in_flight.add(conversation_id)
+    task = asyncio.create_task(_summarize_in_background(conversation_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
@@ -0,0 +1,184 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.core.metrics import metrics
+
+
+def cache_key(text: str, model: str) -> str:
+    """
+    Content-hash key for an embedding: sha256 of model + text.
+    """
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def pack_vector(vector: List[float]) -> bytes:
+    # float32 packing: ~4 bytes per dimension instead of a 24-byte Python float
+    # plus an 8-byte list slot.
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class SQLiteEmbeddingStore:
+    """
+    On-disk cache tier shared by every worker on the host.
+
+    Each thread gets its own connection; WAL mode lets readers and the
+    occasional writer from other processes work concurrently.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_rows: int = 200_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._writes_since_prune = 0
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_created_at ON embeddings (created_at)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+
+        found = {}
+        oldest = time.time() - self.ttl if self.ttl else 0
+        conn = self._conn()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders}) AND created_at >= ?",
+                (*batch, oldest),
+            ).fetchall()
+            found.update(rows)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]):
+        now = time.time()
+        rows = [(key, blob, now) for key, blob in items]
+        if not rows:
+            return
+
+        conn = self._conn()
+        conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)", rows)
+        conn.commit()
+
+        self._writes_since_prune += len(rows)
+        if self._writes_since_prune >= 1000:
+            self._writes_since_prune = 0
+            self.prune()
+
+    def prune(self):
+        """
+        Drop expired rows, then the oldest rows beyond max_rows.
+        """
+        conn = self._conn()
+        if self.ttl:
+            conn.execute("DELETE FROM embeddings WHERE created_at < ?", (time.time() - self.ttl,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > self.max_rows:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY created_at ASC LIMIT ?)",
+                (count - self.max_rows,),
+            )
+        conn.commit()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: an in-process LRU/TTL of float32-packed vectors
+    in front of an optional SQLite store (enabled by EMBEDDING_CACHE_PATH).
+
+    Hits and misses per tier are reported to app.core.metrics under
+    `embedding_cache.*`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = config.EMBEDDING_CACHE_SIZE,
+        ttl: Optional[float] = config.EMBEDDING_CACHE_TTL,
+        disk_path: Optional[str] = config.EMBEDDING_CACHE_PATH,
+        disk_max_rows: int = config.EMBEDDING_CACHE_DISK_MAX_ROWS,
+    ):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk = SQLiteEmbeddingStore(disk_path, ttl=ttl, max_rows=disk_max_rows) if disk_path else None
+
+    def get_many_memory(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Looks keys up in the in-process tier only (never touches disk).
+        """
+        found = {}
+        for key in keys:
+            blob = self.memory.get(key)
+            if blob is not None:
+                found[key] = unpack_vector(blob)
+        metrics.incr("embedding_cache.memory_hits", len(found))
+        return found
+
+    def get_many_disk(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Looks keys up in the SQLite tier and promotes hits into memory.
+        """
+        if not self.disk or not keys:
+            return {}
+
+        try:
+            rows = self.disk.get_many(keys)
+        except sqlite3.Error as e:
+            print(f"Embedding cache disk error: {e}")
+            return {}
+
+        for key, blob in rows.items():
+            self.memory.set(key, blob)
+        metrics.incr("embedding_cache.disk_hits", len(rows))
+        return {key: unpack_vector(blob) for key, blob in rows.items()}
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = self.get_many_memory(keys)
+        missing = [key for key in keys if key not in found]
+        found.update(self.get_many_disk(missing))
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        packed = [(key, pack_vector(vector)) for key, vector in items.items()]
+        for key, blob in packed:
+            self.memory.set(key, blob)
+
+        if self.disk:
+            try:
+                self.disk.put_many(packed)
+            except sqlite3.Error as e:
+                print(f"Embedding cache disk error: {e}")
+
+    def clear(self):
+        self.memory.clear()
+
+
+embedding_cache = EmbeddingCache()
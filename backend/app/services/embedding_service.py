@@ -1,36 +1,38 @@
-import os
+import asyncio
 from typing import List, Dict, Any, Optional
-import openai
-from pinecone import Pinecone
 import uuid
+from app.core import config
+from app.core.batching import MicroBatcher
+from app.core.clients import clients
+from app.core.metrics import metrics
+from app.core.tokens import count_tokens
+from app.core.vectorstore import PineconeVectorStore, VectorMatch, VectorStore, get_vector_store
+from app.services.embedding_cache import cache_key, embedding_cache
 
-# Initialize clients
 # Note: Ensure OPENAI_API_KEY and PINECONE_KEY are set in environment variables
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# (PINECONE_KEY is not needed with VECTOR_STORE_BACKEND=local).
+# Clients are pooled process-wide by app.core.clients.
 
 def get_pinecone_client():
-    api_key = os.getenv("PINECONE_KEY")
-    if not api_key:
-        raise ValueError("PINECONE_KEY environment variable not set")
-    
-    # Check for PINECONE_ENV if using older indexes or specific regions
-    env = os.getenv("PINECONE_ENV")
-    if env:
-        print(f"Using Pinecone environment: {env}")
-        # Note: New Pinecone client typically doesn't need 'environment' in constructor 
-        # unless using specific legacy setups, but we log it for verification.
-        
-    return Pinecone(api_key=api_key)
+    return clients.pinecone_client()
 
-def embed_texts(texts: List[str], model: str = "text-embedding-3-small") -> List[List[float]]:
-    """
-    Generates embeddings for a list of texts using OpenAI.
-    """
-    if not texts:
-        return []
-    
+def _vector_store(index_name: Optional[str] = None) -> VectorStore:
+    return PineconeVectorStore(index_name) if index_name else get_vector_store()
+
+def _create_embeddings(texts: List[str], model: str) -> List[List[float]]:
+    try:
+        response = clients.openai_client().embeddings.create(
+            input=texts,
+            model=model
+        )
+        return [data.embedding for data in response.data]
+    except Exception as e:
+        print(f"Error generating embeddings: {e}")
+        raise
+
+async def _create_embeddings_async(texts: List[str], model: str) -> List[List[float]]:
     try:
-        response = openai.embeddings.create(
+        response = await clients.async_openai_client().embeddings.create(
             input=texts,
             model=model
         )
@@ -39,20 +41,112 @@ def embed_texts(texts: List[str], model: str = "text-embedding-3-small") -> List
         print(f"Error generating embeddings: {e}")
         raise
 
+_batchers: Dict[str, MicroBatcher] = {}
+
+def _get_batcher(model: str) -> MicroBatcher:
+    """
+    Per-model batcher that coalesces concurrent embed_texts_async misses into
+    one embeddings call, split to stay within the request token budget.
+    """
+    batcher = _batchers.get(model)
+    if batcher is None:
+        batcher = MicroBatcher(
+            lambda texts: _create_embeddings_async(texts, model),
+            max_wait=config.EMBEDDING_BATCH_WINDOW_MS / 1000,
+            max_items=config.EMBEDDING_BATCH_MAX_TEXTS,
+            max_cost=config.EMBEDDING_BATCH_MAX_TOKENS,
+            cost=count_tokens,
+            name="embedding_batcher",
+        )
+        _batchers[model] = batcher
+    return batcher
+
+def _missing_texts(texts: List[str], keys: List[str], cached: Dict[str, List[float]]) -> Dict[str, str]:
+    # Unique uncached texts by cache key, so duplicates are only embedded once
+    missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+    metrics.incr("embedding_cache.misses", len(missing))
+    return missing
+
+def embed_texts(texts: List[str], model: str = "text-embedding-3-small") -> List[List[float]]:
+    """
+    Generates embeddings for a list of texts using OpenAI.
+    Previously seen texts are served from the embedding cache.
+    """
+    if not texts:
+        return []
+    
+    keys = [cache_key(text, model) for text in texts]
+    cached = embedding_cache.get_many(list(dict.fromkeys(keys)))
+    
+    missing = _missing_texts(texts, keys, cached)
+    if missing:
+        fresh = dict(zip(missing, _create_embeddings(list(missing.values()), model)))
+        embedding_cache.put_many(fresh)
+        cached.update(fresh)
+    
+    return [cached[key] for key in keys]
+
+async def embed_texts_async(texts: List[str], model: str = "text-embedding-3-small") -> List[List[float]]:
+    """
+    Async version of embed_texts, for use from the event loop.
+    """
+    if not texts:
+        return []
+    
+    keys = [cache_key(text, model) for text in texts]
+    unique_keys = list(dict.fromkeys(keys))
+    cached = embedding_cache.get_many_memory(unique_keys)
+    if embedding_cache.disk and len(cached) < len(unique_keys):
+        missing_keys = [key for key in unique_keys if key not in cached]
+        cached.update(await asyncio.to_thread(embedding_cache.get_many_disk, missing_keys))
+    
+    missing = _missing_texts(texts, keys, cached)
+    if missing:
+        fresh = dict(zip(missing, await _get_batcher(model).submit_many(list(missing.values()))))
+        if embedding_cache.disk:
+            await asyncio.to_thread(embedding_cache.put_many, fresh)
+        else:
+            embedding_cache.put_many(fresh)
+        cached.update(fresh)
+    
+    return [cached[key] for key in keys]
+
+async def query_vectors_async(
+    vector: List[float],
+    top_k: int = 5,
+    namespace: str = "",
+    index_name: Optional[str] = None
+) -> List[VectorMatch]:
+    """
+    Queries the vector store for the nearest matches without blocking the event loop.
+    
+    Args:
+        vector: Query embedding.
+        top_k: Number of matches to return.
+        namespace: Namespace to search. Memories are stored per user, under the user ID.
+        index_name: Optional Pinecone index name. Defaults to the configured vector store.
+    
+    Returns:
+        The list of matches (each with id, score and metadata).
+    """
+    return await _vector_store(index_name).aquery(vector, top_k=top_k, namespace=namespace)
+
 def upsert_vectors(
     vectors: List[List[float]], 
     metadata: List[Dict[str, Any]], 
     ids: Optional[List[str]] = None,
-    index_name: Optional[str] = None
+    index_name: Optional[str] = None,
+    namespace: str = ""
 ) -> int:
     """
-    Upserts vectors into Pinecone.
+    Upserts vectors into the vector store.
     
     Args:
         vectors: List of embeddings (lists of floats).
         metadata: List of metadata dictionaries corresponding to vectors.
         ids: Optional list of IDs. If not provided, UUIDs will be generated.
-        index_name: Optional index name. Defaults to PINECONE_INDEX env var.
+        namespace: Namespace to write to (the user ID for memories).
+        index_name: Optional Pinecone index name. Defaults to the configured vector store.
         
     Returns:
         The count of upserted vectors.
@@ -63,28 +157,52 @@ def upsert_vectors(
     if ids and len(ids) != len(vectors):
         raise ValueError("IDs list must have the same length as vectors")
     
-    idx_name = index_name or os.getenv("PINECONE_INDEX")
-    if not idx_name:
-        raise ValueError("PINECONE_INDEX environment variable not set and no index_name provided")
+    ids = ids or [str(uuid.uuid4()) for _ in vectors]
+    store = _vector_store(index_name)
     
-    pc = get_pinecone_client()
-    index = pc.Index(idx_name)
-    
-    # Prepare items for upsert
-    items_to_upsert = []
-    for i, vector in enumerate(vectors):
-        vector_id = ids[i] if ids else str(uuid.uuid4())
-        items_to_upsert.append({
-            "id": vector_id,
-            "values": vector,
-            "metadata": metadata[i]
-        })
+    # Upsert in batches to stay under Pinecone's per-request limits
+    batch_size = config.VECTOR_UPSERT_BATCH_SIZE
+    try:
+        return sum(
+            store.upsert(ids[i:i + batch_size], vectors[i:i + batch_size], metadata[i:i + batch_size], namespace)
+            for i in range(0, len(ids), batch_size)
+        )
+    except Exception as e:
+        print(f"Error upserting vectors: {e}")
+        raise
+
+async def delete_vectors_async(ids: List[str], index_name: Optional[str] = None, namespace: str = ""):
+    """
+    Deletes vectors by ID, in batches of VECTOR_UPSERT_BATCH_SIZE.
+    """
+    store = _vector_store(index_name)
+    batch_size = config.VECTOR_UPSERT_BATCH_SIZE
+    await asyncio.gather(*(
+        store.adelete(ids[i:i + batch_size], namespace)
+        for i in range(0, len(ids), batch_size)
+    ))
+
+async def upsert_vectors_async(
+    vectors: List[List[float]],
+    metadata: List[Dict[str, Any]],
+    ids: List[str],
+    index_name: Optional[str] = None,
+    namespace: str = ""
+) -> int:
+    """
+    Async version of upsert_vectors. Batches are sent concurrently.
+    """
+    if not (len(vectors) == len(metadata) == len(ids)):
+        raise ValueError("Vectors, metadata and IDs lists must have the same length")
     
-    # Batch upsert if necessary (Pinecone has limits, but for simplicity we upsert all)
-    # For production, consider batching chunks of 100 or so.
+    store = _vector_store(index_name)
+    batch_size = config.VECTOR_UPSERT_BATCH_SIZE
     try:
-        upsert_response = index.upsert(vectors=items_to_upsert)
-        return upsert_response.upserted_count
+        counts = await asyncio.gather(*(
+            store.aupsert(ids[i:i + batch_size], vectors[i:i + batch_size], metadata[i:i + batch_size], namespace)
+            for i in range(0, len(ids), batch_size)
+        ))
+        return sum(counts)
     except Exception as e:
-        print(f"Error upserting to Pinecone: {e}")
+        print(f"Error upserting vectors: {e}")
         raise
@@ -0,0 +1,315 @@
+# Makes uploaded files searchable: parses text/Markdown/PDF/DOCX, chunks the
+# text and embeds the chunks into the owner's vector namespace, linked to the
+# models.File row by vector ID (chunk_id(file_id, i)) and metadata.
+#
+# Parsing and chunking are CPU-bound, so they run in a process pool and spool
+# chunks to a JSONL file; the event loop then streams that file back in
+# batches for embedding. Parsers are generators, so no file is ever held in
+# memory whole. Progress is written to File.chunks_ingested as batches land.
+import asyncio
+import codecs
+import json
+import os
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterator, List, Optional, Set
+from xml.etree import ElementTree
+
+from sqlalchemy import or_, update
+
+from app.core import config
+from app.core.metrics import metrics
+from app.core.text_splitter import split_text
+from app.core.tokens import count_tokens
+from app.database import models
+from app.database.database import AsyncSessionLocal
+from app.services.embedding_service import delete_vectors_async, embed_texts_async, upsert_vectors_async
+from app.services.file_storage import blob_path
+from app.services.memory_ingestion import chunk_id, epoch_seconds
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # optional; PDFs can't be ingested without it
+    PdfReader = None
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+TEXT_TYPES = {"text/plain", "text/markdown", "text/x-markdown"}
+PDF_TYPE = "application/pdf"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+# --- Parsers: each yields the document text in pieces ---
+
+def iter_text(path: str, chunk_size: int = 1024 * 1024) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            yield decoder.decode(data)
+    yield decoder.decode(b"", final=True)
+
+
+def iter_pdf(path: str) -> Iterator[str]:
+    if PdfReader is None:
+        raise RuntimeError("PDF ingestion requires the 'pypdf' package")
+    # Pages are parsed lazily as they are accessed
+    for page in PdfReader(path).pages:
+        yield (page.extract_text() or "") + "\n\n"
+
+
+def iter_docx(path: str) -> Iterator[str]:
+    # Walks word/document.xml incrementally, one paragraph at a time
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        parts: List[str] = []
+        for event, element in ElementTree.iterparse(xml, events=("end",)):
+            if element.tag == _W_NS + "t":
+                parts.append(element.text or "")
+            elif element.tag == _W_NS + "tab":
+                parts.append("\t")
+            elif element.tag == _W_NS + "p":
+                yield "".join(parts) + "\n\n"
+                parts = []
+                element.clear()
+
+
+def parser_for(mime_type: Optional[str], filename: str = ""):
+    """
+    Raises:
+        ValueError: If the file type isn't supported.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    if mime_type in TEXT_TYPES or ext in (".txt", ".md", ".markdown"):
+        return iter_text
+    if mime_type == PDF_TYPE or ext == ".pdf":
+        return iter_pdf
+    if mime_type == DOCX_TYPE or ext == ".docx":
+        return iter_docx
+    raise ValueError(f"Unsupported file type: {mime_type or ext or 'unknown'}")
+
+
+def iter_chunks(pieces: Iterator[str], chunk_tokens: int, overlap_tokens: int) -> Iterator[str]:
+    """
+    split_text over a stream of text pieces. Text is buffered only until a few
+    chunks' worth is available; the last (possibly partial) chunk is carried
+    over, with its trailing whitespace, so it can still grow at the next
+    paragraph or sentence boundary.
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        if count_tokens(buffer) < chunk_tokens * 4:
+            continue
+        chunks = split_text(buffer, chunk_tokens, overlap_tokens)
+        yield from chunks[:-1]
+        buffer = buffer[buffer.rfind(chunks[-1]):] if chunks else ""
+    yield from split_text(buffer, chunk_tokens, overlap_tokens)
+
+
+def spool_chunks(path: str, mime_type: Optional[str], filename: str, spool_path: str) -> int:
+    """
+    Parses and chunks a file, writing one JSON string per line to spool_path.
+    Runs in the process pool.
+
+    Returns:
+        The number of chunks written.
+    """
+    parse = parser_for(mime_type, filename)
+    count = 0
+    with open(spool_path, "w", encoding="utf-8") as spool:
+        for chunk in iter_chunks(parse(path), config.MEMORY_CHUNK_TOKENS, config.MEMORY_CHUNK_OVERLAP_TOKENS):
+            spool.write(json.dumps(chunk) + "\n")
+            count += 1
+    return count
+
+
+def _read_spool(spool_path: str) -> Iterator[str]:
+    with open(spool_path, encoding="utf-8") as spool:
+        for line in spool:
+            yield json.loads(line)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=config.FILE_INGEST_PROCESSES)
+    return _pool
+
+
+async def _update_file(file_id: str, **values):
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(models.File).where(models.File.id == file_id).values(**values))
+        await db.commit()
+
+
+def _lease() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=config.FILE_INGEST_LEASE_SECONDS)
+
+
+async def claim(db, file_id: str) -> bool:
+    """
+    Marks the file "processing" under a fresh lease, unless an ingestion
+    whose lease is still live holds it. Claim a file before scheduling its
+    ingestion, so concurrent requests can't both schedule one.
+
+    Returns:
+        Whether the file was claimed.
+    """
+    result = await db.execute(
+        update(models.File)
+        .where(
+            models.File.id == file_id,
+            or_(
+                models.File.status != "processing",
+                models.File.lease_until.is_(None),
+                models.File.lease_until <= datetime.utcnow()
+            )
+        )
+        .values(status="processing", lease_until=_lease(), chunks_ingested=0, error=None)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+
+async def _renew_lease(file_id: str):
+    # A claimed file may wait for a free slot, and parsing a large file can
+    # take a while, both without any progress update
+    while True:
+        await asyncio.sleep(config.FILE_INGEST_LEASE_SECONDS / 3)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(models.File)
+                    .where(models.File.id == file_id, models.File.status == "processing")
+                    .values(lease_until=_lease())
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"File ingestion lease renewal error for file {file_id}: {e}")
+
+
+async def ingest_file(file_id: str) -> int:
+    """
+    Parses, chunks, embeds and upserts one claimed file (see claim()),
+    updating its status and progress as it goes. Vectors from an earlier
+    ingestion are deleted first, as the file may now split into fewer chunks.
+
+    Returns:
+        The number of chunks ingested.
+    """
+    async with AsyncSessionLocal() as db:
+        record = await db.get(models.File, file_id)
+    if record is None:
+        raise ValueError(f"File {file_id} not found")
+
+    if record.chunks_total:
+        await delete_vectors_async(
+            [chunk_id(file_id, i) for i in range(record.chunks_total)], namespace=record.user_id
+        )
+    await _update_file(file_id, chunks_total=None)
+    tmp_dir = os.path.join(config.UPLOAD_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    spool_path = os.path.join(tmp_dir, f"{uuid.uuid4().hex}.chunks.jsonl")
+    chunks = None
+
+    try:
+        loop = asyncio.get_running_loop()
+        total = await loop.run_in_executor(
+            _get_pool(), spool_chunks,
+            blob_path(record.sha256), record.mime_type, record.filename, spool_path
+        )
+        await _update_file(file_id, chunks_total=total)
+
+        chunks = _read_spool(spool_path)
+        done = 0
+        while True:
+            batch = await asyncio.to_thread(lambda: list(islice(chunks, config.MEMORY_INGEST_BATCH_SIZE)))
+            if not batch:
+                break
+            embeddings = await embed_texts_async(batch)
+            await upsert_vectors_async(
+                embeddings,
+                [
+                    {
+                        "text": text,
+                        "tags": [],
+                        "emotion": "neutral",
+                        "user_id": record.user_id,
+                        "file_id": file_id,
+                        "filename": record.filename,
+                        "chunk_index": done + i,
+                        "timestamp": epoch_seconds(record.created_at)
+                    }
+                    for i, text in enumerate(batch)
+                ],
+                [chunk_id(file_id, done + i) for i in range(len(batch))],
+                namespace=record.user_id
+            )
+            done += len(batch)
+            await _update_file(file_id, chunks_ingested=done)
+
+        await _update_file(file_id, status="ingested", lease_until=None)
+        metrics.incr("file_ingestion.files")
+        metrics.incr("file_ingestion.chunks", done)
+        return done
+    except Exception as e:
+        await _update_file(file_id, status="failed", error=str(e)[:2000], lease_until=None)
+        metrics.incr("file_ingestion.failed")
+        raise
+    finally:
+        if chunks is not None:
+            chunks.close()
+        try:
+            os.remove(spool_path)
+        except FileNotFoundError:
+            pass
+
+
+_semaphore: Optional[asyncio.Semaphore] = None
+_tasks: Set[asyncio.Task] = set()
+
+
+async def _ingest_in_background(file_id: str):
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(config.FILE_INGEST_CONCURRENCY)
+    heartbeat = asyncio.create_task(_renew_lease(file_id))
+    try:
+        async with _semaphore:
+            await ingest_file(file_id)
+    except Exception as e:
+        print(f"File ingestion error for file {file_id}: {e}")
+    finally:
+        heartbeat.cancel()
+
+
+def schedule_ingestion(file_id: str):
+    """
+    Starts ingesting a claimed file in the background of the running event loop.
+    """
+    task = asyncio.create_task(_ingest_in_background(file_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def shutdown():
+    """
+    Cancels in-flight ingestions and stops the process pool.
+    """
+    global _pool
+    tasks = list(_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
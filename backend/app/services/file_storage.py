@@ -0,0 +1,261 @@
+# Content-addressed upload storage. Every blob lives once under
+# UPLOAD_DIR/blobs/<sha256[:2]>/<sha256>, so identical uploads share a file.
+# Writes stream through a temp file in fixed-size chunks, with the hash
+# computed on the fly and file I/O kept off the event loop.
+#
+# Large files can be sent as a resumable multipart upload: parts are stored
+# under UPLOAD_DIR/sessions/<upload_id>/ and can be re-sent individually,
+# then complete_session() concatenates them into a blob.
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.core import config
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadSessionNotFound(Exception):
+    pass
+
+
+@dataclass
+class StoredBlob:
+    sha256: str
+    size: int
+    path: str
+    deduplicated: bool
+
+
+def _blobs_dir() -> str:
+    return os.path.join(config.UPLOAD_DIR, "blobs")
+
+
+def _tmp_dir() -> str:
+    return os.path.join(config.UPLOAD_DIR, "tmp")
+
+
+def _sessions_dir() -> str:
+    return os.path.join(config.UPLOAD_DIR, "sessions")
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(_blobs_dir(), sha256[:2], sha256)
+
+
+async def iter_upload(file, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Reads a starlette UploadFile in chunks without blocking the event loop.
+    """
+    chunk_size = chunk_size or config.UPLOAD_CHUNK_SIZE
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _write_chunk(fh, hasher, chunk: bytes):
+    hasher.update(chunk)
+    fh.write(chunk)
+
+
+async def _write_stream(chunks: AsyncIterator[bytes], path: str, max_bytes: int):
+    """
+    Streams chunks into path, hashing as it goes. Removes the partial file
+    and raises UploadTooLarge as soon as max_bytes is exceeded.
+
+    Returns:
+        (sha256 hexdigest, size in bytes)
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    fh = await asyncio.to_thread(open, path, "wb")
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+            await asyncio.to_thread(_write_chunk, fh, hasher, chunk)
+        await asyncio.to_thread(fh.close)
+    except BaseException:
+        await asyncio.to_thread(fh.close)
+        await asyncio.to_thread(_remove, path)
+        raise
+    return hasher.hexdigest(), size
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _commit_blob(tmp_path: str, sha256: str) -> bool:
+    # Returns True when an identical blob already existed
+    final = blob_path(sha256)
+    if os.path.exists(final):
+        os.remove(tmp_path)
+        return True
+    os.makedirs(os.path.dirname(final), exist_ok=True)
+    os.replace(tmp_path, final)
+    return False
+
+
+async def store_stream(chunks: AsyncIterator[bytes], max_bytes: Optional[int] = None) -> StoredBlob:
+    """
+    Stores a byte stream as a content-addressed blob.
+
+    Raises:
+        UploadTooLarge: If the stream is longer than max_bytes (UPLOAD_MAX_BYTES by default).
+    """
+    max_bytes = config.UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    os.makedirs(_tmp_dir(), exist_ok=True)
+    tmp_path = os.path.join(_tmp_dir(), uuid.uuid4().hex)
+
+    sha256, size = await _write_stream(chunks, tmp_path, max_bytes)
+    deduplicated = await asyncio.to_thread(_commit_blob, tmp_path, sha256)
+    return StoredBlob(sha256=sha256, size=size, path=blob_path(sha256), deduplicated=deduplicated)
+
+
+# --- Resumable multipart uploads ---
+
+def _session_dir(upload_id: str) -> str:
+    try:
+        upload_id = uuid.UUID(upload_id).hex
+    except ValueError:
+        raise UploadSessionNotFound(upload_id)
+    return os.path.join(_sessions_dir(), upload_id)
+
+
+def _part_path(session_dir: str, part_number: int) -> str:
+    return os.path.join(session_dir, f"{part_number:06d}.part")
+
+
+def _read_session(upload_id: str, owner: str) -> Dict[str, Any]:
+    session_dir = _session_dir(upload_id)
+    try:
+        with open(os.path.join(session_dir, "session.json")) as f:
+            session = json.load(f)
+    except FileNotFoundError:
+        raise UploadSessionNotFound(upload_id)
+    if session["owner"] != owner:
+        raise UploadSessionNotFound(upload_id)
+
+    parts = []
+    for name in sorted(os.listdir(session_dir)):
+        if name.endswith(".part"):
+            parts.append({
+                "part_number": int(name[:-len(".part")]),
+                "size": os.path.getsize(os.path.join(session_dir, name))
+            })
+    return {**session, "upload_id": upload_id, "dir": session_dir, "parts": parts}
+
+
+def _purge_expired_sessions():
+    root = _sessions_dir()
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - config.UPLOAD_SESSION_TTL
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _create_session(owner: str, filename: str) -> Dict[str, Any]:
+    _purge_expired_sessions()
+    upload_id = uuid.uuid4().hex
+    session_dir = os.path.join(_sessions_dir(), upload_id)
+    os.makedirs(session_dir)
+    session = {"owner": owner, "filename": filename, "created_at": time.time()}
+    with open(os.path.join(session_dir, "session.json"), "w") as f:
+        json.dump(session, f)
+    return {**session, "upload_id": upload_id, "parts": []}
+
+
+async def create_session(owner: str, filename: str) -> Dict[str, Any]:
+    return await asyncio.to_thread(_create_session, owner, filename)
+
+
+async def get_session(upload_id: str, owner: str) -> Dict[str, Any]:
+    """
+    Raises:
+        UploadSessionNotFound: If the session doesn't exist or belongs to someone else.
+    """
+    return await asyncio.to_thread(_read_session, upload_id, owner)
+
+
+async def write_part(upload_id: str, owner: str, part_number: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """
+    Stores one part of a multipart upload. Re-sending a part replaces it, so
+    an interrupted upload resumes by sending only the parts get_session()
+    doesn't list.
+
+    Raises:
+        UploadSessionNotFound: If the session doesn't exist or belongs to someone else.
+        UploadTooLarge: If the parts together would exceed UPLOAD_MAX_BYTES.
+    """
+    session = await get_session(upload_id, owner)
+    stored = sum(p["size"] for p in session["parts"] if p["part_number"] != part_number)
+
+    final = _part_path(session["dir"], part_number)
+    # Unique per write, so concurrent re-sends of a part don't share a file
+    tmp_path = f"{final}.{uuid.uuid4().hex}.tmp"
+    sha256, size = await _write_stream(chunks, tmp_path, config.UPLOAD_MAX_BYTES - stored)
+    # Only fully received parts get their final name
+    await asyncio.to_thread(os.replace, tmp_path, final)
+    return {"part_number": part_number, "size": size, "sha256": sha256}
+
+
+async def _read_parts(paths: List[str]) -> AsyncIterator[bytes]:
+    for path in paths:
+        fh = await asyncio.to_thread(open, path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(fh.read, config.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await asyncio.to_thread(fh.close)
+
+
+async def complete_session(upload_id: str, owner: str, expected_parts: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Joins the parts in part-number order into a blob and removes the session.
+
+    Raises:
+        ValueError: If the parts aren't exactly 1..N (N = expected_parts when given).
+
+    Returns:
+        The session (with filename) and the resulting StoredBlob under "blob".
+    """
+    session = await get_session(upload_id, owner)
+    numbers = [p["part_number"] for p in session["parts"]]
+    if not numbers:
+        raise ValueError("Upload has no parts")
+    if expected_parts is not None and numbers[-1] != expected_parts:
+        raise ValueError(f"Expected {expected_parts} parts, the highest part received is {numbers[-1]}")
+    missing = sorted(set(range(1, numbers[-1] + 1)) - set(numbers))
+    if missing:
+        raise ValueError(f"Missing parts: {', '.join(map(str, missing[:20]))}")
+
+    paths = [_part_path(session["dir"], p["part_number"]) for p in session["parts"]]
+    blob = await store_stream(_read_parts(paths))
+    await asyncio.to_thread(shutil.rmtree, session["dir"], True)
+    return {**session, "blob": blob}
+
+
+async def abort_session(upload_id: str, owner: str):
+    session = await get_session(upload_id, owner)
+    await asyncio.to_thread(shutil.rmtree, session["dir"], True)
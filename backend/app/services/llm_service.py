@@ -1,25 +1,49 @@
 import os
-import openai
-from typing import AsyncGenerator, List, Dict, Any
+from typing import AsyncGenerator, List, Dict, Any, Optional
 import json
 from tenacity import retry, wait_exponential, stop_after_attempt
+from app.core import config
+from app.core.clients import clients
+from app.services.response_cache import response_cache
 
 class LLMService:
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             print("Warning: OPENAI_API_KEY not set. LLM features will fail.")
-        self.client = openai.AsyncOpenAI(api_key=self.api_key)
+
+    @property
+    def client(self):
+        # Pooled AsyncOpenAI client shared with the rest of the process
+        return clients.async_openai_client()
+
+    @staticmethod
+    def _cache_for(cache_scope: Optional[str]):
+        # Caching is opt-in twice: globally via config, and per call via a scope
+        return response_cache if cache_scope is not None and config.RESPONSE_CACHE_ENABLED else None
 
     async def stream_chat(
         self, 
         messages: List[Dict[str, str]], 
         model: str = "gpt-4o-mini",
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        cache_scope: Optional[str] = None
     ) -> AsyncGenerator[str, None]:
         """
         Streams chat completion from OpenAI.
+
+        With a cache_scope (e.g. the user ID) and RESPONSE_CACHE_ENABLED, a
+        cached answer for the same or a semantically similar prompt in that
+        scope is replayed as a single chunk instead.
         """
+        cache = self._cache_for(cache_scope)
+        if cache:
+            cached = await cache.lookup(cache_scope, model, messages)
+            if cached is not None:
+                yield cached
+                return
+
+        parts = []
         try:
             stream = await self.client.chat.completions.create(
                 model=model,
@@ -30,27 +54,43 @@ class LLMService:
 
             async for chunk in stream:
                 if chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
                     yield chunk.choices[0].delta.content
 
         except Exception as e:
             print(f"Error in stream_chat: {e}")
             yield f"Error: {str(e)}"
+            return
+
+        # Only complete answers are cached
+        if cache and parts:
+            await cache.store(cache_scope, model, messages, "".join(parts))
 
     @retry(wait=wait_exponential(multiplier=1, min=4, max=10), stop=stop_after_attempt(3))
     async def get_chat_completion(
         self, 
         messages: List[Dict[str, str]], 
-        model: str = "gpt-4o-mini"
+        model: str = "gpt-4o-mini",
+        cache_scope: Optional[str] = None
     ) -> str:
         """
-        Non-streaming chat completion with retries.
+        Non-streaming chat completion with retries. cache_scope works as in stream_chat.
         """
+        cache = self._cache_for(cache_scope)
+        if cache:
+            cached = await cache.lookup(cache_scope, model, messages)
+            if cached is not None:
+                return cached
+
         try:
             response = await self.client.chat.completions.create(
                 model=model,
                 messages=messages
             )
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            if cache and content:
+                await cache.store(cache_scope, model, messages, content)
+            return content
         except Exception as e:
             print(f"Error in get_chat_completion: {e}")
             raise e
@@ -0,0 +1,161 @@
+# Maintains the memory graph. When the outbox workers ingest a memory, its
+# nearest neighbours and the memories sharing its tags are computed once and
+# stored as models.MemoryLink rows; "related memories" and graph-expanded
+# retrieval then read a per-user app.core.memory_graph.MemoryGraph, loaded
+# from those rows and cached, instead of issuing more vector queries.
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.core.memory_graph import Edge, MemoryGraph, memory_id_of, merge_edges, similar_edges, tag_edges
+from app.core.metrics import metrics
+from app.core.text_splitter import split_text
+from app.core.vectorstore import VectorMatch
+from app.database import models
+from app.database.database import AsyncSessionLocal
+from app.services.embedding_service import embed_texts_async, query_vectors_async
+from app.services.memory_search import load_memory_matches
+
+_graphs = TTLCache(maxsize=config.MEMORY_GRAPH_CACHE_USERS, ttl=config.MEMORY_GRAPH_CACHE_TTL)
+
+
+async def load_graph(user_id: str) -> MemoryGraph:
+    """
+    The user's memory graph, from the cache or built from their MemoryLink rows.
+    """
+    graph = _graphs.get(user_id)
+    if graph is not None:
+        return graph
+
+    graph = MemoryGraph(max_degree=config.MEMORY_GRAPH_MAX_DEGREE)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(models.MemoryLink.memory_id, models.MemoryLink.neighbor_id, models.MemoryLink.score)
+            .filter(models.MemoryLink.user_id == user_id)
+            .execution_options(yield_per=10000)
+        )
+        async for row in result:
+            # Both directions are stored as rows
+            graph.add_edges(row.memory_id, [(row.neighbor_id, row.score)], symmetric=False)
+    _graphs.set(user_id, graph)
+    metrics.observe("memory_graph.edges", graph.edge_count)
+    return graph
+
+
+async def _tag_candidates(user_id: str) -> List[Tuple[str, Any]]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(models.Memory.id, models.Memory.tags)
+            .filter(models.Memory.user_id == user_id)
+            .order_by(models.Memory.timestamp.desc(), models.Memory.id.desc())
+            .limit(config.MEMORY_GRAPH_TAG_SCAN)
+        )
+        return [(row.id, row.tags) for row in result]
+
+
+async def link_memories(memories: List[Dict[str, Any]]) -> int:
+    """
+    Computes and stores the graph edges of freshly ingested memories (dicts
+    with id, user_id, text and tags), replacing any edges they had.
+
+    Each memory is queried with the embedding of its first chunk, which the
+    ingestion that just ran has left in the embedding cache.
+
+    Returns:
+        The number of MemoryLink rows written.
+    """
+    memories = [m for m in memories if (m.get("text") or "").strip()]
+    if not config.MEMORY_GRAPH_ENABLED or not memories:
+        return 0
+
+    first_chunks = [
+        split_text(m["text"], chunk_tokens=config.MEMORY_CHUNK_TOKENS, overlap_tokens=config.MEMORY_CHUNK_OVERLAP_TOKENS)[0]
+        for m in memories
+    ]
+    embeddings = await embed_texts_async(first_chunks)
+    # Chunks of the memory itself and several chunks per neighbour come back too
+    top_k = config.MEMORY_GRAPH_NEIGHBORS * 3 + 1
+    user_ids = list({m["user_id"] for m in memories})
+    matches, candidates = await asyncio.gather(
+        asyncio.gather(*(
+            query_vectors_async(embedding, top_k=top_k, namespace=m["user_id"])
+            for m, embedding in zip(memories, embeddings)
+        )),
+        asyncio.gather(*(_tag_candidates(user_id) for user_id in user_ids))
+    )
+    candidates_by_user = dict(zip(user_ids, candidates))
+
+    edges: Dict[str, Dict[str, float]] = {}
+    pairs: Dict[Tuple[str, str], Tuple[str, float]] = {}
+    for memory, memory_matches in zip(memories, matches):
+        k = config.MEMORY_GRAPH_NEIGHBORS
+        merged = merge_edges(
+            similar_edges(memory["id"], memory_matches, k, config.MEMORY_GRAPH_MIN_SCORE),
+            tag_edges(memory["id"], memory.get("tags"), candidates_by_user[memory["user_id"]], k)
+        )
+        edges[memory["id"]] = merged
+        for neighbor_id, score in merged.items():
+            for pair in ((memory["id"], neighbor_id), (neighbor_id, memory["id"])):
+                if score > pairs.get(pair, ("", 0.0))[1]:
+                    pairs[pair] = (memory["user_id"], score)
+
+    memory_ids = [m["id"] for m in memories]
+    rows = [
+        {"memory_id": a, "neighbor_id": b, "user_id": user_id, "score": score}
+        for (a, b), (user_id, score) in pairs.items()
+    ]
+    async with AsyncSessionLocal() as db:
+        try:
+            await db.execute(delete(models.MemoryLink).where(or_(
+                models.MemoryLink.memory_id.in_(memory_ids),
+                models.MemoryLink.neighbor_id.in_(memory_ids)
+            )))
+            if rows:
+                await db.execute(insert(models.MemoryLink).values(rows))
+            await db.commit()
+        except IntegrityError:
+            # Another worker linked one of these memories at the same time; its edges stand
+            await db.rollback()
+            return 0
+
+    # Keep graphs this process has loaded current; other processes catch up after the TTL
+    for memory in memories:
+        graph = _graphs.get(memory["user_id"])
+        if graph is not None:
+            graph.remove(memory["id"])
+            graph.add_edges(memory["id"], edges[memory["id"]].items())
+    metrics.incr("memory_graph.links", len(rows))
+    return len(rows)
+
+
+async def related(memory_id: str, user_id: str, limit: int = 10) -> List[Edge]:
+    graph = await load_graph(user_id)
+    return graph.neighbors_of(memory_id, limit)
+
+
+async def expand_matches(matches: List[VectorMatch], user_id: str, limit: int = config.MEMORY_GRAPH_EXPAND) -> List[VectorMatch]:
+    """
+    Graph-expanded retrieval: up to `limit` memories one hop from the matched
+    ones, as matches scored by their seed's score times the edge weight (so
+    below the direct hits). Their text is cut to one chunk's worth of tokens.
+    """
+    if not config.MEMORY_GRAPH_ENABLED or not limit or not matches:
+        return []
+    try:
+        graph = await load_graph(user_id)
+        seeds: Dict[str, float] = defaultdict(float)
+        for match in matches:
+            memory_id = memory_id_of(match)
+            seeds[memory_id] = max(seeds[memory_id], match.score)
+        neighbors = graph.expand(seeds, limit)
+        expanded = await load_memory_matches(user_id, neighbors, related=True)
+    except Exception as e:
+        print(f"Memory graph expansion error: {e}")
+        return []
+    metrics.incr("memory_graph.expanded", len(expanded))
+    return expanded
@@ -0,0 +1,91 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.core import config
+from app.core.text_splitter import split_text
+from app.services.embedding_service import embed_texts_async, upsert_vectors_async
+
+
+def chunk_id(memory_id: str, index: int) -> str:
+    """
+    Vector ID of a memory chunk. The part before '#' is the Memory.id.
+    """
+    return f"{memory_id}#{index}"
+
+
+def memory_id_from_chunk_id(vector_id: str) -> str:
+    return vector_id.split("#", 1)[0]
+
+
+def epoch_seconds(value: Optional[datetime]) -> Optional[float]:
+    # Columns hold naive UTC datetimes; vector metadata stores epoch seconds
+    return value.replace(tzinfo=timezone.utc).timestamp() if value else None
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def ingest_memories(memories: List[Dict[str, Any]]) -> int:
+    """
+    Chunks, embeds and upserts a batch of memories.
+
+    Each memory is a dict with id, user_id, text, tags, emotion and
+    optionally timestamp (the models.Memory columns). Every chunk is embedded in the same batched call
+    and upserted under chunk_id(memory_id, i) in the user's namespace.
+
+    Returns:
+        The number of vectors upserted.
+    """
+    ids, texts, metadata = [], [], []
+    for memory in memories:
+        chunks = split_text(
+            memory["text"] or "",
+            chunk_tokens=config.MEMORY_CHUNK_TOKENS,
+            overlap_tokens=config.MEMORY_CHUNK_OVERLAP_TOKENS
+        )
+        for i, chunk in enumerate(chunks):
+            ids.append(chunk_id(memory["id"], i))
+            texts.append(chunk)
+            metadata.append({
+                "text": chunk,
+                "tags": memory.get("tags") or [],
+                "emotion": memory.get("emotion") or "neutral",
+                "user_id": memory["user_id"],
+                "memory_id": memory["id"],
+                "chunk_index": i
+            })
+            timestamp = epoch_seconds(memory.get("timestamp"))
+            if timestamp is not None:
+                metadata[-1]["timestamp"] = timestamp
+
+    if not ids:
+        return 0
+
+    embeddings = await embed_texts_async(texts)
+
+    # Each user's vectors live in their own namespace, so retrieval only
+    # scans (and ranks against) that user's memories
+    by_user: Dict[str, List[int]] = defaultdict(list)
+    for i, meta in enumerate(metadata):
+        by_user[meta["user_id"]].append(i)
+
+    counts = await asyncio.gather(*(
+        upsert_vectors_async(
+            [embeddings[i] for i in rows],
+            [metadata[i] for i in rows],
+            [ids[i] for i in rows],
+            namespace=user_id
+        )
+        for user_id, rows in by_user.items()
+    ))
+    return sum(counts)
@@ -0,0 +1,171 @@
+# Hybrid memory retrieval. Each user's memories (text and tags) are kept in
+# an in-process BM25 index, loaded from the database on first use, cached and
+# updated as memories are saved. A search runs the keyword index and the
+# vector query concurrently and merges them with reciprocal rank fusion. In
+# "auto" mode (the /search endpoint's default), short identifier-like queries
+# and quoted phrases the index can answer are served from it alone, without an
+# embedding call; chat and agent retrieval always use both.
+import asyncio
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import select
+
+from app.core import config
+from app.core.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from app.core.cache import TTLCache
+from app.core.memory_graph import memory_id_of
+from app.core.metrics import metrics
+from app.core.tokens import truncate_tokens
+from app.core.vectorstore import VectorMatch
+from app.database import models
+from app.database.database import AsyncSessionLocal
+from app.services.embedding_service import embed_texts_async, query_vectors_async
+from app.services.memory_ingestion import chunk_id, epoch_seconds
+
+# A term that looks like an identifier: a digit, or a symbol inside a word
+# (INV-2041, jane@acme.com, #billing, snake_case)
+_IDENTIFIER = re.compile(r"\d|\w[_@#/:.\-]\w|^[#@]\w")
+
+_indexes = TTLCache(maxsize=config.SEARCH_INDEX_CACHE_USERS, ttl=config.SEARCH_INDEX_CACHE_TTL)
+
+
+def _document(text: str, tags: Any) -> str:
+    return " ".join([text or "", *(tags or [])])
+
+
+def is_exact_query(query: str) -> bool:
+    """
+    Whether the query is a quoted phrase, or at most SEARCH_KEYWORD_MAX_TERMS
+    words including an identifier. Capitalised words don't count: short chat
+    messages ("Tell me more") would otherwise skip vector retrieval.
+    """
+    query = query.strip()
+    if len(query) > 2 and query[0] == query[-1] == '"':
+        return True
+    terms = query.split()
+    return 0 < len(terms) <= config.SEARCH_KEYWORD_MAX_TERMS and any(_IDENTIFIER.search(t) for t in terms)
+
+
+async def load_index(user_id: str) -> BM25Index:
+    """
+    The user's keyword index, from the cache or built from their memories.
+    """
+    index = _indexes.get(user_id)
+    if index is not None:
+        return index
+
+    index = BM25Index()
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(models.Memory.id, models.Memory.text, models.Memory.tags)
+            .filter(models.Memory.user_id == user_id)
+            .execution_options(yield_per=10000)
+        )
+        async for row in result:
+            index.add(row.id, _document(row.text, row.tags))
+    _indexes.set(user_id, index)
+    return index
+
+
+def index_memories(memories: Iterable[Any]):
+    """
+    Adds saved memories (objects with id, user_id, text and tags) to the
+    indexes this process has loaded; other processes pick them up once
+    their cached index expires.
+    """
+    for memory in memories:
+        index = _indexes.get(memory.user_id)
+        if index is not None:
+            index.add(memory.id, _document(memory.text, memory.tags))
+
+
+async def load_memory_matches(user_id: str, scored: Sequence[Tuple[str, float]], **metadata: Any) -> List[VectorMatch]:
+    """
+    (memory_id, score) pairs as matches shaped like vector store hits, for
+    memories found without a vector query. Their text is cut to one chunk's
+    worth of tokens; `metadata` is added to each match's metadata.
+    """
+    if not scored:
+        return []
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(
+                models.Memory.id, models.Memory.text, models.Memory.tags,
+                models.Memory.emotion, models.Memory.timestamp
+            )
+            .filter(models.Memory.id.in_([memory_id for memory_id, _ in scored]), models.Memory.user_id == user_id)
+        )
+        rows = {row.id: row for row in result}
+
+    matches = []
+    for memory_id, score in scored:
+        row = rows.get(memory_id)
+        if row is None or not row.text:
+            continue
+        meta = {
+            "text": truncate_tokens(row.text, config.MEMORY_CHUNK_TOKENS),
+            "tags": row.tags or [],
+            "emotion": row.emotion or "neutral",
+            "user_id": user_id,
+            "memory_id": memory_id,
+            **metadata
+        }
+        timestamp = epoch_seconds(row.timestamp)
+        if timestamp is not None:
+            meta["timestamp"] = timestamp
+        matches.append(VectorMatch(id=chunk_id(memory_id, 0), score=score, metadata=meta))
+    return matches
+
+
+async def _vector_search(query: str, user_id: str, top_k: int) -> List[VectorMatch]:
+    embedding = (await embed_texts_async([query]))[0]
+    return await query_vectors_async(embedding, top_k=top_k, namespace=user_id)
+
+
+async def _keyword_search(query: str, user_id: str, top_k: int) -> List[Tuple[str, float]]:
+    index = await load_index(user_id)
+    return index.search(query.strip('"'), top_k)
+
+
+async def search(query: str, user_id: str, top_k: int = 5, mode: str = "hybrid") -> List[VectorMatch]:
+    """
+    Searches the user's memories.
+
+    Args:
+        mode: "vector", "keyword", "hybrid" or "auto". Hybrid fuses both
+            rankings per memory with reciprocal rank fusion; every vector
+            chunk of a memory is kept and given the memory's fused score.
+            Auto is hybrid, except that exact-looking queries (is_exact_query)
+            with keyword hits skip the vector query; it is meant for search
+            boxes, not for free-form chat messages.
+    """
+    if mode == "vector" or not config.SEARCH_HYBRID_ENABLED or not tokenize(query):
+        return await _vector_search(query, user_id, top_k)
+
+    if mode == "keyword" or (mode == "auto" and is_exact_query(query)):
+        keyword_hits = await _keyword_search(query, user_id, top_k)
+        if keyword_hits or mode == "keyword":
+            metrics.incr("search.keyword_only")
+            return await load_memory_matches(user_id, keyword_hits)
+
+    vector_matches, keyword_hits = await asyncio.gather(
+        _vector_search(query, user_id, top_k),
+        _keyword_search(query, user_id, top_k)
+    )
+
+    chunks: Dict[str, List[VectorMatch]] = defaultdict(list)
+    for match in vector_matches:
+        chunks[memory_id_of(match)].append(match)
+    fused = reciprocal_rank_fusion([list(chunks), [memory_id for memory_id, _ in keyword_hits]], k=config.SEARCH_RRF_K)
+
+    keyword_only = await load_memory_matches(
+        user_id, [(memory_id, score) for memory_id, score in fused if memory_id not in chunks]
+    )
+    by_memory = {memory_id_of(match): [match] for match in keyword_only}
+    results = []
+    for memory_id, score in fused:
+        for match in chunks.get(memory_id) or by_memory.get(memory_id, []):
+            results.append(VectorMatch(id=match.id, score=score, metadata=match.metadata))
+    return results[:top_k]
@@ -1,46 +1,171 @@
-import os
+import asyncio
 import json
-from typing import Dict, Any
-import openai
-
-# Simple keyword-based mood detection
-KEYWORDS = {
-    "happy": ["happy", "joy", "excited", "great", "good", "awesome", "love"],
-    "sad": ["sad", "depressed", "unhappy", "bad", "terrible", "cry", "grief"],
-    "angry": ["angry", "mad", "furious", "hate", "rage", "annoyed"],
-    "anxious": ["anxious", "nervous", "worried", "scared", "fear"],
-    "neutral": ["okay", "fine", "normal"]
-}
+from typing import Any, Dict, List, Optional
+from app.core import config
+from app.core.batching import MicroBatcher
+from app.core.cache import TTLCache
+from app.core.clients import clients
+from app.core.metrics import metrics
+from app.core.neuro_sync import match_mood
+from app.core.ratelimit import TokenBucket
+
+DEFAULT_MOOD = {"emotion": "neutral", "intensity": 1}
+
+_BATCH_PROMPT = (
+    "Analyze the emotion of each numbered text. Return JSON of the form "
+    '{"moods": [{"emotion": str, "intensity": 1-10 int}, ...]} with exactly one entry per text, in order.'
+)
+
+# Fallback results per normalised text
+_cache = TTLCache(maxsize=config.MOOD_CACHE_SIZE, ttl=config.MOOD_CACHE_TTL)
+_rate_limiter = TokenBucket(config.MOOD_LLM_RPS)
+_semaphore: Optional[asyncio.Semaphore] = None
+_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def normalize(text: str) -> str:
+    # Cache key and prompt text; long inputs are cut to bound the prompt size
+    return " ".join(text.lower().split())[:2000]
+
+
+def _parse_mood(value: Any) -> Dict[str, Any]:
+    try:
+        return {
+            "emotion": str(value["emotion"]).lower(),
+            "intensity": max(1, min(10, int(value["intensity"])))
+        }
+    except (KeyError, TypeError, ValueError):
+        return dict(DEFAULT_MOOD)
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(config.MOOD_LLM_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+async def _classify_batch(texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Classifies several normalised texts with one chat completion and caches
+    the results.
+    """
+    unique = list(dict.fromkeys(texts))
+    prompt = "\n".join(f"{i + 1}. {json.dumps(text)}" for i, text in enumerate(unique))
+
+    await _rate_limiter.acquire()
+    async with _get_semaphore():
+        response = await clients.async_openai_client().chat.completions.create(
+            model=config.MOOD_LLM_MODEL,
+            messages=[
+                {"role": "system", "content": _BATCH_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+    metrics.incr("mood.llm_calls")
+
+    moods = json.loads(response.choices[0].message.content).get("moods") or []
+    results = {}
+    for i, text in enumerate(unique):
+        results[text] = _parse_mood(moods[i] if i < len(moods) else None)
+        _cache.set(text, results[text])
+    return [results[text] for text in texts]
+
+
+_batcher = MicroBatcher(
+    _classify_batch,
+    max_wait=config.MOOD_LLM_BATCH_WINDOW_MS / 1000,
+    max_items=config.MOOD_LLM_BATCH_SIZE,
+    name="mood_batcher",
+)
+
+
+def _consume_result(task: asyncio.Task):
+    # The classification may outlive a caller that timed out; its result still
+    # lands in the cache, and errors must not go unretrieved
+    if not task.cancelled():
+        task.exception()
+
+
+async def detect_mood_async(text: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Detects mood from text using the keyword matcher, falling back to a cached,
+    batched and rate-limited LLM classification. Returns the neutral default
+    if the LLM doesn't answer within `timeout` (MOOD_LLM_TIMEOUT) seconds.
+    Returns: {emotion: str, intensity: int}
+    """
+    mood = match_mood(text)
+    if mood is not None:
+        metrics.incr("mood.keyword_hits")
+        return mood
+
+    key = normalize(text)
+    if not key or not config.MOOD_LLM_ENABLED:
+        return dict(DEFAULT_MOOD)
+
+    cached = _cache.get(key)
+    if cached is not None:
+        metrics.incr("mood.cache_hits")
+        return dict(cached)
+
+    task = asyncio.ensure_future(_batcher.submit(key))
+    task.add_done_callback(_consume_result)
+    try:
+        return await asyncio.wait_for(
+            asyncio.shield(task),
+            timeout=config.MOOD_LLM_TIMEOUT if timeout is None else timeout
+        )
+    except asyncio.TimeoutError:
+        metrics.incr("mood.timeouts")
+    except Exception as e:
+        print(f"Error in OpenAI mood detection: {e}")
+    return dict(DEFAULT_MOOD)
+
+
+async def detect_moods_async(texts: List[str], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Batch form of detect_mood_async; the texts that miss the keyword matcher
+    and cache share LLM calls.
+    """
+    return list(await asyncio.gather(*(detect_mood_async(text, timeout) for text in texts)))
+
 
 def detect_mood(text: str) -> Dict[str, Any]:
     """
-    Detects mood from text using rule-based logic with OpenAI fallback.
+    Synchronous detect_mood for scripts and threads; async code should use
+    detect_mood_async.
     Returns: {emotion: str, intensity: int}
     """
-    text_lower = text.lower()
-    
-    # 1. Rule-based detection
-    for emotion, keywords in KEYWORDS.items():
-        if any(keyword in text_lower for keyword in keywords):
-            # Simple intensity logic: count matches? For now, fixed intensity.
-            return {"emotion": emotion, "intensity": 5}
-            
+    # 1. Rule-based detection (app.core.neuro_sync)
+    mood = match_mood(text)
+    if mood is not None:
+        return mood
+
+    key = normalize(text)
+    cached = _cache.get(key) if key else None
+    if cached is not None or not key or not config.MOOD_LLM_ENABLED:
+        return dict(cached or DEFAULT_MOOD)
+
     # 2. OpenAI Fallback
     try:
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = clients.openai_client().chat.completions.create(
+            model=config.MOOD_LLM_MODEL,
             messages=[
                 {
-                    "role": "system", 
+                    "role": "system",
                     "content": "Analyze the emotion of the user's text. Return JSON with 'emotion' (str) and 'intensity' (1-10 int)."
                 },
-                {"role": "user", "content": text}
+                {"role": "user", "content": key}
             ],
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            timeout=config.MOOD_LLM_TIMEOUT
         )
-        content = response.choices[0].message.content
-        return json.loads(content)
+        mood = _parse_mood(json.loads(response.choices[0].message.content))
+        _cache.set(key, mood)
+        return mood
     except Exception as e:
         print(f"Error in OpenAI mood detection: {e}")
-        return {"emotion": "neutral", "intensity": 1}
+        return dict(DEFAULT_MOOD)
@@ -0,0 +1,244 @@
+# Drains the vector outbox: saving a memory only writes a models.VectorOutbox
+# row next to it, and these workers chunk, embed and upsert the memories in
+# batches, retrying failures with exponential backoff. Ingested memories are
+# then linked into the memory graph (app.services.memory_graph).
+#
+# Runs inside the API process (started from the app lifespan), or standalone:
+#   python -m app.services.outbox_worker run|drain
+#   python -m app.services.outbox_worker reindex [--user USER_ID]
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, select
+
+from app.core import config
+from app.core.metrics import metrics
+from app.database import models
+from app.database.database import AsyncSessionLocal, engine
+from app.services.memory_graph import link_memories
+from app.services.memory_ingestion import ingest_memories
+
+
+def enqueue_memories(db, memory_ids: List[str]):
+    """
+    Adds outbox rows for the given memories to the session. The caller commits,
+    normally together with the memory rows themselves.
+    """
+    db.add_all(models.VectorOutbox(memory_id=memory_id) for memory_id in memory_ids)
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(config.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), config.OUTBOX_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def _claim_batch(limit: int) -> List[Dict[str, Any]]:
+    """
+    Leases up to `limit` due entries. Entries stay 'processing' until
+    OUTBOX_LEASE_SECONDS pass, after which another worker may take them over.
+    """
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        query = (
+            select(models.VectorOutbox)
+            .filter(
+                models.VectorOutbox.status.in_(["pending", "processing"]),
+                models.VectorOutbox.next_attempt_at <= now
+            )
+            .order_by(models.VectorOutbox.next_attempt_at)
+            .limit(limit)
+        )
+        if db.get_bind().dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+
+        entries = (await db.execute(query)).scalars().all()
+        for entry in entries:
+            entry.status = "processing"
+            entry.attempts = (entry.attempts or 0) + 1
+            entry.next_attempt_at = now + timedelta(seconds=config.OUTBOX_LEASE_SECONDS)
+        await db.commit()
+        return [{"id": e.id, "memory_id": e.memory_id, "attempts": e.attempts} for e in entries]
+
+
+async def _load_memories(memory_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(
+                models.Memory.id, models.Memory.user_id, models.Memory.text,
+                models.Memory.tags, models.Memory.emotion, models.Memory.timestamp
+            )
+            .filter(models.Memory.id.in_(memory_ids))
+        )
+        return {row.id: dict(row._mapping) for row in result}
+
+
+async def _complete(entry_ids: List[str]):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(models.VectorOutbox).filter(models.VectorOutbox.id.in_(entry_ids)))
+        await db.commit()
+
+
+async def _fail(entries: List[Dict[str, Any]], error: str):
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        for entry in entries:
+            row = await db.get(models.VectorOutbox, entry["id"])
+            if row is None:
+                continue
+            row.last_error = error[:2000]
+            if entry["attempts"] >= config.OUTBOX_MAX_ATTEMPTS:
+                row.status = "failed"
+                metrics.incr("outbox.failed")
+            else:
+                row.status = "pending"
+                row.next_attempt_at = now + timedelta(seconds=_backoff(entry["attempts"]))
+                metrics.incr("outbox.retries")
+        await db.commit()
+
+
+async def process_batch(limit: int = config.OUTBOX_BATCH_SIZE) -> int:
+    """
+    Claims and processes one batch of outbox entries.
+
+    Returns:
+        The number of entries claimed (0 when the outbox is empty).
+    """
+    entries = await _claim_batch(limit)
+    if not entries:
+        return 0
+
+    memories = await _load_memories(list({e["memory_id"] for e in entries}))
+    try:
+        # Chunk IDs are deterministic, so retried upserts simply overwrite
+        await ingest_memories(list(memories.values()))
+        done, failed = entries, []
+    except Exception:
+        # Retry one memory at a time so a single bad memory can't hold back the batch
+        done, failed = [], []
+        for entry in entries:
+            memory = memories.get(entry["memory_id"])
+            try:
+                if memory:
+                    await ingest_memories([memory])
+                done.append(entry)
+            except Exception as e:
+                print(f"Outbox ingestion error for memory {entry['memory_id']}: {e}")
+                failed.append((entry, str(e)))
+
+    if done:
+        await _complete([e["id"] for e in done])
+        metrics.incr("outbox.processed", len(done))
+        try:
+            # The graph is derived data: a linking failure doesn't fail the ingestion
+            await link_memories([memories[e["memory_id"]] for e in done if e["memory_id"] in memories])
+        except Exception as e:
+            print(f"Memory graph linking error: {e}")
+    for entry, error in failed:
+        await _fail([entry], error)
+    return len(entries)
+
+
+class OutboxWorker:
+    """
+    Pool of asyncio tasks polling the outbox. notify() wakes them right away
+    after new entries are committed, so saves don't wait for the poll interval.
+    """
+
+    def __init__(self, concurrency: int = config.OUTBOX_WORKERS):
+        self.concurrency = concurrency
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Outbox worker error: {e}")
+                claimed = 0
+
+            if claimed:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=config.OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox_worker = OutboxWorker()
+
+
+async def reindex(user_id: Optional[str] = None, batch_size: int = 1000) -> int:
+    """
+    Queues every memory (optionally only one user's) for re-embedding.
+    """
+    count = 0
+    async with AsyncSessionLocal() as db:
+        query = select(models.Memory.id).order_by(models.Memory.id)
+        if user_id:
+            query = query.filter(models.Memory.user_id == user_id)
+
+        last_id = None
+        while True:
+            page = query.filter(models.Memory.id > last_id) if last_id else query
+            ids = (await db.execute(page.limit(batch_size))).scalars().all()
+            if not ids:
+                break
+            enqueue_memories(db, ids)
+            await db.commit()
+            count += len(ids)
+            last_id = ids[-1]
+    return count
+
+
+async def _run_until_empty():
+    while await process_batch():
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector outbox worker")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="Process the outbox continuously")
+    sub.add_parser("drain", help="Process the outbox until it is empty, then exit")
+    reindex_parser = sub.add_parser("reindex", help="Queue all memories for re-embedding")
+    reindex_parser.add_argument("--user", help="Only reindex this user's memories")
+    args = parser.parse_args()
+
+    models.create_tables(engine)
+    if args.command == "reindex":
+        print(f"Queued {asyncio.run(reindex(args.user))} memories")
+    elif args.command == "drain":
+        asyncio.run(_run_until_empty())
+    else:
+        async def run_forever():
+            outbox_worker.start()
+            await asyncio.Event().wait()
+
+        asyncio.run(run_forever())
+
+
+if __name__ == "__main__":
+    main()
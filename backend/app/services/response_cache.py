@@ -0,0 +1,111 @@
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core import config
+from app.core.cache import TTLCache
+from app.core.metrics import metrics
+from app.services.embedding_service import embed_texts_async
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of chat completions.
+
+    The exact tier is keyed on a hash of the scope (normally the user ID),
+    model and full message list. The semantic tier keeps, per scope, model and
+    fingerprint of every message but the last (system prompt, retrieved
+    context, history), the embeddings of recently answered questions; a new
+    question at least `similarity` cosine-similar to one of them reuses its
+    answer. Both tiers share the exact tier's LRU/TTL eviction.
+
+    Reports response_cache.exact_hits, .semantic_hits and .misses to app.core.metrics.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 2000,
+        ttl: Optional[float] = 3600,
+        similarity: float = 0.95,
+        semantic_entries: int = 64,
+    ):
+        self.similarity = similarity
+        self.semantic_entries = semantic_entries
+        self._responses = TTLCache(maxsize=maxsize, ttl=ttl)
+        # semantic scope -> [(exact key, unit vector)], most recent last
+        self._questions = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def exact_key(scope: str, model: str, messages: List[Dict[str, str]]) -> str:
+        return _digest(scope, model, json.dumps(messages, sort_keys=True))
+
+    @staticmethod
+    def semantic_scope(scope: str, model: str, messages: List[Dict[str, str]]) -> str:
+        return _digest(scope, model, json.dumps(messages[:-1], sort_keys=True))
+
+    async def _question_vector(self, messages: List[Dict[str, str]]) -> Optional[np.ndarray]:
+        if not messages or messages[-1].get("role") != "user":
+            return None
+        try:
+            vector = np.asarray((await embed_texts_async([messages[-1]["content"]]))[0], dtype=np.float32)
+        except Exception as e:
+            print(f"Response cache embedding error: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    async def lookup(self, scope: str, model: str, messages: List[Dict[str, str]]) -> Optional[str]:
+        response = self._responses.get(self.exact_key(scope, model, messages))
+        if response is not None:
+            metrics.incr("response_cache.exact_hits")
+            return response
+
+        entries = self._questions.get(self.semantic_scope(scope, model, messages))
+        if entries:
+            vector = await self._question_vector(messages)
+            if vector is not None:
+                keys, vectors = zip(*entries)
+                scores = np.stack(vectors) @ vector
+                for i in np.argsort(-scores):
+                    if scores[i] < self.similarity:
+                        break
+                    response = self._responses.get(keys[i])
+                    if response is not None:
+                        metrics.incr("response_cache.semantic_hits")
+                        return response
+
+        metrics.incr("response_cache.misses")
+        return None
+
+    async def store(self, scope: str, model: str, messages: List[Dict[str, str]], response: str):
+        key = self.exact_key(scope, model, messages)
+        self._responses.set(key, response)
+
+        vector = await self._question_vector(messages)
+        if vector is None:
+            return
+        semantic_scope = self.semantic_scope(scope, model, messages)
+        entries: List[Tuple[str, np.ndarray]] = [
+            entry for entry in self._questions.get(semantic_scope) or []
+            if entry[0] != key
+        ]
+        entries.append((key, vector))
+        self._questions.set(semantic_scope, entries[-self.semantic_entries:])
+
+    def clear(self):
+        self._responses.clear()
+        self._questions.clear()
+
+
+response_cache = ResponseCache(
+    maxsize=config.RESPONSE_CACHE_SIZE,
+    ttl=config.RESPONSE_CACHE_TTL,
+    similarity=config.RESPONSE_CACHE_SIMILARITY,
+    semantic_entries=config.RESPONSE_CACHE_SEMANTIC_ENTRIES,
+)
@@ -0,0 +1,38 @@
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import models
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """
+    A fresh SQLite database with all tables. Call it with the modules whose
+    AsyncSessionLocal should point at it; returns a namespace with the sync
+    `engine` (for seeding rows), the async session `factory` and `get_db`,
+    a drop-in override for app.dependencies.get_async_db.
+    """
+    path = tmp_path / "db.sqlite"
+    engine = create_engine(f"sqlite:///{path}")
+    models.create_tables(engine)
+    factory = async_sessionmaker(
+        create_async_engine(f"sqlite+aiosqlite:///{path}"), class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def get_db():
+        async with factory() as db:
+            yield db
+
+    def use(*modules):
+        for module in modules:
+            monkeypatch.setattr(module, "AsyncSessionLocal", factory)
+        return SimpleNamespace(engine=engine, factory=factory, get_db=get_db)
+
+    yield use
+    engine.dispose()
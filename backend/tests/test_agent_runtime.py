@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.services import agent_runtime as runtime_module
+from app.services.agent_runtime import Agent, AgentBusy, AgentRuntime
+
+
+class SlowAgent(Agent):
+    instances = 0
+
+    def __init__(self):
+        SlowAgent.instances += 1
+
+    async def run(self, input_text, context=None, emit=None):
+        await emit("thinking", {"input": input_text})
+        await asyncio.sleep(float(input_text))
+        return f"done {input_text}"
+
+
+@pytest.fixture(autouse=True)
+def slow_agent(monkeypatch):
+    monkeypatch.setitem(runtime_module.AGENTS, "slow", SlowAgent)
+    SlowAgent.instances = 0
+
+
+def test_streams_steps_and_reuses_agent_instances():
+    runtime = AgentRuntime(max_concurrency=2, max_runs_per_user=5, timeout=5)
+
+    async def main():
+        first = runtime.start("slow", "0.01", {}, "u1")
+        events = [event async for event in first.stream()]
+        second = await runtime.run("slow", "0", {}, "u1")
+        return events, second
+
+    events, second = asyncio.run(main())
+
+    assert [e[0] for e in events] == ["step", "step", "result"]
+    assert events[1][1] == {"step": "thinking", "input": "0.01"}
+    assert events[2][1] == {"output": "done 0.01"}
+    assert second == "done 0"
+    assert SlowAgent.instances == 1
+
+
+def test_per_user_cap_timeout_and_cancel():
+    runtime = AgentRuntime(max_concurrency=1, max_runs_per_user=1, timeout=0.05)
+
+    async def main():
+        run = runtime.start("slow", "1", {}, "u1")
+        with pytest.raises(AgentBusy):
+            runtime.start("slow", "0", {}, "u1")
+        # Another user queues behind the single execution slot
+        other = runtime.start("slow", "10", {}, "u2")
+
+        with pytest.raises(asyncio.TimeoutError):
+            await run.task
+        assert not runtime.cancel(other.id, "u1")
+        assert runtime.cancel(other.id, "u2")
+        events = [event async for event in other.stream()]
+        return events
+
+    events = asyncio.run(main())
+
+    assert events[-1] == ("error", {"detail": "Agent run cancelled"})
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import models
+from app.services import agent_runtime as runtime_module
+from app.services import agent_worker
+from app.services.agent_runtime import Agent
+
+
+class EchoAgent(Agent):
+    async def run(self, input_text, context=None, emit=None):
+        if input_text == "fail":
+            raise RuntimeError("boom")
+        await emit("usage", {"prompt_tokens": 12, "completion_tokens": 3})
+        return '{"summary": "%s for %s", "suggested_tasks": ["Follow up"]}' % (input_text, context["user_id"])
+
+
+@pytest.fixture
+def sessions(sqlite_db, monkeypatch):
+    monkeypatch.setitem(runtime_module.AGENTS, "echo", EchoAgent)
+    return sqlite_db(agent_worker).factory
+
+
+def _add(factory, **values):
+    values = {"status": "queued", "attempts": 0, **values}
+
+    async def add():
+        async with factory() as db:
+            run = models.AgentRun(user_id="u1", agent_id="echo", context={}, **values)
+            db.add(run)
+            await db.commit()
+            return run.id
+    return asyncio.run(add())
+
+
+def _get(factory, run_id):
+    async def get():
+        async with factory() as db:
+            return await db.get(models.AgentRun, run_id)
+    return asyncio.run(get())
+
+
+def test_executes_queued_runs_and_stores_outcome(sessions):
+    ok = _add(sessions, input="notes")
+    failed = _add(sessions, input="fail")
+
+    assert asyncio.run(agent_worker.process_batch(5)) == 2
+    assert asyncio.run(agent_worker.process_batch(5)) == 0
+
+    run = _get(sessions, ok)
+    assert run.status == "succeeded"
+    assert run.result["summary"] == "notes for u1"
+    assert run.suggested_tasks == ["Follow up"]
+    assert (run.prompt_tokens, run.completion_tokens) == (12, 3)
+    assert run.attempts == 1 and run.started_at and run.finished_at
+
+    run = _get(sessions, failed)
+    assert run.status == "failed"
+    assert run.error == "boom"
+
+
+def test_retries_expired_leases_until_attempts_run_out(sessions):
+    expired = datetime.utcnow() - timedelta(seconds=1)
+    retried = _add(sessions, input="again", status="running", attempts=1, lease_until=expired)
+    exhausted = _add(sessions, input="again", status="running", attempts=3, lease_until=expired)
+    leased = _add(sessions, input="again", status="running", attempts=1, lease_until=datetime.utcnow() + timedelta(hours=1))
+
+    assert asyncio.run(agent_worker.process_batch(5)) == 1
+
+    assert _get(sessions, retried).status == "succeeded"
+    assert _get(sessions, retried).attempts == 2
+    assert _get(sessions, exhausted).status == "failed"
+    assert _get(sessions, leased).status == "running"
+
+
+def test_cancel_queued_run_is_not_executed(sessions):
+    run_id = _add(sessions, input="notes")
+
+    assert asyncio.run(agent_worker.cancel(run_id, "someone-else")) is None
+    assert asyncio.run(agent_worker.cancel(run_id, "u1")) == "cancelled"
+    assert asyncio.run(agent_worker.process_batch(5)) == 0
+    assert _get(sessions, run_id).status == "cancelled"
+
+
+def test_lease_is_renewed_while_run_waits(sessions, monkeypatch):
+    monkeypatch.setattr(agent_worker.config, "AGENT_RUN_LEASE_SECONDS", 0.3)
+    run_id = _add(sessions, input="notes")
+
+    async def main():
+        claimed = await agent_worker._claim(1)
+        heartbeat = asyncio.create_task(agent_worker._renew_lease(run_id))
+        # Past the original lease, which the heartbeat has pushed back
+        await asyncio.sleep(0.4)
+        reclaimed = await agent_worker._claim(1)
+        heartbeat.cancel()
+        return claimed, reclaimed
+
+    claimed, reclaimed = asyncio.run(main())
+    assert [run["id"] for run in claimed] == [run_id]
+    assert reclaimed == []
+    assert _get(sessions, run_id).attempts == 1
@@ -0,0 +1,57 @@
+import asyncio
+
+from app.core.batching import MicroBatcher
+
+
+def test_concurrent_submits_are_coalesced_and_split_by_cost():
+    batches = []
+
+    async def process(items):
+        batches.append(list(items))
+        return [item.upper() for item in items]
+
+    async def main():
+        batcher = MicroBatcher(process, max_wait=0.01, max_items=10, max_cost=6, cost=len)
+        return await asyncio.gather(
+            batcher.submit("ab"),
+            batcher.submit_many(["cd", "ef"]),
+            batcher.submit("gh"),
+        )
+
+    results = asyncio.run(main())
+
+    assert results == ["AB", ["CD", "EF"], "GH"]
+    assert batches == [["ab", "cd", "ef"], ["gh"]]
+
+
+def test_batch_errors_reach_every_caller():
+    async def process(items):
+        raise RuntimeError("boom")
+
+    async def main():
+        batcher = MicroBatcher(process, max_wait=0.001)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_in_flight_batches_are_referenced_until_done():
+    async def main():
+        release = asyncio.Event()
+
+        async def process(items):
+            await release.wait()
+            return items
+
+        batcher = MicroBatcher(process, max_items=1)
+        pending = asyncio.ensure_future(batcher.submit(1))
+        await asyncio.sleep(0)
+        in_flight = len(batcher._tasks)
+        release.set()
+        result = await pending
+        await asyncio.sleep(0)
+        return in_flight, result, len(batcher._tasks)
+
+    assert asyncio.run(main()) == (1, 1, 0)
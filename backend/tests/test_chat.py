@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.context_builder import BuiltContext
+from app.dependencies import get_current_user
+from app.routers import chat
+from app.services.conversation_store import ConversationNotFound
+
+
+@pytest.fixture
+def chat_app(monkeypatch):
+    monkeypatch.setattr(chat.config, "CHAT_RETRIEVAL_TIMEOUT", 0.05)
+    state = {"prompts": [], "cancelled": []}
+
+    async def slow(name, result):
+        try:
+            await asyncio.sleep(10)
+            return result
+        except asyncio.CancelledError:
+            state["cancelled"].append(name)
+            raise
+
+    async def stream_chat(messages, model=None, cache_scope=None):
+        state["prompts"].append(messages)
+        for chunk in ("Hel", "lo"):
+            yield chunk
+
+    monkeypatch.setattr(chat, "_retrieve_context", lambda text, user_id: slow("retrieval", BuiltContext()))
+    monkeypatch.setattr(chat, "detect_mood_async", lambda text: slow("mood", {"emotion": "happy", "intensity": 5}))
+    monkeypatch.setattr(chat.llm_service, "stream_chat", stream_chat)
+
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api/chat")
+    app.dependency_overrides[get_current_user] = lambda: {"id": "u1"}
+    with TestClient(app) as client:
+        yield client, state
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 1
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_stream_sends_mood_first_and_answers_without_slow_retrieval(chat_app):
+    client, state = chat_app
+
+    response = client.post("/api/chat/", json={"input": "hello"})
+
+    events = [block for block in response.text.split("\n\n") if block]
+    assert events[0] == "event: metadata\ndata: " + json.dumps({"mood": "neutral", "intensity": 1, "suggested_action": None})
+    assert events[1:] == [
+        'data: {"content": "Hel"}', 'data: {"content": "lo"}', "event: done\ndata: [DONE]"
+    ]
+    assert "Relevant Context" not in state["prompts"][0][0]["content"]
+    assert _wait_for(lambda: sorted(state["cancelled"]) == ["mood", "retrieval"])
+
+
+def test_unknown_conversation_cancels_background_work(chat_app, monkeypatch):
+    client, state = chat_app
+
+    async def load_history(conversation_id, user_id):
+        await asyncio.sleep(0.01)
+        raise ConversationNotFound(conversation_id)
+
+    monkeypatch.setattr(chat.conversation_store, "load_history", load_history)
+
+    assert client.post("/api/chat/", json={"input": "hello", "conversation_id": "nope"}).status_code == 404
+    assert _wait_for(lambda: sorted(state["cancelled"]) == ["mood", "retrieval"])
+    assert state["prompts"] == []
@@ -0,0 +1,41 @@
+from app.core import config
+from app.core.context_builder import build_context
+from app.core.tokens import count_tokens
+from app.core.vectorstore import VectorMatch
+
+NOW = 1_700_000_000.0
+
+
+def _match(id, score, text, age_days=None):
+    metadata = {"text": text}
+    if age_days is not None:
+        metadata["timestamp"] = NOW - age_days * 86400
+    return VectorMatch(id=id, score=score, metadata=metadata)
+
+
+def test_dedupes_and_reranks_by_recency():
+    matches = [
+        _match("old", 0.80, "Quarterly planning notes for the design team", age_days=365),
+        _match("new", 0.78, "Dinner with Sam on Friday at the usual place", age_days=0),
+        _match("dup", 0.79, "Quarterly planning notes for the design team.", age_days=365),
+        _match("empty", 0.99, ""),
+    ]
+
+    built = build_context(matches, budget=1000, now=NOW)
+
+    assert built.used == ["new", "old"]
+    assert built.duplicates == 1
+    assert built.text.startswith("Dinner with Sam")
+
+
+def test_truncates_to_budget(monkeypatch):
+    monkeypatch.setattr(config, "CONTEXT_RECENCY_WEIGHT", 0.0)
+    matches = [_match(str(i), 1 - i / 10, " ".join(f"word{i}x{j}" for j in range(40))) for i in range(5)]
+
+    built = build_context(matches, budget=220, now=NOW)
+
+    assert built.truncated
+    assert built.tokens <= 220
+    assert count_tokens(built.text) <= 220
+    assert built.used == ["0", "1", "2"]
+    assert built.dropped == 2
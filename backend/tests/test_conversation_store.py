@@ -0,0 +1,57 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services import conversation_store
+from app.services.conversation_store import history_messages, recent_window
+
+
+def test_recent_window_keeps_newest_messages_within_budget():
+    messages = [SimpleNamespace(seq=i, tokens=t) for i, t in enumerate([50, 10, 30, 20], start=1)]
+
+    assert [m.seq for m in recent_window(messages, 60)] == [2, 3, 4]
+    assert [m.seq for m in recent_window(messages, 59)] == [3, 4]
+    assert [m.seq for m in recent_window(messages, 1000)] == [1, 2, 3, 4]
+    assert recent_window(messages, 5) == []
+
+
+def test_history_messages_put_summary_first():
+    history = {"summary": "Planning a trip.", "messages": [{"role": "user", "content": "Which dates?"}]}
+
+    assert history_messages(history) == [
+        {"role": "system", "content": "Summary of the earlier conversation:\nPlanning a trip."},
+        {"role": "user", "content": "Which dates?"},
+    ]
+    assert history_messages({"summary": None, "messages": []}) == []
+
+
+def test_summarize_folds_oldest_messages_first(sqlite_db, monkeypatch):
+    sqlite_db(conversation_store)
+    monkeypatch.setattr(conversation_store.config, "CONVERSATION_HISTORY_MAX_MESSAGES", 4)
+    monkeypatch.setattr(conversation_store.config, "CONVERSATION_HISTORY_TOKENS", 2)
+    monkeypatch.setattr(conversation_store.config, "CONVERSATION_SUMMARY_TRIGGER_TOKENS", 10 ** 6)
+    monkeypatch.setattr(conversation_store, "count_tokens", lambda text: 1)
+    folded = []
+
+    async def get_chat_completion(messages, model=None):
+        transcript = messages[-1]["content"].split("New messages:\n")[1]
+        folded.append(transcript.splitlines())
+        return f"summary {len(folded)}"
+
+    monkeypatch.setattr(conversation_store.llm_service, "get_chat_completion", get_chat_completion)
+
+    async def run():
+        conversation = await conversation_store.create_conversation("u1")
+        for turn in range(1, 6):
+            await conversation_store.append_turn(conversation.id, f"q{turn}", f"a{turn}")
+        while await conversation_store.summarize(conversation.id):
+            pass
+        return await conversation_store.load_history(conversation.id, "u1")
+
+    history = asyncio.run(run())
+
+    assert folded == [
+        ["user: q1", "assistant: a1", "user: q2", "assistant: a2"],
+        ["user: q3", "assistant: a3", "user: q4", "assistant: a4"],
+    ]
+    assert history["summary"] == "summary 2"
+    assert history["messages"] == [{"role": "user", "content": "q5"}, {"role": "assistant", "content": "a5"}]
@@ -0,0 +1,36 @@
+from app.services import embedding_service
+from app.services.embedding_cache import EmbeddingCache, cache_key
+
+
+def test_embed_texts_only_embeds_uncached_texts(monkeypatch, tmp_path):
+    calls = []
+
+    def fake_create(texts, model):
+        calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+    cache = EmbeddingCache(maxsize=10, ttl=None, disk_path=str(tmp_path / "cache.db"))
+    monkeypatch.setattr(embedding_service, "embedding_cache", cache)
+    monkeypatch.setattr(embedding_service, "_create_embeddings", fake_create)
+
+    first = embedding_service.embed_texts(["hello", "hi", "hello"])
+    second = embedding_service.embed_texts(["hi", "new text"])
+
+    assert calls == [["hello", "hi"], ["new text"]]
+    assert first == [[5.0, 0.5], [2.0, 0.5], [5.0, 0.5]]
+    assert second == [[2.0, 0.5], [8.0, 0.5]]
+
+    # The SQLite tier survives a cold in-process cache
+    cache.clear()
+    assert cache.get_many([cache_key("hello", "text-embedding-3-small")]) == {
+        cache_key("hello", "text-embedding-3-small"): [5.0, 0.5]
+    }
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = EmbeddingCache(maxsize=2, ttl=None, disk_path=None)
+    cache.put_many({"a": [1.0], "b": [2.0]})
+    cache.get_many(["a"])
+    cache.put_many({"c": [3.0]})
+
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
@@ -0,0 +1,126 @@
+import asyncio
+import zipfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import config
+from app.core.text_splitter import split_text
+from app.core.tokens import count_tokens
+from app.database import models
+from app.dependencies import get_async_db, get_current_user
+from app.routers import files
+from app.services import file_ingestion, file_storage
+from app.services.file_ingestion import iter_chunks, iter_docx, iter_text, parser_for, spool_chunks
+
+
+async def _pieces(*parts):
+    for part in parts:
+        yield part
+
+
+def test_streamed_chunks_cover_text_within_budget():
+    text = "\n\n".join(f"Paragraph {i}. " + "word " * (20 + i % 7) for i in range(200))
+    pieces = (text[i:i + 97] for i in range(0, len(text), 97))
+
+    chunks = list(iter_chunks(pieces, 64, 8))
+
+    assert all(count_tokens(chunk) <= 64 for chunk in chunks)
+    assert len(chunks) <= len(split_text(text, 64, 8)) + 5
+    joined = "\n".join(chunks)
+    assert all(f"Paragraph {i}. word" in joined for i in range(200))
+
+
+def test_text_parser_decodes_across_read_boundaries(tmp_path):
+    path = tmp_path / "note.md"
+    path.write_text("héllo wörld " * 50, encoding="utf-8")
+
+    assert "".join(iter_text(str(path), chunk_size=7)) == "héllo wörld " * 50
+
+
+def test_docx_parser_yields_paragraphs(tmp_path):
+    path = tmp_path / "doc.docx"
+    ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = "".join(f"<w:p><w:r><w:t>Line {i}</w:t><w:tab/><w:t>end</w:t></w:r></w:p>" for i in range(3))
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f'<w:document xmlns:w="{ns}"><w:body>{body}</w:body></w:document>')
+
+    assert list(iter_docx(str(path))) == [f"Line {i}\tend\n\n" for i in range(3)]
+    assert parser_for(None, "doc.docx") is iter_docx
+
+
+def test_spool_chunks_writes_one_chunk_per_line(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("Short file.")
+    spool = tmp_path / "spool.jsonl"
+
+    assert spool_chunks(str(path), "text/plain", "a.txt", str(spool)) == 1
+    assert spool.read_text() == '"Short file."\n'
+
+
+@pytest.fixture
+def files_api(sqlite_db, tmp_path, monkeypatch):
+    db = sqlite_db(file_ingestion)
+    monkeypatch.setattr(config, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    app = FastAPI()
+    app.include_router(files.router, prefix="/api/files")
+    app.dependency_overrides[get_async_db] = db.get_db
+    app.dependency_overrides[get_current_user] = lambda: {"id": "u1"}
+    scheduled = []
+    monkeypatch.setattr(file_ingestion, "schedule_ingestion", scheduled.append)
+    return SimpleNamespace(client=TestClient(app), db=db, scheduled=scheduled)
+
+
+def test_abandoned_processing_can_be_reingested(files_api):
+    now = datetime.utcnow()
+    with files_api.db.engine.begin() as conn:
+        conn.execute(models.File.__table__.insert(), [
+            {"id": "live", "user_id": "u1", "filename": "a.txt", "status": "processing", "lease_until": now + timedelta(minutes=1)},
+            {"id": "dead", "user_id": "u1", "filename": "b.txt", "status": "processing", "lease_until": now - timedelta(seconds=1)},
+        ])
+
+    assert files_api.client.post("/api/files/live/ingest").status_code == 409
+    assert files_api.client.post("/api/files/dead/ingest").json() == {"id": "dead", "status": "scheduled"}
+    assert files_api.scheduled == ["dead"]
+
+
+def test_upload_claims_file_for_its_ingestion(files_api):
+    uploaded = files_api.client.post("/api/files/upload", files={"file": ("note.txt", b"Some notes.", "text/plain")}).json()
+
+    assert uploaded["status"] == "processing"
+    assert files_api.client.post(f"/api/files/{uploaded['id']}/ingest").status_code == 409
+    assert files_api.client.post(f"/api/files/{uploaded['id']}/ingest").status_code == 409
+    assert files_api.scheduled == [uploaded["id"]]
+
+
+def test_reingest_deletes_previous_chunks(files_api, monkeypatch):
+    blob = asyncio.run(file_storage.store_stream(_pieces(b"Short file.")))
+    with files_api.db.engine.begin() as conn:
+        conn.execute(models.File.__table__.insert().values(
+            id="f1", user_id="u1", filename="a.txt", mime_type="text/plain", sha256=blob.sha256,
+            status="processing", chunks_total=3
+        ))
+    calls = []
+
+    async def embed(texts):
+        return [[1.0] for _ in texts]
+
+    async def upsert(vectors, metadata, ids, namespace=""):
+        calls.append(("upsert", ids, namespace))
+
+    async def delete(ids, namespace=""):
+        calls.append(("delete", ids, namespace))
+
+    monkeypatch.setattr(file_ingestion, "embed_texts_async", embed)
+    monkeypatch.setattr(file_ingestion, "upsert_vectors_async", upsert)
+    monkeypatch.setattr(file_ingestion, "delete_vectors_async", delete)
+    monkeypatch.setattr(file_ingestion, "_get_pool", lambda: None)
+
+    assert asyncio.run(file_ingestion.ingest_file("f1")) == 1
+    assert calls == [
+        ("delete", ["f1#0", "f1#1", "f1#2"], "u1"),
+        ("upsert", ["f1#0"], "u1"),
+    ]
@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from app.core import config
+from app.services import file_storage
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def test_store_stream_hashes_and_deduplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "UPLOAD_DIR", str(tmp_path))
+
+    first = asyncio.run(file_storage.store_stream(_chunks(b"hello ", b"world")))
+    second = asyncio.run(file_storage.store_stream(_chunks(b"hello world")))
+
+    assert first.sha256 == hashlib.sha256(b"hello world").hexdigest()
+    assert (first.size, first.deduplicated) == (11, False)
+    assert (second.path, second.deduplicated) == (first.path, True)
+    assert open(first.path, "rb").read() == b"hello world"
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_store_stream_enforces_max_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "UPLOAD_DIR", str(tmp_path))
+
+    with pytest.raises(file_storage.UploadTooLarge):
+        asyncio.run(file_storage.store_stream(_chunks(b"12345", b"67890"), max_bytes=8))
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_multipart_upload_resumes_and_completes(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "UPLOAD_DIR", str(tmp_path))
+
+    async def main():
+        session = await file_storage.create_session("user-1", "big.bin")
+        upload_id = session["upload_id"]
+        await file_storage.write_part(upload_id, "user-1", 2, _chunks(b"world"))
+        await file_storage.write_part(upload_id, "user-1", 1, _chunks(b"broken"))
+        # Re-sending a part replaces it
+        await file_storage.write_part(upload_id, "user-1", 1, _chunks(b"hello "))
+
+        with pytest.raises(file_storage.UploadSessionNotFound):
+            await file_storage.get_session(upload_id, "user-2")
+        parts = (await file_storage.get_session(upload_id, "user-1"))["parts"]
+        return parts, await file_storage.complete_session(upload_id, "user-1")
+
+    parts, done = asyncio.run(main())
+
+    assert parts == [{"part_number": 1, "size": 6}, {"part_number": 2, "size": 5}]
+    assert done["filename"] == "big.bin"
+    assert open(done["blob"].path, "rb").read() == b"hello world"
+    assert os.listdir(tmp_path / "sessions") == []
+
+
+def test_complete_requires_contiguous_parts(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "UPLOAD_DIR", str(tmp_path))
+
+    async def main():
+        session = await file_storage.create_session("user-1", "big.bin")
+        upload_id = session["upload_id"]
+        await file_storage.write_part(upload_id, "user-1", 1, _chunks(b"a"))
+        await file_storage.write_part(upload_id, "user-1", 3, _chunks(b"c"))
+        with pytest.raises(ValueError, match="Missing parts: 2"):
+            await file_storage.complete_session(upload_id, "user-1")
+
+        await file_storage.write_part(upload_id, "user-1", 2, _chunks(b"b"))
+        with pytest.raises(ValueError, match="Expected 4 parts"):
+            await file_storage.complete_session(upload_id, "user-1", expected_parts=4)
+        return await file_storage.complete_session(upload_id, "user-1", expected_parts=3)
+
+    done = asyncio.run(main())
+
+    assert open(done["blob"].path, "rb").read() == b"abc"
@@ -0,0 +1,31 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.database import models
+from app.dependencies import get_async_db, get_current_user
+from app.routers import memory
+
+
+@pytest.fixture
+def db(sqlite_db):
+    return sqlite_db()
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(memory.router, prefix="/api/memory")
+    app.dependency_overrides[get_async_db] = db.get_db
+    app.dependency_overrides[get_current_user] = lambda: {"id": "u1"}
+    return TestClient(app)
+
+
+def test_memories_always_belong_to_the_caller(client, db):
+    client.post("/api/memory/save", json={"text": "mine", "user_id": "someone-else"})
+    client.post("/api/memory/bulk", json={"memories": [{"text": "also mine", "user_id": "someone-else"}]})
+
+    with db.engine.connect() as conn:
+        owners = conn.execute(select(models.Memory.user_id)).scalars().all()
+    assert owners == ["u1", "u1"]
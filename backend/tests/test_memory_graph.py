@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.core.cache import TTLCache
+from app.core.memory_graph import MemoryGraph, merge_edges, similar_edges, tag_edges
+from app.core.vectorstore import VectorMatch
+from app.database import models
+from app.services import memory_graph, memory_search
+
+
+def test_graph_keeps_strongest_edges_per_node():
+    graph = MemoryGraph(max_degree=2, capacity=2)
+    graph.add_edges("a", [("b", 0.9), ("c", 0.5)])
+    graph.add_edges("a", [("d", 0.7), ("e", 0.1)])
+
+    assert graph.neighbors_of("a") == [("b", pytest.approx(0.9)), ("d", pytest.approx(0.7))]
+    assert graph.neighbors_of("c") == [("a", pytest.approx(0.5))]
+    assert len(graph) == 5 and graph.neighbors.shape[0] >= 5
+
+    graph.remove("b")
+    assert graph.neighbors_of("a") == [("d", pytest.approx(0.7))]
+    assert graph.neighbors_of("b") == []
+
+
+def test_expand_skips_seeds_and_keeps_best_path():
+    graph = MemoryGraph()
+    graph.add_edges("a", [("b", 0.9), ("x", 0.5)])
+    graph.add_edges("c", [("x", 0.8), ("y", 0.4)])
+
+    assert graph.expand({"a": 1.0, "c": 0.5}, limit=3) == [
+        ("b", pytest.approx(0.9)), ("x", pytest.approx(0.5)), ("y", pytest.approx(0.2))
+    ]
+    assert graph.expand({"a": 1.0, "b": 1.0}, limit=5) == [("x", pytest.approx(0.5))]
+
+
+def test_edge_builders():
+    matches = [
+        VectorMatch("m1#0", 0.99, {"memory_id": "m1"}),
+        VectorMatch("m2#0", 0.9, {"memory_id": "m2"}),
+        VectorMatch("m2#1", 0.95, {"memory_id": "m2"}),
+        VectorMatch("m3#0", 0.5, {"memory_id": "m3"}),
+    ]
+    assert similar_edges("m1", matches, k=5, min_score=0.6) == [("m2", 0.95)]
+
+    candidates = [("m2", ["Work", "travel"]), ("m3", ["home"]), ("m4", ["work"])]
+    assert tag_edges("m1", ["work", "travel"], candidates, k=5) == [("m2", 1.0), ("m4", 0.5)]
+    assert merge_edges([("m2", 0.95)], [("m2", 1.0), ("m4", 0.5)]) == {"m2": 1.0, "m4": 0.5}
+
+
+@pytest.fixture
+def sessions(sqlite_db, monkeypatch):
+    engine = sqlite_db(memory_graph, memory_search).engine
+    monkeypatch.setattr(memory_graph, "_graphs", TTLCache())
+
+    memories = [
+        {"id": "m1", "user_id": "u1", "text": "Trip to Lisbon", "tags": ["travel"]},
+        {"id": "m2", "user_id": "u1", "text": "Lisbon hotel booking", "tags": []},
+        {"id": "m3", "user_id": "u1", "text": "Packing list", "tags": ["travel"]},
+    ]
+    with engine.begin() as conn:
+        conn.execute(models.Memory.__table__.insert(), [
+            {**m, "emotion": "neutral", "timestamp": datetime(2024, 1, i + 1)} for i, m in enumerate(memories)
+        ])
+
+    async def embed(texts):
+        return [[1.0] for _ in texts]
+
+    async def query(vector, top_k=5, namespace=""):
+        return [VectorMatch("m1#0", 1.0, {"memory_id": "m1"}), VectorMatch("m2#0", 0.9, {"memory_id": "m2"})]
+
+    monkeypatch.setattr(memory_graph, "embed_texts_async", embed)
+    monkeypatch.setattr(memory_graph, "query_vectors_async", query)
+    return memories
+
+
+def test_links_memories_and_expands_retrieval(sessions):
+    assert asyncio.run(memory_graph.link_memories(sessions[:1])) == 4
+
+    assert asyncio.run(memory_graph.related("m1", "u1")) == [("m3", pytest.approx(1.0)), ("m2", pytest.approx(0.9))]
+    assert asyncio.run(memory_graph.related("m3", "u1")) == [("m1", pytest.approx(1.0))]
+
+    expanded = asyncio.run(memory_graph.expand_matches([VectorMatch("m2#0", 0.8, {"memory_id": "m2"})], "u1", limit=3))
+    assert [(m.id, m.metadata["text"]) for m in expanded] == [("m1#0", "Trip to Lisbon")]
+    assert expanded[0].score == pytest.approx(0.72)
+    assert expanded[0].metadata["related"] is True
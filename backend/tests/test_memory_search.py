@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.bm25 import BM25Index, reciprocal_rank_fusion
+from app.core.cache import TTLCache
+from app.core.vectorstore import VectorMatch
+from app.database import models
+from app.services import memory_search
+
+
+def test_bm25_ranks_rare_terms_and_supports_updates():
+    index = BM25Index()
+    index.add("a", "meeting notes about the budget")
+    index.add("b", "budget budget budget review")
+    index.add("c", "call Sam about invoice INV-2041")
+
+    assert [doc for doc, _ in index.search("budget")] == ["b", "a"]
+    assert [doc for doc, _ in index.search("inv 2041 budget")][0] == "c"
+
+    index.add("b", "holiday plans")
+    index.remove("a")
+    assert index.search("budget") == []
+    assert len(index) == 2 and "a" not in index
+    index.add("d", "budget again")
+    assert [doc for doc, _ in index.search("budget")] == ["d"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b"]], k=60)
+
+    assert [doc for doc, _ in fused] == ["b", "a", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_exact_queries():
+    assert memory_search.is_exact_query("INV-2041")
+    assert memory_search.is_exact_query("#billing jane@acme.com")
+    assert memory_search.is_exact_query('"quarterly review notes for the team"')
+    assert not memory_search.is_exact_query("what did we decide about the budget")
+    assert not memory_search.is_exact_query("budget")
+    for message in ("Tell me more", "Hello there", "Why?", "Summarize yesterday", "OK", "Sam"):
+        assert not memory_search.is_exact_query(message)
+
+
+@pytest.fixture
+def search(sqlite_db, monkeypatch):
+    engine = sqlite_db(memory_search).engine
+    monkeypatch.setattr(memory_search, "_indexes", TTLCache())
+    with engine.begin() as conn:
+        conn.execute(models.Memory.__table__.insert(), [
+            {"id": "m1", "user_id": "u1", "text": "Invoice INV-2041 from Acme", "tags": ["billing"], "timestamp": datetime(2024, 1, 1)},
+            {"id": "m2", "user_id": "u1", "text": "Budget review went well", "tags": [], "timestamp": datetime(2024, 1, 2)},
+            {"id": "m3", "user_id": "u2", "text": "Invoice INV-2041 copy", "tags": [], "timestamp": datetime(2024, 1, 3)},
+        ])
+
+    calls = []
+
+    async def vector_search(query, user_id, top_k):
+        calls.append(query)
+        return [VectorMatch("m2#0", 0.9, {"memory_id": "m2", "text": "Budget review went well"})]
+
+    monkeypatch.setattr(memory_search, "_vector_search", vector_search)
+    return calls
+
+
+def test_exact_query_skips_vector_search(search):
+    matches = asyncio.run(memory_search.search("INV-2041", "u1", mode="auto"))
+
+    assert [m.id for m in matches] == ["m1#0"]
+    assert matches[0].metadata["tags"] == ["billing"]
+    assert search == []
+
+
+def test_short_messages_use_vector_search(search):
+    asyncio.run(memory_search.search("Tell me more", "u1", mode="auto"))
+    asyncio.run(memory_search.search("INV-2041", "u1"))
+
+    assert search == ["Tell me more", "INV-2041"]
+
+
+def test_hybrid_fuses_keyword_and_vector_results(search):
+    matches = asyncio.run(memory_search.search("how did the invoice and budget go", "u1"))
+
+    assert {m.metadata["memory_id"] for m in matches} == {"m1", "m2"}
+    assert matches[0].metadata["memory_id"] == "m2"
+    assert search == ["how did the invoice and budget go"]
+
+
+def test_saved_memories_are_indexed_incrementally(search):
+    asyncio.run(memory_search.load_index("u1"))
+    memory_search.index_memories([SimpleNamespace(id="m4", user_id="u1", text="Lunch with Priya", tags=[])])
+
+    assert [doc for doc, _ in asyncio.run(memory_search.load_index("u1")).search("priya")] == ["m4"]
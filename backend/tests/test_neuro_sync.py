@@ -0,0 +1,75 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.core.cache import TTLCache
+from app.core.neuro_sync import match_mood, match_moods, score_mood
+from app.services import neuro_sync
+
+
+def test_scores_all_emotions_in_one_pass():
+    scores = score_mood("Worried about the deadline, but so happy with the team")
+
+    assert scores == {"anxious": 1.0, "stressed": 0.75, "happy": 1.5}
+    assert match_mood("Worried about the deadline, but so happy with the team") == {"emotion": "happy", "intensity": 6}
+
+
+def test_word_boundaries_negation_and_emphasis():
+    assert match_mood("He earned a badge for gladness") is None
+    assert match_mood("I'm not happy") is None
+    assert match_mood("I am sad") == {"emotion": "sad", "intensity": 5}
+    assert match_mood("I am extremely SAD!!")["intensity"] == 9
+
+
+def test_batch_api():
+    assert match_moods(["so stressed", "nothing here", "fine"]) == [
+        {"emotion": "stressed", "intensity": 6},
+        None,
+        {"emotion": "neutral", "intensity": 4},
+    ]
+
+
+class _FakeCompletions:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+
+    async def create(self, model, messages, response_format):
+        self.prompts.append(messages[-1]["content"])
+        await asyncio.sleep(self.delay)
+        count = messages[-1]["content"].count("\n") + 1
+        content = json.dumps({"moods": [{"emotion": "Calm", "intensity": 3}] * count})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _fake_client(monkeypatch, completions):
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(neuro_sync.clients, "async_openai_client", lambda: client)
+    monkeypatch.setattr(neuro_sync, "_cache", TTLCache(maxsize=100))
+
+
+def test_llm_fallback_batches_and_caches(monkeypatch):
+    completions = _FakeCompletions()
+    _fake_client(monkeypatch, completions)
+
+    moods = asyncio.run(neuro_sync.detect_moods_async(["The meeting moved", "the  MEETING moved", "Lunch at noon", "so happy"]))
+
+    assert moods == [{"emotion": "calm", "intensity": 3}] * 3 + [{"emotion": "happy", "intensity": 6}]
+    assert completions.prompts == ['1. "the meeting moved"\n2. "lunch at noon"']
+
+    asyncio.run(neuro_sync.detect_mood_async("Lunch at noon"))
+    assert len(completions.prompts) == 1
+
+
+def test_llm_fallback_times_out_to_neutral(monkeypatch):
+    completions = _FakeCompletions(delay=0.2)
+    _fake_client(monkeypatch, completions)
+
+    async def main():
+        mood = await neuro_sync.detect_mood_async("Quiet afternoon", timeout=0.01)
+        await asyncio.sleep(0.3)
+        return mood
+
+    assert asyncio.run(main()) == neuro_sync.DEFAULT_MOOD
+    # The late answer still lands in the cache
+    assert neuro_sync._cache.get("quiet afternoon") == {"emotion": "calm", "intensity": 3}
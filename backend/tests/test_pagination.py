@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.pagination import decode_cursor, encode_cursor, stream_json_array, stream_json_page
+from app.database import models
+from app.dependencies import get_async_db, get_current_user
+from app.routers import files, memory, tasks
+
+
+def test_cursor_round_trip():
+    ts = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(ts, "abc")) == (ts, "abc")
+
+
+def test_decode_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_streamed_json_parses():
+    items = [{"id": "1", "tags": ["a"]}, {"id": "2", "tags": []}]
+    assert json.loads("".join(stream_json_array(items))) == items
+    assert json.loads("".join(stream_json_array([]))) == []
+    page = json.loads("".join(stream_json_page("memories", iter(items), "next")))
+    assert page == {"memories": items, "next_cursor": "next"}
+
+
+def _header_page(response):
+    return [row["id"] for row in response.json()], response.headers.get("X-Next-Cursor")
+
+
+def _memory_page(response):
+    page = response.json()
+    return [row["id"] for row in page["memories"]], page["next_cursor"]
+
+
+@pytest.mark.parametrize("router, prefix, path, table, order_column, read_page", [
+    (tasks.router, "/api/tasks", "/api/tasks/", models.Task.__table__, "created_at", _header_page),
+    (files.router, "/api/files", "/api/files/", models.File.__table__, "created_at", _header_page),
+    (memory.router, "/api/memory", "/api/memory/all", models.Memory.__table__, "timestamp", _memory_page),
+])
+def test_keyset_pages_through_identical_timestamps(sqlite_db, router, prefix, path, table, order_column, read_page):
+    db = sqlite_db()
+    app = FastAPI()
+    app.include_router(router, prefix=prefix)
+    app.dependency_overrides[get_async_db] = db.get_db
+    app.dependency_overrides[get_current_user] = lambda: {"id": "u1"}
+    older, newer = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    # Four rows share one timestamp and three the other, so pages split ties
+    rows = [{"id": f"r{i}", "user_id": "u1", order_column: older if i < 4 else newer} for i in range(7)]
+    with db.engine.begin() as conn:
+        conn.execute(table.insert(), rows + [{"id": "other", "user_id": "u2", order_column: newer}])
+    client = TestClient(app)
+
+    seen, cursor = [], None
+    while True:
+        ids, cursor = read_page(client.get(path, params={"limit": 2, **({"cursor": cursor} if cursor else {})}))
+        seen += ids
+        if not cursor:
+            break
+
+    assert seen == ["r6", "r5", "r4", "r3", "r2", "r1", "r0"]
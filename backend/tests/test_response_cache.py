@@ -0,0 +1,34 @@
+import asyncio
+
+from app.services import response_cache as response_cache_module
+from app.services.response_cache import ResponseCache
+
+VECTORS = {
+    "What is on my calendar today?": [1.0, 0.0, 0.0],
+    "what's on my calendar today": [0.99, 0.1, 0.0],
+    "Tell me a joke": [0.0, 1.0, 0.0],
+}
+
+
+def _messages(question, context="ctx"):
+    return [{"role": "system", "content": context}, {"role": "user", "content": question}]
+
+
+def test_exact_and_semantic_hits_are_scoped(monkeypatch):
+    async def fake_embed(texts):
+        return [VECTORS[text] for text in texts]
+
+    monkeypatch.setattr(response_cache_module, "embed_texts_async", fake_embed)
+    cache = ResponseCache(maxsize=10, ttl=None, similarity=0.95)
+
+    async def main():
+        await cache.store("user-1", "m", _messages("What is on my calendar today?"), "Two meetings.")
+        return [
+            await cache.lookup("user-1", "m", _messages("What is on my calendar today?")),
+            await cache.lookup("user-1", "m", _messages("what's on my calendar today")),
+            await cache.lookup("user-1", "m", _messages("Tell me a joke")),
+            await cache.lookup("user-2", "m", _messages("what's on my calendar today")),
+            await cache.lookup("user-1", "m", _messages("what's on my calendar today", context="other")),
+        ]
+
+    assert asyncio.run(main()) == ["Two meetings.", "Two meetings.", None, None, None]
@@ -0,0 +1,58 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import models
+from app.dependencies import get_async_db, get_current_user
+from app.routers import tasks
+
+
+@pytest.fixture
+def client(sqlite_db):
+    db = sqlite_db()
+    app = FastAPI()
+    app.include_router(tasks.router, prefix="/api/tasks")
+    app.dependency_overrides[get_async_db] = db.get_db
+    app.dependency_overrides[get_current_user] = lambda: {"id": "u1"}
+    with db.engine.begin() as conn:
+        conn.execute(models.AgentRun.__table__.insert().values(
+            id="run-1", user_id="u1", agent_id="research", status="succeeded",
+            suggested_tasks=["Read the paper", {"title": "Email Sam", "priority": "high"}]
+        ))
+    return TestClient(app)
+
+
+def test_bulk_create_and_update(client):
+    created = client.post("/api/tasks/bulk", json={"tasks": [{"title": "a"}, {"title": "b", "priority": "low"}]})
+    assert created.status_code == 200
+    ids = [task["id"] for task in created.json()["tasks"]]
+
+    response = client.patch("/api/tasks/bulk", json={"updates": [
+        {"id": ids[0], "status": "completed"},
+        {"id": ids[1], "priority": "high"},
+        {"id": "missing", "status": "completed"},
+    ]})
+    assert response.json() == {"updated": sorted(ids), "missing": ["missing"]}
+
+    listed = {task["title"]: task for task in client.get("/api/tasks/").json()}
+    assert (listed["a"]["status"], listed["a"]["priority"]) == ("completed", "medium")
+    assert (listed["b"]["status"], listed["b"]["priority"]) == ("pending", "high")
+
+
+def test_bulk_create_enforces_limit(client, monkeypatch):
+    monkeypatch.setattr(tasks.config, "TASK_BULK_MAX", 1)
+
+    assert client.post("/api/tasks/bulk", json={"tasks": [{"title": "a"}, {"title": "b"}]}).status_code == 413
+
+
+def test_materialises_suggested_tasks_once(client):
+    first = client.post("/api/tasks/from-agent-run/run-1", json={"indices": [1]}).json()
+    assert [(t["title"], t["priority"]) for t in first["tasks"]] == [("Email Sam", "high")]
+
+    second = client.post("/api/tasks/from-agent-run/run-1").json()
+    assert [t["title"] for t in second["tasks"]] == ["Read the paper"]
+    assert second["existing"] == [first["tasks"][0]["id"]]
+
+    assert len(client.get("/api/tasks/").json()) == 2
+    assert client.post("/api/tasks/from-agent-run/run-1", json={"indices": [5]}).status_code == 400
+    assert client.post("/api/tasks/from-agent-run/other").status_code == 404
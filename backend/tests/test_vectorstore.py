@@ -0,0 +1,89 @@
+import numpy as np
+
+from app.core import config, vectorstore
+from app.core.vectorstore import LocalVectorStore
+
+
+def _random_vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_local_store_query_upsert_delete_and_reload(tmp_path):
+    vectors = _random_vectors(50)
+    ids = [f"m{i}" for i in range(50)]
+    store = LocalVectorStore(root=str(tmp_path))
+    store.upsert(ids, vectors, [{"text": i} for i in ids], namespace="user-1")
+
+    matches = store.query(vectors[7], top_k=3, namespace="user-1")
+    assert matches[0].id == "m7"
+    assert matches[0].metadata == {"text": "m7"}
+    assert abs(matches[0].score - 1.0) < 1e-5
+    assert store.query(vectors[7], namespace="user-2") == []
+
+    # Overwrite m7 with m8's vector, delete m8
+    store.upsert(["m7"], vectors[8:9], [{"text": "moved"}], namespace="user-1")
+    store.delete(["m8"], namespace="user-1")
+
+    reloaded = LocalVectorStore(root=str(tmp_path))
+    top = reloaded.query(vectors[8], top_k=2, namespace="user-1")
+    assert top[0].id == "m7"
+    assert top[0].metadata == {"text": "moved"}
+    assert "m8" not in [m.id for m in top]
+
+
+def test_local_store_uses_ivf_above_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "LOCAL_VECTOR_IVF_THRESHOLD", 100)
+    monkeypatch.setattr(config, "LOCAL_VECTOR_IVF_NPROBE", 4)
+    vectors = _random_vectors(400, seed=1)
+    store = LocalVectorStore(root=str(tmp_path))
+    store.upsert([str(i) for i in range(400)], vectors, [{}] * 400)
+
+    for i in (0, 123, 399):
+        assert store.query(vectors[i], top_k=1)[0].id == str(i)
+    assert store._namespace("").ivf is not None
+
+
+def test_local_store_processes_see_each_others_writes(tmp_path):
+    vectors = _random_vectors(4)
+    first = LocalVectorStore(root=str(tmp_path))
+    second = LocalVectorStore(root=str(tmp_path))
+    first.upsert(["a", "b"], vectors[:2], [{}, {}])
+    assert second.query(vectors[1], top_k=1)[0].id == "b"
+
+    second.upsert(["c"], vectors[2:3], [{}])
+    first.delete(["a"])
+    assert [m.id for m in first.query(vectors[2], top_k=3)] == ["c", "b"]
+    assert [m.id for m in second.query(vectors[0], top_k=3) if m.id == "a"] == []
+
+
+def test_local_store_updates_move_rows_out_of_stale_ivf_buckets(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "LOCAL_VECTOR_IVF_THRESHOLD", 100)
+    monkeypatch.setattr(config, "LOCAL_VECTOR_IVF_NPROBE", 1)
+    vectors = _random_vectors(400, seed=2)
+    store = LocalVectorStore(root=str(tmp_path))
+    store.upsert([str(i) for i in range(400)], vectors, [{}] * 400)
+    store.query(vectors[0], top_k=1)
+
+    target = -vectors[0]
+    store.upsert(["0"], [target], [{"moved": True}])
+
+    top = store.query(target, top_k=1)[0]
+    assert (top.id, top.metadata) == ("0", {"moved": True})
+
+
+def test_local_store_compacts_dead_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(vectorstore, "_COMPACT_MIN_ROWS", 10)
+    vectors = _random_vectors(20, seed=3)
+    ids = [str(i) for i in range(20)]
+    store = LocalVectorStore(root=str(tmp_path))
+    store.upsert(ids, vectors, [{"i": i} for i in ids])
+    store.delete(ids[:11])
+
+    ns = store._namespace("")
+    assert (ns.generation, ns.count, len(ns.rows)) == (1, 9, 9)
+    assert sorted(p.name for p in (tmp_path / "default").iterdir()) == [
+        "lock", "manifest.json", "records.1.jsonl", "vectors.1.f32"
+    ]
+    reloaded = LocalVectorStore(root=str(tmp_path))
+    match = reloaded.query(vectors[15], top_k=1)[0]
+    assert (match.id, match.metadata) == ("15", {"i": "15"})